@@ -1,8 +1,16 @@
-from flask import Flask
+from flask import Flask, Response, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from datetime import timedelta
-from config.database import init_db
+from config.database import init_db, get_pool_stats, close_db, close_async_db, command_metrics, ping_db
+from config.indexes import ensure_indexes
+from services.cache import init_cache, get_cache
+from services.metrics import init_metrics, render_prometheus, request_metrics
+from services.profiling import init_profiling
+from services.password_hasher import init_password_hasher
+from utils.serialization import FastJSONProvider
+from services.categorizer import KeywordCategorizer, set_default_categorizer
+from services.worker_pool import shutdown_pools
 from routes.auth import auth_bp
 from routes.bills import bills_bp
 import os
@@ -10,31 +18,106 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+def create_app(config=None):
+    """Create and configure the Flask app; config overrides settings read from the environment"""
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    CORS(app)
+    
+    # Configuration
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-jwt-secret-key-change-in-production')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
+    app.config['MONGO_URI'] = os.getenv('MONGO_URI', 'mongodb://localhost:27017/grocery_bill_db')
+    app.config['MONGO_MAX_POOL_SIZE'] = int(os.getenv('MONGO_MAX_POOL_SIZE', 100))
+    app.config['MONGO_MIN_POOL_SIZE'] = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    app.config['MONGO_MAX_IDLE_TIME_MS'] = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 0)) or None
+    app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'] = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 0)) or None
+    app.config['MONGO_ENSURE_INDEXES'] = os.getenv('MONGO_ENSURE_INDEXES', 'false').lower() == 'true'
+    app.config['BILL_IMPORT_CHUNK_SIZE'] = int(os.getenv('BILL_IMPORT_CHUNK_SIZE', 1000))
+    app.config['CATEGORY_KEYWORDS_FILE'] = os.getenv('CATEGORY_KEYWORDS_FILE')
+    app.config['RECEIPT_PARSE_WORKERS'] = int(os.getenv('RECEIPT_PARSE_WORKERS', os.cpu_count() or 1))
+    app.config['RECEIPT_IMAGE_WORKERS'] = int(os.getenv('RECEIPT_IMAGE_WORKERS', 2))
+    app.config['RECEIPT_IMAGE_MAX_BYTES'] = int(os.getenv('RECEIPT_IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+    app.config['RECEIPT_IMAGE_MAX_PIXELS'] = int(os.getenv('RECEIPT_IMAGE_MAX_PIXELS', 40_000_000))
+    app.config['RECEIPT_IMAGE_MAX_DIMENSION'] = int(os.getenv('RECEIPT_IMAGE_MAX_DIMENSION', 2000))
+    app.config['RECEIPT_WORKER_MAX_MEMORY_MB'] = int(os.getenv('RECEIPT_WORKER_MAX_MEMORY_MB', 512))
+    app.config['RECEIPT_OCR_ENGINE'] = os.getenv('RECEIPT_OCR_ENGINE', 'tesseract')
+    app.config['RECEIPT_UPLOAD_DIR'] = os.getenv('RECEIPT_UPLOAD_DIR')
+    app.config['CACHE_LOCAL_MAX_ENTRIES'] = int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 1024))
+    app.config['CACHE_LOCAL_TTL'] = float(os.getenv('CACHE_LOCAL_TTL', 60))
+    app.config['CACHE_SHARED_BACKEND'] = os.getenv('CACHE_SHARED_BACKEND')
+    app.config['CACHE_SHARED_PATH'] = os.getenv('CACHE_SHARED_PATH', 'cache.sqlite3')
+    app.config['CACHE_SHARED_MAX_ENTRIES'] = int(os.getenv('CACHE_SHARED_MAX_ENTRIES', 100000))
+    app.config['CACHE_SHARED_TTL'] = float(os.getenv('CACHE_SHARED_TTL', 300))
+    app.config['USER_CACHE_MAX_ENTRIES'] = int(os.getenv('USER_CACHE_MAX_ENTRIES', 10000))
+    app.config['USER_CACHE_TTL'] = float(os.getenv('USER_CACHE_TTL', 5))
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    app.config['PASSWORD_HASH_MAX_QUEUE'] = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', 64))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+    app.config['PASSWORD_HASH_POOL'] = os.getenv('PASSWORD_HASH_POOL', 'thread')
+    app.config['HEALTH_CHECK_TIMEOUT_MS'] = int(os.getenv('HEALTH_CHECK_TIMEOUT_MS', 1000))
+    app.config['SERVER_TIMING_ENABLED'] = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    app.config['PROFILE_MODE'] = os.getenv('PROFILE_MODE', 'cprofile')
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_HEADER_ENABLED'] = os.getenv('PROFILE_HEADER_ENABLED', 'false').lower() == 'true'
+    app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', 'profiles')
+    if config:
+        app.config.update(config)
+    
+    # Initialize extensions
+    init_db(app)
+    init_cache(app)
+    init_password_hasher(app)
+    if app.config['MONGO_ENSURE_INDEXES']:
+        ensure_indexes()
+    if app.config['CATEGORY_KEYWORDS_FILE']:
+        set_default_categorizer(KeywordCategorizer.from_file(app.config['CATEGORY_KEYWORDS_FILE']))
+    JWTManager(app)
+    init_metrics(app)
+    init_profiling(app)
+    
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(bills_bp, url_prefix='/api/bills')
+    
+    @app.route('/')
+    def index():
+        return {'message': 'Grocery Bill API is running'}
+    
+    @app.route('/api/health')
+    def health_check():
+        """Readiness: 200 only if a ping gets through the Mongo pool in time"""
+        status = {'db_pool': get_pool_stats(), 'cache': get_cache().info()}
+        try:
+            ping_db(app.config['HEALTH_CHECK_TIMEOUT_MS'] / 1000)
+        except Exception as e:
+            return dict(status, status='unavailable', error=str(e)), 503
+        return dict(status, status='healthy'), 200
+    
+    @app.route('/metrics')
+    def metrics():
+        """This worker's request, Mongo command and pool metrics (Prometheus text, or ?format=json)"""
+        if request.args.get('format') == 'json':
+            return {
+                'pid': os.getpid(),
+                'requests': request_metrics.snapshot(),
+                'mongo_commands': command_metrics.snapshot(),
+                'db_pool': get_pool_stats()
+            }
+        return Response(render_prometheus(command_metrics, get_pool_stats()), mimetype='text/plain; version=0.0.4')
+    
+    return app
 
-# Configuration
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-jwt-secret-key-change-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
-app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
-app.config['MONGO_URI'] = os.getenv('MONGO_URI', 'mongodb://localhost:27017/grocery_bill_db')
+def shutdown_app():
+    """Release this process's resources: worker pools (finishing queued work) and Mongo clients"""
+    shutdown_pools(wait=True)
+    close_async_db()
+    close_db()
 
-# Initialize extensions
-init_db(app)
-jwt = JWTManager(app)
-
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(bills_bp, url_prefix='/api/bills')
-
-@app.route('/')
-def index():
-    return {'message': 'Grocery Bill API is running'}
-
-@app.route('/api/health')
-def health_check():
-    return {'status': 'healthy'}
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""ASGI entry point, run from the backend directory:
+
+    uvicorn asgi:application --workers 4
+
+The aggregation-heavy routes (analytics, shopping-list and best-deals) are
+served natively on the event loop with Motor, so their independent queries
+run concurrently and a slow query never ties up a thread. Every other
+route is the unchanged Flask blueprint code, run through asgiref's WSGI
+adapter on its thread pool.
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from pymongo import ASCENDING, DESCENDING
+from app import app, shutdown_app
+from config.database import get_async_db
+from models.analytics_rollup import AnalyticsRollup
+from models.bill import Bill
+from models.cache_version import CacheVersion
+from models.price_history import PriceHistory
+from services.analytics import RollupAnalytics
+from services.cache import get_cache, user_cache_key
+from services.item_catalog import item_key
+from services.metrics import request_metrics
+from services.price_tracker import PriceTracker
+from services.shopping_list import ShoppingListGenerator
+from utils.serialization import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+async def _cached(db, name, user_id, compute, *params):
+    """Async counterpart of TwoTierCache.get_or_set keyed by the user's cache version"""
+    version_doc = await db[CacheVersion.collection_name].find_one(CacheVersion.id_filter(user_id), {'version': 1})
+    key = user_cache_key(name, user_id, version_doc['version'] if version_doc else 0, *params)
+
+    cache = get_cache()
+    value = cache.get(key)
+    if value is None:
+        value = await compute()
+        cache.set(key, value)
+    return value
+
+async def analytics(db, user_id, params):
+    rollups = db[AnalyticsRollup.collection_name]
+
+    async def totals_from(direction, skip=0, limit=1):
+        cursor = db[Bill.collection_name].find(
+            Bill.user_filter(user_id), {'_id': 0, 'total': 1}
+        ).sort('total', direction).skip(skip).limit(limit)
+        return [doc.get('total', 0) async for doc in cursor]
+
+    async def compute():
+        # Only the median depends on another query (the summary's bill count)
+        summary, breakdown, items, lowest, highest = await asyncio.gather(
+            rollups.find_one(AnalyticsRollup.summary_filter(user_id)),
+            rollups.find(AnalyticsRollup.breakdown_filter(user_id)).to_list(None),
+            rollups.find(AnalyticsRollup.top_items_filter(user_id)).sort(AnalyticsRollup.TOP_ITEMS_ORDER).limit(10).to_list(None),
+            totals_from(ASCENDING),
+            totals_from(DESCENDING)
+        )
+        if not AnalyticsRollup.is_current(summary):
+            # One-off rebuild for users whose rollup predates their bills or this rollup version
+            rollup = await asyncio.to_thread(AnalyticsRollup.find_by_user, user_id)
+            total_stats = await asyncio.to_thread(Bill.find_total_stats, user_id, rollup['summary']['count'])
+            return RollupAnalytics(rollup, total_stats).analyze()
+
+        total_stats = None
+        if summary['count'] > 0:
+            skip, limit = Bill.median_window(summary['count'])
+            total_stats = Bill.total_stats_from(lowest, highest, await totals_from(ASCENDING, skip, limit))
+        return RollupAnalytics(AnalyticsRollup.assemble(summary, breakdown, items), total_stats).analyze()
+
+    return await _cached(db, 'analytics', user_id, compute)
+
+async def shopping_list(db, user_id, params):
+    days_back = _int_param(params, 'days', 30)
+
+    async def compute():
+        since = datetime.utcnow() - timedelta(days=days_back)
+        cursor = db[Bill.collection_name].aggregate(Bill.purchase_groups_pipeline(user_id, since))
+        return ShoppingListGenerator.build_from_groups(await cursor.to_list(None))
+
+    return await _cached(db, 'shopping-list', user_id, compute, days_back)
+
+async def best_deals(db, user_id, params):
+    async def compute():
+        latest = await db[Bill.collection_name].find_one(Bill.user_filter(user_id), sort=Bill.NEWEST_FIRST)
+        items = latest['items'] if latest else []
+        cursor = db[PriceHistory.stats_collection_name].find(
+            PriceHistory.stats_filter([item_key(item) for item in items], user_id)
+        )
+        stats = {doc['item_id']: doc async for doc in cursor}
+        return PriceTracker.deals_from_stats(items, stats)
+
+    return await _cached(db, 'best-deals', user_id, compute)
+
+# (pattern, Flask rule used as the metrics endpoint label, handler)
+NATIVE_ROUTES = [
+    (re.compile(r'^/api/bills/analytics/([^/]+)$'), '/api/bills/analytics/<user_id>', analytics),
+    (re.compile(r'^/api/bills/shopping-list/([^/]+)$'), '/api/bills/shopping-list/<user_id>', shopping_list),
+    (re.compile(r'^/api/bills/best-deals/([^/]+)$'), '/api/bills/best-deals/<user_id>', best_deals),
+]
+
+def _int_param(params, name, default):
+    """Like request.args.get(name, default, type=int)"""
+    try:
+        return int(params[name][0])
+    except (KeyError, ValueError):
+        return default
+
+async def _send_json(send, body, status):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            # Matches CORS(app) on the Flask routes
+            (b'access-control-allow-origin', b'*'),
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+class Application:
+    """Dispatch native async routes, and everything else to the Flask app"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi = WsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, rule, handler in NATIVE_ROUTES:
+                match = pattern.match(scope['path'])
+                if match:
+                    return await self._native(handler, rule, match.group(1), scope, send)
+
+        return await self.wsgi(scope, receive, send)
+
+    async def _native(self, handler, rule, user_id, scope, send):
+        params = parse_qs(scope.get('query_string', b'').decode())
+        started = time.perf_counter()
+        request_metrics.started('GET', rule)
+        try:
+            body, status = dumps_bytes(await handler(get_async_db(), user_id, params)), 200
+        except Exception as e:
+            logger.exception("Error in %s", scope['path'])
+            body, status = dumps_bytes({'error': str(e)}), 500
+        try:
+            await _send_json(send, body, status)
+        finally:
+            request_metrics.finished('GET', rule, status, time.perf_counter() - started)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                shutdown_app()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+application = Application(app)
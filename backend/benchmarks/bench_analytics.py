@@ -0,0 +1,78 @@
+"""Micro-benchmark BudgetAnalytics.analyze() against the individual methods.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_analytics [bill_count ...]
+
+Defaults to 1k, 100k and 1M bills. Both paths are timed over the same list;
+analyze() also accepts a generator, which the final check uses.
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from services.analytics import BudgetAnalytics
+
+ITEMS = [
+    ('Milk', 'Dairy'), ('Cheese', 'Dairy'), ('Bread', 'Bakery'), ('Apple', 'Fruits'),
+    ('Banana', 'Fruits'), ('Carrot', 'Vegetables'), ('Chicken', 'Meat'), ('Coffee', 'Beverages'),
+    ('Chips', 'Snacks'), ('Rice', 'General')
+]
+BILL_COUNTS = [1000, 100000, 1000000]
+
+
+def generate_bills(count, seed=42):
+    """Yield synthetic bill dicts shaped like Bill.to_dict()"""
+    rng = random.Random(seed)
+    start = datetime(2022, 1, 1)
+    for i in range(count):
+        items = []
+        for name, category in rng.sample(ITEMS, 4):
+            items.append({
+                'name': name,
+                'price': round(rng.uniform(0.5, 15), 2),
+                'quantity': rng.randint(1, 4),
+                'category': category
+            })
+        yield {
+            'user_id': 'bench',
+            'items': items,
+            'total': round(sum(item['price'] * item['quantity'] for item in items), 2),
+            'created_at': (start + timedelta(minutes=i * 7)).isoformat()
+        }
+
+
+def separate_methods(bills):
+    """Previous analytics route: five methods, monthly pass run twice"""
+    analytics = BudgetAnalytics(bills)
+    return {
+        'monthly_spending': analytics.calculate_monthly_spending(),
+        'category_breakdown': analytics.get_category_breakdown(),
+        'spending_trends': analytics.get_spending_trends(),
+        'top_items': analytics.get_top_items(),
+        'budget_prediction': analytics.predict_next_month_budget()
+    }
+
+
+def run(counts):
+    print(f"{'bills':>9} {'methods (s)':>12} {'analyze (s)':>12} {'speedup':>8}")
+    for count in counts:
+        bills = list(generate_bills(count))
+        start = time.perf_counter()
+        expected = separate_methods(bills)
+        methods = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = BudgetAnalytics(bills).analyze()
+        fused = time.perf_counter() - start
+        del bills
+
+        assert BudgetAnalytics(generate_bills(count)).analyze() == result
+        assert result['top_items'] == expected['top_items']
+        assert result['spending_trends']['median'] == expected['spending_trends']['median']
+        print(f"{count:>9} {methods:>12.3f} {fused:>12.3f} {methods / fused:>7.1f}x")
+
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or BILL_COUNTS)
@@ -0,0 +1,129 @@
+"""Load-test the aggregation routes over WSGI and ASGI at high concurrency.
+
+Run from the backend directory against a local mongod:
+
+    python -m benchmarks.bench_asgi [concurrency] [requests]
+
+Starts the Flask app on Werkzeug's threaded WSGI server and asgi:application
+on uvicorn, both with the response cache disabled, and drives the
+analytics, shopping-list and best-deals routes over keep-alive connections.
+The scratch database (BENCH_MONGO_URI) is dropped afterwards.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ['MONGO_URI'] = os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27017/grocery_bill_bench')
+
+from app import app  # noqa: F401  (configures the database)
+from benchmarks.bench_analytics import generate_bills
+from config.database import get_db
+from models.bill import Bill
+
+USERS = 20
+BILLS_PER_USER = 500
+SERVERS = {
+    'wsgi': [sys.executable, '-c',
+             'from werkzeug.serving import run_simple; from app import app; '
+             'run_simple("127.0.0.1", {port}, app, threaded=True)'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:application',
+             '--port', '{port}', '--log-level', 'warning'],
+}
+ROUTES = ['/api/bills/analytics/{user}', '/api/bills/shopping-list/{user}', '/api/bills/best-deals/{user}']
+
+
+def seed():
+    db = get_db()
+    db.bills.delete_many({})
+    db.analytics_rollups.delete_many({})
+    now = datetime.utcnow()
+    docs = []
+    for i, bill in enumerate(generate_bills(USERS * BILLS_PER_USER)):
+        bill['user_id'] = f'user{i % USERS}'
+        bill['items'] = Bill.normalize_items(bill['items'])
+        bill['discount'] = 0
+        bill['created_at'] = now - timedelta(hours=i)
+        docs.append(bill)
+    db.bills.insert_many(docs)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name):
+    port = free_port()
+    command = [part.format(port=port) for part in SERVERS[name]]
+    env = dict(os.environ, CACHE_LOCAL_TTL='0')
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{name} server did not start')
+
+
+async def client(port, paths, latencies):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for path in paths:
+        start = time.perf_counter()
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        assert b' 200 ' in status_line, status_line
+    writer.close()
+
+
+async def load(port, concurrency, total):
+    per_client = total // concurrency
+    latencies = []
+    clients = []
+    for c in range(concurrency):
+        paths = [ROUTES[(c + i) % len(ROUTES)].format(user=f'user{(c * 7 + i) % USERS}') for i in range(per_client)]
+        clients.append(client(port, paths, latencies))
+    start = time.perf_counter()
+    await asyncio.gather(*clients)
+    return sorted(latencies), time.perf_counter() - start
+
+
+def run(concurrency, total):
+    seed()
+    print(f"{'server':>6} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name in SERVERS:
+        process, port = start_server(name)
+        try:
+            asyncio.run(load(port, 3, 30))  # warm up connections and rollups
+            latencies, elapsed = asyncio.run(load(port, concurrency, total))
+        finally:
+            process.terminate()
+            process.wait()
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{name:>6} {concurrency:>5} {len(latencies) / elapsed:>8.0f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f}")
+    get_db().client.drop_database(get_db().name)
+
+
+if __name__ == '__main__':
+    conc = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    request_count = int(sys.argv[2]) if len(sys.argv) > 2 else 6000
+    run(conc, request_count)
@@ -0,0 +1,71 @@
+"""Benchmark BatchPricer against pricing each cart with Calculator.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_batch_pricing [cart_count ...]
+
+Times pricing from cart dicts and from the columnar request form. Every
+batch result is checked against the per-cart Calculator result. Speedup is
+per-cart over columnar.
+"""
+import random
+import sys
+import time
+
+from services.batch_pricing import BatchPricer
+from services.calculator import Calculator
+
+CART_COUNTS = [100, 10000, 100000]
+
+
+def generate_carts(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            'items': [
+                {'price': round(rng.uniform(0.1, 50), 2), 'quantity': rng.randint(1, 6)}
+                for _ in range(rng.randint(1, 30))
+            ],
+            'discount': rng.choice([0, 0, 1, 2.5, 5])
+        }
+        for _ in range(count)
+    ]
+
+
+def calculate_each(carts):
+    """Previous path: one /calculate computation per cart"""
+    calculator = Calculator()
+    results = []
+    for cart in carts:
+        subtotal = calculator.calculate_subtotal(cart['items'])
+        tax = calculator.calculate_tax(subtotal)
+        total = calculator.calculate_total(subtotal, tax, cart['discount'])
+        results.append({'subtotal': subtotal, 'tax': tax, 'discount': cart['discount'], 'total': total})
+    return results
+
+
+def run(counts):
+    print(f"{'carts':>7} {'per-cart (s)':>13} {'batch (s)':>10} {'columnar (s)':>13} {'speedup':>8}")
+    for count in counts:
+        carts = generate_carts(count)
+
+        start = time.perf_counter()
+        expected = calculate_each(carts)
+        scalar = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = BatchPricer().price_carts(carts)
+        batch = time.perf_counter() - start
+
+        columns = {name: values.tolist() for name, values in BatchPricer.to_columns(carts).items()}
+        start = time.perf_counter()
+        columnar_results = BatchPricer().price_columnar(columns)
+        columnar = time.perf_counter() - start
+
+        assert results == expected, 'batch pricing diverged from Calculator'
+        assert columnar_results['total'] == [result['total'] for result in expected]
+        print(f"{count:>7} {scalar:>13.3f} {batch:>10.3f} {columnar:>13.3f} {scalar / columnar:>7.1f}x")
+
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or CART_COUNTS)
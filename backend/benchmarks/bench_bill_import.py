@@ -0,0 +1,42 @@
+"""Benchmark bulk bill import throughput against a local mongod.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_bill_import [bill_count] [chunk_size ...]
+
+Bills are imported into a scratch database (BENCH_MONGO_URI) which is
+dropped afterwards.
+"""
+import json
+import os
+import sys
+import time
+
+os.environ['MONGO_URI'] = os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27017/grocery_bill_bench')
+
+from app import app  # noqa: F401  (configures the database)
+from benchmarks.bench_analytics import generate_bills
+from config.database import get_db
+from services.bill_importer import BillImporter
+
+CHUNK_SIZES = [100, 1000, 5000]
+
+
+def run(count, chunk_sizes):
+    lines = [json.dumps(bill) + '\n' for bill in generate_bills(count)]
+    print(f"{'chunk':>6} {'bills':>8} {'seconds':>8} {'bills/s':>9}")
+    for chunk_size in chunk_sizes:
+        db = get_db()
+        db.bills.delete_many({})
+        db.analytics_rollups.delete_many({})
+
+        start = time.perf_counter()
+        result = BillImporter(chunk_size=chunk_size).import_ndjson(lines)
+        elapsed = time.perf_counter() - start
+        print(f"{chunk_size:>6} {result['inserted']:>8} {elapsed:>8.2f} {result['inserted'] / elapsed:>9.0f}")
+    get_db().client.drop_database(get_db().name)
+
+
+if __name__ == '__main__':
+    bill_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    run(bill_count, [int(arg) for arg in sys.argv[2:]] or CHUNK_SIZES)
@@ -0,0 +1,80 @@
+"""Measure allocations and time per bill on the bill read path.
+
+Run from the backend directory (no database needed):
+
+    python -m benchmarks.bench_bill_serialization [bill_count]
+
+Compares the previous path (document -> Bill.__init__ -> to_dict ->
+stdlib json) with the current one (document -> document_to_dict ->
+dumps_bytes), over BSON-shaped documents with ObjectIds and datetimes.
+"""
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from bson import ObjectId
+
+from benchmarks.bench_analytics import generate_bills
+from models.bill import Bill
+from utils.serialization import dumps_bytes
+
+
+def documents(count):
+    """Bill documents as pymongo returns them"""
+    docs = []
+    for bill in generate_bills(count):
+        bill['_id'] = ObjectId()
+        bill['discount'] = 0
+        bill['created_at'] = datetime.fromisoformat(bill['created_at'])
+        docs.append(bill)
+    return docs
+
+
+def previous_path(doc):
+    bill = Bill(
+        user_id=doc['user_id'],
+        items=doc['items'],
+        total=doc['total'],
+        discount=doc.get('discount', 0),
+        bill_id=str(doc['_id']),
+        created_at=doc.get('created_at')
+    )
+    return json.dumps(bill.to_dict()).encode()
+
+
+def current_path(doc):
+    return dumps_bytes(Bill.document_to_dict(doc))
+
+
+def measure(fn, docs):
+    """Average peak bytes allocated while serializing one bill, and time per bill"""
+    tracemalloc.start()
+    peaks = 0
+    for doc in docs:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn(doc)
+        peaks += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    output = [fn(doc) for doc in docs]
+    elapsed = time.perf_counter() - start
+    return peaks / len(docs), elapsed / len(docs), output
+
+
+def run(count):
+    docs = documents(count)
+    print(f"{'path':<10} {'peak B/bill':>12} {'us/bill':>9}")
+    results = {}
+    for name, fn in [('previous', previous_path), ('current', current_path)]:
+        peak, seconds, output = measure(fn, docs)
+        results[name] = output
+        print(f"{name:<10} {peak:>12.0f} {seconds * 1e6:>9.2f}")
+    assert [json.loads(a) for a in results['previous']] == [json.loads(b) for b in results['current']]
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
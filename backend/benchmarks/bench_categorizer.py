@@ -0,0 +1,70 @@
+"""Benchmark KeywordCategorizer against the previous per-call keyword scan.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_categorizer [name_count]
+
+Compares the built-in table and a synthetic table of several thousand
+keywords, with all-distinct names (cache misses) and a realistic mix of
+repeated names. Results are checked against the previous implementation.
+"""
+import random
+import string
+import sys
+import time
+
+from services.categorizer import DEFAULT_CATEGORIES, KeywordCategorizer
+
+
+def scan_categorize(item_name, categories):
+    """Previous ReceiptOCRService._categorize_item"""
+    item_lower = item_name.lower()
+    for category, keywords in categories.items():
+        if any(keyword in item_lower for keyword in keywords):
+            return category
+    return 'General'
+
+
+def large_table(category_count=50, keywords_per_category=100, seed=3):
+    rng = random.Random(seed)
+    return {
+        f'Category {c}': [
+            ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+            for _ in range(keywords_per_category)
+        ]
+        for c in range(category_count)
+    }
+
+
+def item_names(categories, count, distinct, seed=5):
+    rng = random.Random(seed)
+    keywords = [keyword for words in categories.values() for keyword in words]
+    pool = [
+        f"{rng.choice(['Fresh', 'Organic', 'Store', 'Large'])} {rng.choice(keywords).title()} "
+        f"{rng.randint(1, 10 ** 6)}"
+        for _ in range(distinct)
+    ]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def time_run(fn, names):
+    start = time.perf_counter()
+    results = [fn(name) for name in names]
+    return time.perf_counter() - start, results
+
+
+def run(count):
+    print(f"{'table':>8} {'names':>9} {'scan (s)':>9} {'automaton (s)':>14} {'speedup':>8}")
+    for table_name, categories in [('default', DEFAULT_CATEGORIES), ('large', large_table())]:
+        for label, distinct in [('distinct', count), ('repeated', 500)]:
+            names = item_names(categories, count, distinct)
+            scan, expected = time_run(lambda name: scan_categorize(name, categories), names)
+            categorizer = KeywordCategorizer(categories)
+            compiled, results = time_run(categorizer.categorize, names)
+
+            assert results == expected, 'categorizer diverged from keyword scan'
+            print(f"{table_name:>8} {label:>9} {scan:>9.3f} {compiled:>14.3f} {scan / compiled:>7.1f}x")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,77 @@
+"""Load-test /api/auth/me latency with and without the user profile cache.
+
+Run from the backend directory against a local mongod:
+
+    python -m benchmarks.bench_me [requests] [threads]
+
+Requests go through Flask's test client from concurrent threads, so the
+numbers cover routing, JWT decoding and the user lookup but not the
+network. The scratch database (BENCH_MONGO_URI) is dropped afterwards.
+"""
+import os
+import sys
+import threading
+import time
+
+os.environ['MONGO_URI'] = os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27017/grocery_bill_bench')
+
+from flask_jwt_extended import create_access_token
+from app import app
+from config.database import get_db
+from models.user import User
+from services.cache import init_cache
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def load(token, total, threads):
+    headers = {'Authorization': f'Bearer {token}'}
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = app.test_client()
+        local = []
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.get('/api/auth/me', headers=headers)
+            local.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_json()
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(total // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return sorted(latencies), elapsed
+
+
+def run(total, threads):
+    db = get_db()
+    db.users.delete_many({})
+    user = User(username='bench', email='bench@example.com', password='Bench-pass-1')
+    user._id = db.users.insert_one(user.to_mongo()).inserted_id
+    with app.app_context():
+        token = create_access_token(identity=str(user._id), additional_claims={'role': user.role})
+
+    print(f"{'cache':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, ttl in [('off', 0), ('on', 5)]:
+        app.config['USER_CACHE_TTL'] = ttl
+        init_cache(app)
+        latencies, elapsed = load(token, total, threads)
+        print(f"{label:>6} {len(latencies) / elapsed:>8.0f} "
+              f"{percentile(latencies, 50) * 1000:>8.2f} {percentile(latencies, 99) * 1000:>8.2f}")
+    db.client.drop_database(db.name)
+
+
+if __name__ == '__main__':
+    request_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    thread_count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    run(request_count, thread_count)
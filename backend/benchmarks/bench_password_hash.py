@@ -0,0 +1,67 @@
+"""Benchmark login password verification throughput per hash configuration.
+
+Run from the backend directory (no database needed):
+
+    python -m benchmarks.bench_password_hash [seconds] [method ...]
+
+Each method is verified concurrently through PasswordHasher's bounded
+pool, once per worker count, and reported as logins/sec and logins/sec
+per core actually used.
+"""
+import os
+import sys
+import threading
+import time
+
+from services.password_hasher import HasherBusy, PasswordHasher
+from services.worker_pool import shutdown_pools
+
+METHODS = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000']
+PASSWORD = 'Bench-pass-1'
+
+
+def measure(method, workers, seconds):
+    hasher = PasswordHasher(method, workers=workers, max_queue=workers)
+    password_hash = hasher.hash(PASSWORD)
+    deadline = time.perf_counter() + seconds
+    counts = {'ok': 0, 'busy': 0}
+    lock = threading.Lock()
+
+    def client():
+        ok = busy = 0
+        while time.perf_counter() < deadline:
+            try:
+                assert hasher.verify_bounded(password_hash, PASSWORD)
+                ok += 1
+            except HasherBusy:
+                busy += 1
+                time.sleep(0.01)
+        with lock:
+            counts['ok'] += ok
+            counts['busy'] += busy
+
+    # Twice as many clients as slots, so the queue limit is exercised
+    clients = [threading.Thread(target=client) for _ in range(workers * 4)]
+    start = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    shutdown_pools()
+    return counts['ok'] / elapsed, counts['busy']
+
+
+def run(seconds, methods):
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, cores})
+    print(f"{'method':<24} {'workers':>7} {'logins/s':>9} {'per core':>9} {'429s':>6}")
+    for method in methods:
+        for workers in worker_counts:
+            rate, busy = measure(method, workers, seconds)
+            print(f"{method:<24} {workers:>7} {rate:>9.1f} {rate / min(workers, cores):>9.1f} {busy:>6}")
+
+
+if __name__ == '__main__':
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    run(duration, sys.argv[2:] or METHODS)
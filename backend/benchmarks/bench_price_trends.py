@@ -0,0 +1,87 @@
+"""Benchmark GET /api/bills/price-trends/<item_name> against bill count.
+
+Run from the backend directory against a local mongod:
+
+    python -m benchmarks.bench_price_trends
+
+Bills are seeded into a scratch database (BENCH_MONGO_URI) which is dropped
+afterwards.
+"""
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+os.environ['MONGO_URI'] = os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27017/grocery_bill_bench')
+
+from app import app
+from config.database import get_db
+from models.bill import Bill
+from services.price_tracker import PriceTracker
+
+ITEM_NAMES = ['Milk', 'Bread', 'Eggs', 'Apple', 'Banana', 'Chicken', 'Rice', 'Coffee', 'Cheese', 'Tomato']
+BILL_COUNTS = [1000, 10000, 100000]
+REPEAT = 10
+
+
+def seed_bills(count):
+    """Insert synthetic bills for a handful of users"""
+    collection = Bill.get_collection()
+    collection.delete_many({})
+    start = datetime.utcnow() - timedelta(days=365)
+    batch = []
+    for i in range(count):
+        items = [{
+            'name': name,
+            'price': round(random.uniform(0.5, 15), 2),
+            'quantity': random.randint(1, 5),
+            'category': 'General'
+        } for name in random.sample(ITEM_NAMES, 4)]
+        batch.append({
+            'user_id': f'user{i % 50}',
+            'items': Bill.normalize_items(items),
+            'total': 0,
+            'discount': 0,
+            'created_at': start + timedelta(minutes=i)
+        })
+        if len(batch) == 1000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def scan_price_trend(item_name):
+    """Previous implementation: full collection scan filtered in Python"""
+    tracker = PriceTracker()
+    for bill in Bill.get_collection().find():
+        for item in bill.get('items', []):
+            if item.get('name').lower() == item_name.lower():
+                tracker.add_item_price(item.get('name'), item.get('price'), bill.get('created_at'))
+    return tracker.get_price_trend(item_name)
+
+
+def time_ms(fn):
+    """Median wall time of fn in milliseconds"""
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def run():
+    client = app.test_client()
+    print(f"{'bills':>8} {'scan (ms)':>12} {'route (ms)':>12}")
+    for count in BILL_COUNTS:
+        seed_bills(count)
+        scan = time_ms(lambda: scan_price_trend('Milk'))
+        route = time_ms(lambda: client.get('/api/bills/price-trends/milk'))
+        print(f"{count:>8} {scan:>12.2f} {route:>12.2f}")
+    get_db().client.drop_database(get_db().name)
+
+
+if __name__ == '__main__':
+    run()
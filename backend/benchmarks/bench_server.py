@@ -0,0 +1,88 @@
+"""Report gunicorn cold-start time and memory per worker, with and without preload_app.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_server [workers] [threads]
+
+Cold start is the time from launching gunicorn until every worker has
+answered /api/health. Memory is read from /proc (Linux only): RSS counts
+pages shared with the master, while PSS splits them between sharers, so
+PSS is what each worker really costs.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+PRELOAD_MODES = ['false', 'true']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def memory_kb(pid):
+    """RSS and PSS of a process in kB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                values[name] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+
+def cold_start(workers, threads, preload):
+    port = free_port()
+    env = dict(os.environ, WEB_BIND=f'127.0.0.1:{port}', WEB_WORKERS=str(workers),
+               WEB_THREADS=str(threads), WEB_PRELOAD=preload)
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app'], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        seen = set()
+        deadline = time.monotonic() + 120
+        while len(seen) < workers and time.monotonic() < deadline:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1) as response:
+                    seen.add(json.loads(response.read())['db_pool']['pid'])
+            except urllib.error.HTTPError as e:
+                # 503 without a reachable mongod still proves the worker is serving
+                seen.add(json.loads(e.read())['db_pool']['pid'])
+            except OSError:
+                time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        pids = worker_pids(process.pid)
+        usage = [memory_kb(pid) for pid in pids]
+        master = memory_kb(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+    return elapsed, len(seen), master, usage
+
+
+def run(workers, threads):
+    print(f"{'preload':>7} {'workers':>7} {'cold start s':>12} {'master RSS MB':>13} "
+          f"{'worker RSS MB':>13} {'worker PSS MB':>13}")
+    for preload in PRELOAD_MODES:
+        elapsed, ready, master, usage = cold_start(workers, threads, preload)
+        rss = sum(u[0] for u in usage) / len(usage) / 1024
+        pss = sum(u[1] for u in usage) / len(usage) / 1024
+        print(f"{preload:>7} {ready:>7} {elapsed:>12.2f} {master[0] / 1024:>13.1f} {rss:>13.1f} {pss:>13.1f}")
+
+
+if __name__ == '__main__':
+    worker_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    thread_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    run(worker_count, thread_count)
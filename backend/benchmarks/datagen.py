@@ -0,0 +1,103 @@
+"""Synthetic users, bills and receipts for benchmarks.
+
+Produces N users x M bills x K items drawn from a catalog of realistic
+grocery names, with the categorizer's categories and per-item base
+prices that drift over time and occasionally go on promotion. Everything
+is seeded, so a given set of parameters always yields the same data.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from services.receipt_images import OCREngine
+
+# (category, base price range, item names)
+CATALOG_SPEC = [
+    ('Fruits', (0.4, 4.0), ['Apple', 'Banana', 'Orange', 'Grapes', 'Strawberry', 'Blueberry', 'Mango', 'Pear']),
+    ('Vegetables', (0.5, 3.5), ['Carrot', 'Tomato', 'Lettuce', 'Onion', 'Potato', 'Broccoli', 'Cucumber', 'Spinach']),
+    ('Dairy', (1.0, 7.0), ['Milk', 'Cheddar Cheese', 'Greek Yogurt', 'Butter', 'Cream', 'Mozzarella Cheese']),
+    ('Meat', (3.0, 18.0), ['Chicken Breast', 'Ground Beef', 'Pork Chops', 'Salmon Fish', 'Turkey Slices', 'Beef Steak']),
+    ('Bakery', (1.0, 6.0), ['White Bread', 'Bagels', 'Croissant Pastry', 'Chocolate Cake', 'Cookies', 'Hamburger Buns']),
+    ('Beverages', (0.8, 9.0), ['Orange Juice', 'Cola Soda', 'Sparkling Water', 'Green Tea', 'Ground Coffee']),
+    ('Snacks', (1.0, 5.0), ['Potato Chips', 'Candy Bar', 'Dark Chocolate', 'Mixed Nuts', 'Popcorn']),
+    ('General', (0.8, 12.0), ['Rice', 'Pasta', 'Olive Oil', 'Eggs', 'Flour', 'Sugar', 'Paper Towels', 'Dish Soap']),
+]
+VARIANTS = ['', 'Organic ', 'Store Brand ', 'Family Size ']
+PROMO_RATE = 0.1
+
+
+def build_catalog(seed: int = 0) -> List[Tuple[str, str, float]]:
+    """(name, category, base price) for every item and variant; an entry's position + 1 is its item_id"""
+    rng = random.Random(seed)
+    catalog = []
+    for category, (low, high), names in CATALOG_SPEC:
+        for name in names:
+            base = rng.uniform(low, high)
+            for variant in VARIANTS:
+                multiplier = {'Organic ': 1.4, 'Store Brand ': 0.8, 'Family Size ': 1.9}.get(variant, 1.0)
+                catalog.append((variant + name, category, round(base * multiplier, 2)))
+    return catalog
+
+
+def generate_users(count: int, prefix: str = 'benchuser') -> List[Dict]:
+    return [{
+        'username': f'{prefix}{i}',
+        'email': f'{prefix}{i}@example.com',
+        'password': 'Bench-pass-1!'
+    } for i in range(count)]
+
+
+def generate_bills(user_ids: List[str], bills_per_user: int, items_per_bill: int, seed: int = 42,
+                   days: int = 365, end: Optional[datetime] = None) -> Iterator[Dict]:
+    """Yield bill documents (as stored in Mongo, without _id) spread over the last ``days`` days"""
+    rng = random.Random(seed)
+    catalog = [(item_id, *entry) for item_id, entry in enumerate(build_catalog(seed), start=1)]
+    end = end or datetime.utcnow()
+    span = timedelta(days=days)
+    for user_index, user_id in enumerate(user_ids):
+        # Each user mostly buys from their own favourites
+        favourites = rng.sample(catalog, min(len(catalog), items_per_bill * 3))
+        for bill_index in range(bills_per_user):
+            created_at = end - span * (1 - (bill_index + rng.random()) / bills_per_user)
+            drift = 1 + 0.15 * (created_at - (end - span)) / span
+            items = []
+            for item_id, name, category, base in rng.sample(favourites, min(items_per_bill, len(favourites))):
+                price = base * drift * rng.uniform(0.9, 1.1)
+                if rng.random() < PROMO_RATE:
+                    price *= rng.uniform(0.6, 0.85)
+                items.append({
+                    'item_id': item_id,
+                    'name': name,
+                    'price': round(price, 2),
+                    'quantity': rng.choice((1, 1, 1, 2, 2, 3)),
+                    'category': category
+                })
+            subtotal = round(sum(item['price'] * item['quantity'] for item in items), 2)
+            yield {
+                'user_id': user_id,
+                'items': items,
+                'total': round(subtotal * 1.08, 2),
+                'discount': 0,
+                'created_at': created_at
+            }
+
+
+def receipt_text(bill: Dict) -> str:
+    """Render a bill as the plain-text receipt the OCR parser consumes"""
+    lines = ['FRESH MART #0421', bill['created_at'].strftime('%m/%d/%Y %H:%M'), '']
+    for item in bill['items']:
+        for _ in range(item['quantity']):
+            lines.append(f"{item['name'].upper():<28}${item['price']:.2f}")
+    lines += ['', f"TOTAL ${bill['total']:.2f}", 'THANK YOU']
+    return '\n'.join(lines)
+
+
+class FixedTextEngine(OCREngine):
+    """OCR stand-in for load tests: ignores the image and returns a generated receipt"""
+
+    def __init__(self):
+        bill = next(generate_bills(['ocr'], 1, 12, seed=7))
+        self.text = receipt_text(bill)
+
+    def image_to_text(self, image):
+        return self.text
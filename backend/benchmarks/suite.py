@@ -0,0 +1,446 @@
+"""Benchmark suite: service micro-benchmarks and HTTP scenarios for every route.
+
+Run from the backend directory:
+
+    python -m benchmarks.suite run [--users N] [--bills M] [--items K]
+                                   [--only micro|http] [--backend mongo|mock]
+                                   [--requests R] [--concurrency C] [--cache]
+                                   [--output results.json]
+    python -m benchmarks.suite compare base.json head.json [--threshold 0.10]
+
+Micro-benchmarks time Calculator, BudgetAnalytics, PriceTracker,
+ShoppingListGenerator and ReceiptOCRService over generated data. HTTP
+scenarios drive every route in routes/bills.py and routes/auth.py through
+the full WSGI stack with Flask's test client, against a scratch database
+on a local mongod (BENCH_MONGO_URI, dropped afterwards) or an in-process
+mongomock client (--backend mock; mongomock is not thread-safe, so keep
+--concurrency at 1 with it). Response caching is disabled unless
+--cache is given, so scenarios measure the uncached path.
+
+Results are JSON: run metadata (commit, parameters, machine) and one
+record per benchmark with ops/sec and latency percentiles. ``compare``
+reports each benchmark's p50 change and exits non-zero when any slowed
+down by more than the threshold.
+"""
+import argparse
+import base64
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from benchmarks import datagen
+
+
+def summarize(suite, name, latencies, elapsed, statuses=None):
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def percentile(pct):
+        return round(latencies[min(count - 1, int(count * pct / 100))] * 1000, 4)
+
+    record = {
+        'suite': suite,
+        'name': name,
+        'iterations': count,
+        'ops_per_sec': round(count / elapsed, 2),
+        'mean_ms': round(sum(latencies) / count * 1000, 4),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+    }
+    if statuses is not None:
+        record['statuses'] = statuses
+    return record
+
+
+def time_calls(fn, min_time=0.5, min_calls=5):
+    """Call fn repeatedly for at least min_time seconds, returning per-call latencies"""
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < min_calls or time.perf_counter() - start < min_time:
+        call_start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_start)
+    return latencies, time.perf_counter() - start
+
+
+def micro_benchmarks(args):
+    from services.analytics import BudgetAnalytics
+    from services.calculator import Calculator
+    from services.ocr_service import ReceiptOCRService
+    from services.price_tracker import PriceTracker
+    from services.quantile_sketch import TDigest
+    from services.shopping_list import ShoppingListGenerator
+
+    docs = list(datagen.generate_bills(['micro'], args.bills, args.items))
+    bills = [dict(doc, created_at=doc['created_at'].isoformat()) for doc in docs]
+    receipts = itertools.cycle([datagen.receipt_text(doc) for doc in docs[:100]])
+    item_name = docs[0]['items'][0]['name']
+    prices = [item['price'] for doc in docs for item in doc['items'] if item['name'] == item_name]
+    digests = {}
+    for doc in docs:
+        for item in doc['items']:
+            digests.setdefault(item['item_id'], []).append(item['price'])
+    for item_id, item_prices in digests.items():
+        digests[item_id] = TDigest()
+        digests[item_id].update(item_prices)
+    cart = docs[-1]['items']
+    cart_keys = [item['item_id'] for item in cart]
+    sketch_batch = [doc['items'][0]['price'] for doc in docs[:256]]
+    calculator = Calculator()
+    ocr = ReceiptOCRService()
+    bill_cycle = itertools.cycle(bills)
+
+    def calculate():
+        items = next(bill_cycle)['items']
+        subtotal = calculator.calculate_subtotal(items)
+        calculator.calculate_total(subtotal, calculator.calculate_tax(subtotal))
+
+    cases = [
+        ('calculator.total_per_bill', calculate),
+        (f'budget_analytics.analyze[{args.bills}]', lambda: BudgetAnalytics(bills).analyze()),
+        (f'price_tracker.get_price_trend[{len(prices)}]', lambda: PriceTracker().get_price_trend(item_name, prices)),
+        (f'price_tracker.best_deals_for[{args.bills}]', lambda: PriceTracker.best_deals_for(bills)),
+        (f'price_tracker.price_check[{len(cart)}]', lambda: PriceTracker.price_check(cart, cart_keys, digests)),
+        ('quantile_sketch.update[256]', lambda: TDigest().update(sketch_batch)),
+        (f'shopping_list.build[{args.bills}]', lambda: ShoppingListGenerator(bills).build(30)),
+        ('ocr.parse_receipt_text', lambda: ocr.parse_receipt_text(next(receipts))),
+    ]
+    results = []
+    for name, fn in cases:
+        latencies, elapsed = time_calls(fn)
+        results.append(summarize('micro', name, latencies, elapsed))
+        print(f"  {name:<45} {results[-1]['ops_per_sec']:>12.1f} ops/s  p50 {results[-1]['p50_ms']:.3f} ms")
+    return results
+
+
+class HttpBench:
+    """Seeded app plus the request scenarios for every route"""
+
+    def __init__(self, args):
+        self.args = args
+        os.environ['MONGO_URI'] = os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27017/grocery_bill_bench')
+        if not args.cache:
+            os.environ['CACHE_LOCAL_TTL'] = '0'
+            os.environ['USER_CACHE_TTL'] = '0'
+        os.environ['RECEIPT_OCR_ENGINE'] = 'benchmarks.datagen:FixedTextEngine'
+
+        from app import app
+        from config.database import get_db, set_client
+        from config.indexes import ensure_indexes
+        if args.backend == 'mock':
+            try:
+                import mongomock
+            except ImportError:
+                raise RuntimeError('--backend mock requires the mongomock package')
+            set_client(mongomock.MongoClient())
+        ensure_indexes()
+        self.app = app
+        self.db = get_db()
+        self.counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def seed(self):
+        from flask_jwt_extended import create_access_token, create_refresh_token
+        from models.analytics_rollup import AnalyticsRollup
+        from models.bill import Bill
+        from models.migration import Migration
+        from models.price_history import PriceHistory
+        from models.price_sketch import PriceSketch
+        from models.user import User
+        from services.password_hasher import get_password_hasher
+
+        args = self.args
+        for name in ('users', 'bills', 'analytics_rollups', 'cache_versions', 'receipt_jobs', Migration.collection_name,
+                     PriceHistory.collection_name, PriceHistory.stats_collection_name, PriceSketch.collection_name):
+            self.db[name].delete_many({})
+
+        # One hash shared by every seeded user keeps seeding fast at any hash cost
+        self.password = datagen.generate_users(1)[0]['password']
+        password_hash = get_password_hasher().hash(self.password)
+        users = datagen.generate_users(args.users) + datagen.generate_users(args.requests, prefix='disposable')
+        user_docs = []
+        for user in users:
+            doc = User(user['username'], user['email'], role='customer').to_mongo()
+            doc['password_hash'] = password_hash
+            user_docs.append(doc)
+        admin = User('benchadmin', 'benchadmin@admin.com', role='admin').to_mongo()
+        admin['password_hash'] = password_hash
+        user_docs.append(admin)
+        self.db.users.insert_many(user_docs)
+
+        self.user_ids = [str(doc['_id']) for doc in user_docs[:args.users]]
+        self.usernames = [user['username'] for user in users[:args.users]]
+        self.disposable_ids = [str(doc['_id']) for doc in user_docs[args.users:-1]]
+
+        bills = []
+        for doc in datagen.generate_bills(self.user_ids, args.bills, args.items):
+            doc['items'] = Bill.normalize_items(doc['items'])
+            bills.append(doc)
+            if len(bills) == 5000:
+                self.db.bills.insert_many(bills)
+                bills = []
+        if bills:
+            self.db.bills.insert_many(bills)
+        # Seeded items already carry catalog IDs, so there is nothing to backfill
+        Migration.mark_done(Bill.BACKFILL)
+        PriceHistory.ensure_built()
+        PriceSketch.ensure_built()
+        for user_id in self.user_ids:
+            AnalyticsRollup.rebuild(user_id)
+
+        self.bill_ids = [str(doc['_id']) for doc in self.db.bills.find({}, {'_id': 1}).limit(1000)]
+        self.item_names = sorted(self.db.bills.distinct('items.name'))
+        self.history_from = (datetime.utcnow() - timedelta(days=90)).date().isoformat()
+        sample = list(datagen.generate_bills(['sample'], 20, self.args.items, seed=3))
+        self.sample_items = [bill['items'] for bill in sample]
+        self.receipts = [datagen.receipt_text(bill) for bill in sample]
+
+        with self.app.app_context():
+            self.tokens = [create_access_token(identity=user_id, additional_claims={'role': 'customer'})
+                           for user_id in self.user_ids]
+            self.refresh_tokens = [create_refresh_token(identity=user_id) for user_id in self.user_ids]
+            self.admin_token = create_access_token(identity=str(admin['_id']), additional_claims={'role': 'admin'})
+
+        from PIL import Image
+        image = io.BytesIO()
+        Image.new('L', (400, 600), color=255).save(image, format='PNG')
+        self.image_b64 = base64.b64encode(image.getvalue()).decode()
+        self.job_ids = []
+
+    def next(self):
+        with self._lock:
+            return next(self.counter)
+
+    def pick(self, values):
+        return values[self.next() % len(values)]
+
+    def take(self, values):
+        with self._lock:
+            return values.pop() if values else None
+
+    def scenarios(self):
+        """(name, build) where build() returns (method, path, kwargs)"""
+        def auth(token):
+            return {'Authorization': f'Bearer {token}'}
+
+        def cart():
+            return {'items': self.pick(self.sample_items)}
+
+        def import_body():
+            lines = [json.dumps({'user_id': self.pick(self.user_ids), 'items': items})
+                     for items in self.sample_items[:10]]
+            return '\n'.join(lines) + '\n'
+
+        def create_bill():
+            return 'POST', '/api/bills/', {'json': {'user_id': self.pick(self.user_ids), **cart()}}
+
+        def delete_bill():
+            bill_id = self.take(self.created_bill_ids)
+            return 'DELETE', f'/api/bills/{bill_id}', {}
+
+        def user_bills_page():
+            return 'GET', f'/api/bills/user/{self.pick(self.user_ids)}?limit=50', {}
+
+        def receipt_job():
+            return 'POST', '/api/bills/receipt-jobs', {'json': {'image': self.image_b64}}
+
+        def receipt_job_status():
+            return 'GET', f'/api/bills/receipt-jobs/{self.pick(self.job_ids)}', {}
+
+        def register():
+            n = self.next()
+            return 'POST', '/api/auth/register', {'json': {
+                'username': f'registered{n}', 'email': f'registered{n}@example.com', 'password': self.password}}
+
+        def login():
+            return 'POST', '/api/auth/login', {'json': {'username': self.pick(self.usernames), 'password': self.password}}
+
+        return [
+            ('POST /api/bills/calculate', lambda: ('POST', '/api/bills/calculate', {'json': cart()})),
+            ('POST /api/bills/calculate/batch', lambda: ('POST', '/api/bills/calculate/batch',
+                                                         {'json': {'carts': [cart() for _ in range(100)]}})),
+            ('POST /api/bills/', create_bill),
+            ('POST /api/bills/import', lambda: ('POST', '/api/bills/import', {
+                'data': import_body(), 'content_type': 'application/x-ndjson'})),
+            ('GET /api/bills/<bill_id>', lambda: ('GET', f'/api/bills/{self.pick(self.bill_ids)}', {})),
+            ('GET /api/bills/user/<user_id>', lambda: ('GET', f'/api/bills/user/{self.pick(self.user_ids)}', {})),
+            ('GET /api/bills/user/<user_id>?limit', user_bills_page),
+            ('GET /api/bills/user/<user_id>?stream', lambda: (
+                'GET', f'/api/bills/user/{self.pick(self.user_ids)}?stream=ndjson', {})),
+            ('DELETE /api/bills/<bill_id>', delete_bill),
+            ('GET /api/bills/analytics/<user_id>', lambda: ('GET', f'/api/bills/analytics/{self.pick(self.user_ids)}', {})),
+            ('GET /api/bills/price-trends/<item_name>', lambda: (
+                'GET', f'/api/bills/price-trends/{self.pick(self.item_names)}', {})),
+            ('GET /api/bills/price-history/<item_name>', lambda: (
+                'GET', f'/api/bills/price-history/{self.pick(self.item_names)}?from=' + self.history_from, {})),
+            ('POST /api/bills/price-check', lambda: ('POST', '/api/bills/price-check', {'json': cart()})),
+            ('GET /api/bills/shopping-list/<user_id>', lambda: (
+                'GET', f'/api/bills/shopping-list/{self.pick(self.user_ids)}', {})),
+            ('GET /api/bills/best-deals/<user_id>', lambda: ('GET', f'/api/bills/best-deals/{self.pick(self.user_ids)}', {})),
+            ('POST /api/bills/parse-receipt', lambda: ('POST', '/api/bills/parse-receipt', {
+                'json': {'text': self.pick(self.receipts)}})),
+            ('POST /api/bills/parse-receipts', lambda: ('POST', '/api/bills/parse-receipts', {
+                'json': {'receipts': self.receipts}})),
+            ('POST /api/bills/receipt-jobs', receipt_job),
+            ('GET /api/bills/receipt-jobs/<job_id>', receipt_job_status),
+            ('POST /api/auth/register', register),
+            ('POST /api/auth/login', login),
+            ('POST /api/auth/refresh', lambda: ('POST', '/api/auth/refresh', {'headers': auth(self.pick(self.refresh_tokens))})),
+            ('POST /api/auth/logout', lambda: ('POST', '/api/auth/logout', {'headers': auth(self.pick(self.tokens))})),
+            ('GET /api/auth/me', lambda: ('GET', '/api/auth/me', {'headers': auth(self.pick(self.tokens))})),
+            ('GET /api/auth/users', lambda: ('GET', '/api/auth/users?limit=100', {'headers': auth(self.admin_token)})),
+            ('GET /api/auth/users?export', lambda: ('GET', '/api/auth/users?export=ndjson', {'headers': auth(self.admin_token)})),
+            ('PUT /api/auth/users/<user_id>/active', lambda: ('PUT', f'/api/auth/users/{self.pick(self.disposable_ids)}/active', {
+                'headers': auth(self.admin_token), 'json': {'is_active': bool(self.next() % 2)}})),
+            ('DELETE /api/auth/users/<user_id>', lambda: ('DELETE', f'/api/auth/users/{self.take(self.disposable_ids)}', {
+                'headers': auth(self.admin_token)})),
+        ]
+
+    def run_scenario(self, name, build):
+        requests = self.args.requests
+        statuses = {}
+        latencies = []
+        clients = threading.local()
+
+        def one(_):
+            client = getattr(clients, 'client', None)
+            if client is None:
+                client = clients.client = self.app.test_client()
+            method, path, kwargs = build()
+            start = time.perf_counter()
+            response = client.open(path, method=method, **kwargs)
+            response.get_data()
+            latency = time.perf_counter() - start
+            if name == 'POST /api/bills/' and response.status_code == 201:
+                self.created_bill_ids.append(response.get_json()['bill_id'])
+            if name == 'POST /api/bills/receipt-jobs' and response.status_code == 202:
+                self.job_ids.append(response.get_json()['job_id'])
+            return latency, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            for latency, status in pool.map(one, range(requests)):
+                latencies.append(latency)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return summarize('http', name, latencies, time.perf_counter() - start, statuses)
+
+    def run(self):
+        self.seed()
+        self.created_bill_ids = []
+        results = []
+        for name, build in self.scenarios():
+            if name == 'GET /api/bills/receipt-jobs/<job_id>' and not self.job_ids:
+                # Polling needs a job queued by the previous scenario
+                print(f"  {name:<45} skipped: no receipt job was queued")
+                continue
+            record = self.run_scenario(name, build)
+            results.append(record)
+            print(f"  {name:<45} {record['ops_per_sec']:>9.1f} req/s  p50 {record['p50_ms']:.2f} ms  "
+                  f"p99 {record['p99_ms']:.2f} ms  {record['statuses']}")
+        return results
+
+    def cleanup(self):
+        from app import shutdown_app
+        if self.args.backend == 'mongo':
+            self.db.client.drop_database(self.db.name)
+        shutdown_app()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    meta = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': {key: value for key, value in vars(args).items() if key not in ('command', 'func')},
+    }
+    results = []
+    if args.only in (None, 'micro'):
+        print('micro-benchmarks')
+        results += micro_benchmarks(args)
+    if args.only in (None, 'http'):
+        print(f'http scenarios ({args.backend}, {args.requests} requests, concurrency {args.concurrency})')
+        bench = HttpBench(args)
+        try:
+            results += bench.run()
+        finally:
+            bench.cleanup()
+
+    output = args.output or f"bench-{meta['commit'] or 'local'}-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+    print(f'wrote {output}')
+    return 0
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    base_results = {(r['suite'], r['name']): r for r in base['results']}
+    regressions = 0
+    print(f"{'benchmark':<52} {'base p50':>10} {'head p50':>10} {'change':>8}")
+    for record in head['results']:
+        previous = base_results.get((record['suite'], record['name']))
+        if not previous or not previous['p50_ms']:
+            continue
+        change = record['p50_ms'] / previous['p50_ms'] - 1
+        flag = ''
+        if change > args.threshold:
+            regressions += 1
+            flag = '  REGRESSION'
+        print(f"{record['suite'] + ' ' + record['name']:<52} {previous['p50_ms']:>10.3f} "
+              f"{record['p50_ms']:>10.3f} {change:>+8.1%}{flag}")
+    print(f"{regressions} regression(s) over {args.threshold:.0%} "
+          f"({base['meta'].get('commit')} -> {head['meta'].get('commit')})")
+    return 1 if regressions else 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run benchmarks and write JSON results')
+    run_parser.add_argument('--users', type=int, default=20)
+    run_parser.add_argument('--bills', type=int, default=200, help='bills per user')
+    run_parser.add_argument('--items', type=int, default=8, help='items per bill')
+    run_parser.add_argument('--only', choices=['micro', 'http'])
+    run_parser.add_argument('--backend', choices=['mongo', 'mock'], default='mongo')
+    run_parser.add_argument('--requests', type=int, default=200, help='requests per HTTP scenario')
+    run_parser.add_argument('--concurrency', type=int, default=1)
+    run_parser.add_argument('--cache', action='store_true', help='keep response caching enabled')
+    run_parser.add_argument('--output')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help='allowed p50 slowdown (0.10 = 10%%)')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,42 +1,269 @@
-from pymongo import MongoClient
+import logging
+import os
+import threading
+import time
+import pymongo
+from pymongo import MongoClient, monitoring
 from flask import g, current_app
+from services.metrics import Histogram
+
+logger = logging.getLogger(__name__)
 
 client = None
 db = None
 
+_settings = {}
+_client_pid = None
+_client_lock = threading.Lock()
+
+# Motor client for the ASGI entry point, bound to the event loop it was created on
+_async_client = None
+_async_client_key = None
+
+# App config keys mapped to MongoClient pool options
+POOL_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': 'maxPoolSize',
+    'MONGO_MIN_POOL_SIZE': 'minPoolSize',
+    'MONGO_MAX_IDLE_TIME_MS': 'maxIdleTimeMS',
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': 'waitQueueTimeoutMS',
+}
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Collect connection pool usage from pymongo CMAP events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.in_use = 0
+            self.max_in_use = 0
+            self.open_connections = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.wait_time_total_ms = 0.0
+            self.wait_time_max_ms = 0.0
+
+    def _record_wait(self):
+        started = getattr(self._local, 'checkout_started', None)
+        self._local.checkout_started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait_ms = self._record_wait()
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.wait_time_total_ms += wait_ms
+            self.wait_time_max_ms = max(self.wait_time_max_ms, wait_ms)
+
+    def connection_check_out_failed(self, event):
+        wait_ms = self._record_wait()
+        with self._lock:
+            self.checkout_failures += 1
+            self.wait_time_total_ms += wait_ms
+            self.wait_time_max_ms = max(self.wait_time_max_ms, wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(self.open_connections - 1, 0)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def snapshot(self):
+        """Get a copy of the current pool statistics"""
+        with self._lock:
+            return {
+                'in_use': self.in_use,
+                'max_in_use': self.max_in_use,
+                'open_connections': self.open_connections,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'wait_time_avg_ms': round(self.wait_time_total_ms / self.checkouts, 3) if self.checkouts else 0,
+                'wait_time_max_ms': round(self.wait_time_max_ms, 3),
+            }
+
+pool_metrics = PoolMetrics()
+
+class CommandMetrics(monitoring.CommandListener):
+    """Time every Mongo command by command name and collection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.durations = {}
+        self.failures = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ''
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, failed):
+        with self._lock:
+            key = (event.command_name, self._pending.pop((event.connection_id, event.request_id), ''))
+            histogram = self.durations.get(key)
+            if histogram is None:
+                histogram = self.durations[key] = Histogram()
+            histogram.observe(event.duration_micros / 1e6)
+            if failed:
+                self.failures[key] = self.failures.get(key, 0) + 1
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def snapshot(self):
+        """Get timings keyed by 'command collection'"""
+        with self._lock:
+            return {
+                f'{command} {collection}'.strip(): dict(histogram.to_dict(), failures=self.failures.get((command, collection), 0))
+                for (command, collection), histogram in self.durations.items()
+            }
+
+    def prometheus_lines(self):
+        lines = ['# TYPE mongo_command_duration_seconds histogram']
+        with self._lock:
+            for (command, collection), histogram in self.durations.items():
+                lines.extend(histogram.prometheus_lines(
+                    'mongo_command_duration_seconds', f'command="{command}",collection="{collection}"'))
+            lines.append('# TYPE mongo_command_failures_total counter')
+            for (command, collection), count in self.failures.items():
+                lines.append(f'mongo_command_failures_total{{command="{command}",collection="{collection}"}} {count}')
+        return lines
+
+command_metrics = CommandMetrics()
+
 def init_db(app):
-    """Initialize database connection"""
-    global client, db
-    try:
-        mongo_uri = app.config.get('MONGO_URI', 'mongodb://localhost:27017/grocery_bill_db')
-        client = MongoClient(mongo_uri)
-        
-        # Extract database name from URI or use default
-        if 'grocery_bill_db' in mongo_uri:
-            db_name = 'grocery_bill_db'
-        else:
-            db_name = mongo_uri.split('/')[-1].split('?')[0] or 'grocery_bill_db'
-        
-        db = client[db_name]
-        
-        # Test connection
-        client.server_info()
-        print(f"✅ Connected to MongoDB: {db_name}")
-        
-    except Exception as e:
-        print(f"❌ Error connecting to MongoDB: {e}")
-        raise
+    """Configure the database connection.
 
-def get_db():
-    """Get database instance"""
-    global db
-    if db is None:
+    The client itself is created lazily by get_db() in each process, so
+    prefork servers never share a MongoClient across fork().
+    """
+    global client, db, _client_pid
+    mongo_uri = app.config.get('MONGO_URI', 'mongodb://localhost:27017/grocery_bill_db')
+
+    # Extract database name from URI or use default
+    if 'grocery_bill_db' in mongo_uri:
+        db_name = 'grocery_bill_db'
+    else:
+        db_name = mongo_uri.split('/')[-1].split('?')[0] or 'grocery_bill_db'
+
+    pool_options = {
+        option: app.config[key]
+        for key, option in POOL_OPTIONS.items()
+        if app.config.get(key) is not None
+    }
+
+    _settings.update(uri=mongo_uri, db_name=db_name, pool_options=pool_options)
+    client = db = _client_pid = None
+    logger.info("MongoDB configured: %s (%s)", db_name, pool_options or 'default pool')
+
+def _connect():
+    """Create the MongoClient for the current process"""
+    global client, db, _client_pid
+    client = MongoClient(
+        _settings['uri'],
+        event_listeners=[pool_metrics, command_metrics],
+        **_settings['pool_options']
+    )
+    db = client[_settings['db_name']]
+    _client_pid = os.getpid()
+    logger.info("MongoDB client created: %s (pid %s)", _settings['db_name'], _client_pid)
+
+def set_client(mongo_client):
+    """Use an existing client for this process instead of connecting (e.g. an in-process mock)"""
+    global client, db, _client_pid
+    if not _settings:
         raise RuntimeError("Database not initialized. Call init_db() first.")
+    client = mongo_client
+    db = client[_settings['db_name']]
+    _client_pid = os.getpid()
+
+def get_db():
+    """Get database instance, creating this process's client on first use"""
+    if db is None or _client_pid != os.getpid():
+        if not _settings:
+            raise RuntimeError("Database not initialized. Call init_db() first.")
+        with _client_lock:
+            if db is None or _client_pid != os.getpid():
+                # A client inherited across fork() must not be reused
+                if _client_pid is not None:
+                    pool_metrics.reset()
+                _connect()
     return db
 
+def get_async_db():
+    """Get a Motor database for the running event loop, creating its client on first use"""
+    global _async_client, _async_client_key
+    import asyncio
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    if not _settings:
+        raise RuntimeError("Database not initialized. Call init_db() first.")
+    key = (os.getpid(), id(asyncio.get_running_loop()))
+    if _async_client is None or _async_client_key != key:
+        _async_client = AsyncIOMotorClient(
+            _settings['uri'],
+            event_listeners=[pool_metrics, command_metrics],
+            **_settings['pool_options']
+        )
+        _async_client_key = key
+        logger.info("Motor client created: %s (pid %s)", _settings['db_name'], os.getpid())
+    return _async_client[_settings['db_name']]
+
+def close_async_db():
+    """Close the Motor client"""
+    global _async_client, _async_client_key
+    if _async_client is not None and _async_client_key[0] == os.getpid():
+        _async_client.close()
+        logger.info("Motor connection closed")
+    _async_client = _async_client_key = None
+
+def ping_db(timeout_seconds):
+    """Round-trip a ping through the pool, raising if it fails or takes longer than the timeout"""
+    with pymongo.timeout(timeout_seconds):
+        get_db().command('ping')
+
+def get_pool_stats():
+    """Get connection pool statistics for this process"""
+    return dict(pool_metrics.snapshot(), pid=os.getpid())
+
 def close_db():
     """Close database connection"""
-    global client
-    if client:
+    global client, db, _client_pid
+    if client and _client_pid == os.getpid():
         client.close()
-        print("Database connection closed")
\ No newline at end of file
+        logger.info("Database connection closed")
+    client = db = _client_pid = None
@@ -0,0 +1,167 @@
+"""Index bootstrap, data migrations and query-plan verification.
+
+Run as a deploy step, from the backend directory:
+
+    python -m config.indexes            # create indexes, then run migrations
+    python -m config.indexes --verify   # also explain() every hot query
+
+Migrations backfill fields on documents written before the fields existed
+and build derived collections from existing bills. Builds run once across
+all processes (see models.migration) and may run while the app serves
+writes; until one has run, its derived collection stays empty. Analytics
+rollups are only stored once the backfill has run; until then they are
+computed from the bills on each read. The app
+does none of this at startup unless MONGO_ENSURE_INDEXES is true, and
+then only creates indexes.
+
+--verify exits non-zero if any hot query scans a collection or sorts in
+memory, so it can gate deploys and CI.
+"""
+import logging
+import sys
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING
+from config.database import get_db
+from models.analytics_rollup import AnalyticsRollup
+from models.bill import Bill
+from models.cache_version import CacheVersion
+from models.item import Item
+from models.migration import Migration
+from models.price_history import PriceHistory
+from models.price_sketch import PriceSketch
+from models.receipt_job import ReceiptJob
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Plan stages that mean a query is not served by an index
+UNINDEXED_STAGES = {'COLLSCAN', 'SORT'}
+
+def ensure_indexes():
+    """Create all collection indexes"""
+    User.ensure_indexes()
+    Item.ensure_indexes()
+    Bill.ensure_indexes()
+    PriceHistory.ensure_indexes()
+    AnalyticsRollup.ensure_indexes()
+    ReceiptJob.ensure_indexes()
+    logger.info("MongoDB indexes ensured")
+
+def migrate():
+    """Backfill existing documents and build derived collections from them"""
+    Bill.backfill()
+    Migration.mark_done(Bill.BACKFILL)
+    # After the backfill, so rebuilt rollups key items by catalog ID
+    logger.info("Rebuilt %d stale analytics rollups", AnalyticsRollup.rebuild_stale())
+    PriceHistory.ensure_built()
+    PriceSketch.ensure_built()
+    logger.info("MongoDB migrations applied")
+
+def hot_queries():
+    """Queries issued by routes/, as (name, collection, filter, sort) or (name, collection, pipeline).
+
+    Filters, sorts and pipelines come from the model helpers the routes call,
+    so a changed query is explained as it now runs.
+    """
+    user_id = 'explain-user'
+    object_id = str(ObjectId())
+    after = f"2024-01-01T00:00:00,{object_id}"
+    return [
+        ('register/login: users by username', User.collection_name, User.username_filter('explain'), None),
+        ('register: users by email', User.collection_name, User.email_filter('explain@example.com'), None),
+        ('me/refresh: users by _id', User.collection_name, User.id_filter(object_id), None),
+        ('users: admin listing by role and status', User.collection_name,
+         User.listing_filter('customer', True, object_id), User.LISTING_ORDER),
+        ('get_bill: bills by _id', Bill.collection_name, Bill.id_filter(object_id), None),
+        ('receipt-jobs: job by _id', ReceiptJob.collection_name, ReceiptJob.id_filter(object_id), None),
+        ('cache: user cache version', CacheVersion.collection_name, CacheVersion.id_filter(user_id), None),
+        ('find_by_user: bills by user, newest first', Bill.collection_name,
+         Bill.user_filter(user_id), Bill.NEWEST_FIRST),
+        ('get_user_bills: keyset page', Bill.collection_name, Bill.page_filter(user_id, after), Bill.NEWEST_FIRST),
+        ('analytics: bill total order stats', Bill.collection_name,
+         Bill.user_filter(user_id), [('total', ASCENDING)]),
+        ('analytics: rollup summary', AnalyticsRollup.collection_name,
+         AnalyticsRollup.summary_filter(user_id), None),
+        ('analytics: rollup top items', AnalyticsRollup.collection_name,
+         AnalyticsRollup.top_items_filter(user_id), AnalyticsRollup.TOP_ITEMS_ORDER),
+        ('shopping-list: purchases in window', Bill.collection_name,
+         Bill.purchase_groups_pipeline(user_id, datetime(2024, 1, 1))[:2]),
+        ('best-deals: latest bill', Bill.collection_name, Bill.user_filter(user_id), Bill.NEWEST_FIRST),
+        ('price-trends/best-deals: item price stats', PriceHistory.stats_collection_name,
+         PriceHistory.stats_filter([1, 2], user_id), None),
+        ('price-history: item buckets by month', PriceHistory.collection_name,
+         PriceHistory.range_filter(1, datetime(2024, 1, 1), datetime(2024, 6, 30)), PriceHistory.BUCKET_ORDER),
+        ('price-check: sketches by item', PriceSketch.collection_name, PriceSketch.keys_filter([1, 2]), None),
+        ('price-history: open bucket append', PriceHistory.collection_name,
+         PriceHistory.open_bucket_filter(1, '2024-01', 1), None),
+    ]
+
+def _plan_stages(plan):
+    """Collect stage names from an explain() plan tree"""
+    if not isinstance(plan, dict):
+        return []
+    plan = plan.get('queryPlan', plan)
+    stages = [plan['stage']] if 'stage' in plan else []
+    for child in [plan.get('inputStage')] + plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+def _find_query_planner(explain):
+    """Find the queryPlanner section, which aggregate explains nest under $cursor"""
+    if isinstance(explain, dict):
+        if 'queryPlanner' in explain:
+            return explain['queryPlanner']
+        children = explain.values()
+    elif isinstance(explain, list):
+        children = explain
+    else:
+        return None
+    for child in children:
+        planner = _find_query_planner(child)
+        if planner:
+            return planner
+    return None
+
+def explain_query(query):
+    """Get the winning plan's stage names for a hot query"""
+    db = get_db()
+    if len(query) == 3:
+        _, collection, pipeline = query
+        explain = db.command('explain', {'aggregate': collection, 'pipeline': pipeline, 'cursor': {}},
+                             verbosity='queryPlanner')
+    else:
+        _, collection, filter_, sort = query
+        cursor = db[collection].find(filter_)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.explain()
+    planner = _find_query_planner(explain) or {}
+    return _plan_stages(planner.get('winningPlan', {}))
+
+def verify_query_plans():
+    """Explain every hot query and return a list of (name, stages, ok)"""
+    results = []
+    for query in hot_queries():
+        stages = explain_query(query)
+        ok = bool(stages) and not UNINDEXED_STAGES.intersection(stages)
+        results.append((query[0], stages, ok))
+    return results
+
+def main(argv):
+    # Importing the app configures the database connection
+    from app import app  # noqa: F401
+
+    ensure_indexes()
+    migrate()
+    if '--verify' not in argv:
+        return 0
+
+    failures = 0
+    for name, stages, ok in verify_query_plans():
+        print(f"{'✓' if ok else '✗'} {name}: {' <- '.join(stages)}")
+        failures += not ok
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
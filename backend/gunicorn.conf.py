@@ -0,0 +1,46 @@
+"""Production server settings, run from the backend directory:
+
+    gunicorn app:app
+
+Settings come from the environment:
+
+    WEB_BIND          address to listen on (default 0.0.0.0:5000)
+    WEB_WORKERS       worker processes (default 2 x CPUs + 1)
+    WEB_THREADS       threads per worker; above 1 uses gthread workers (default 4)
+    WEB_PRELOAD       import the app once in the master before forking (default true)
+    WEB_TIMEOUT       seconds before a silent worker is killed (default 60)
+    WEB_GRACEFUL_TIMEOUT  seconds to drain in-flight requests on shutdown (default 30)
+    WEB_MAX_REQUESTS  recycle workers after this many requests, 0 to disable (default 0)
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = os.getenv('WEB_PRELOAD', 'true').lower() == 'true'
+timeout = int(os.getenv('WEB_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+
+def when_ready(server):
+    # Preloading may have connected (e.g. to ensure indexes); close the
+    # master's client so workers do not inherit its sockets and monitor threads
+    from config.database import close_db
+    close_db()
+
+
+def post_fork(server, worker):
+    # Drop any client state copied from the master; get_db() connects on first use
+    from config.database import close_async_db, close_db
+    close_db()
+    close_async_db()
+
+
+def worker_exit(server, worker):
+    # Runs after the worker has drained its in-flight requests
+    from app import shutdown_app
+    shutdown_app()
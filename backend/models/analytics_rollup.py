@@ -0,0 +1,269 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from config.database import get_db
+from models.bill import Bill
+from models.migration import Migration
+from services.item_catalog import item_key
+
+class AnalyticsRollup:
+    """Per-user spending totals kept up to date as bills are written.
+
+    Each user has one document per (kind, key): a 'summary' document with the
+    bill count, running sum and sum of squares of bill totals, plus 'month',
+    'category' and 'item' documents holding a count and a total. Item
+    documents are keyed by catalog ID and carry the item's display name.
+
+    The summary document also holds ``seq``, bumped by every write, and the
+    lock taken by a rebuild.
+    """
+    collection_name = 'analytics_rollups'
+    # Rollups built by an older version are rebuilt by the config.indexes
+    # migration, or on read for any it has not reached. Version 2 rollups
+    # could be built before the item backfill and key legacy items by name.
+    VERSION = 3
+    # A rebuild lock older than this belongs to a process that died mid-rebuild
+    REBUILD_LOCK_SECONDS = 60
+    REBUILD_ATTEMPTS = 3
+    TOP_ITEMS_ORDER = [('count', DESCENDING)]
+
+    @staticmethod
+    def get_collection():
+        return get_db()[AnalyticsRollup.collection_name]
+
+    @staticmethod
+    def ensure_indexes():
+        """Create indexes used by rollup upserts and reads"""
+        collection = AnalyticsRollup.get_collection()
+        collection.create_index(
+            [('user_id', ASCENDING), ('kind', ASCENDING), ('key', ASCENDING)],
+            unique=True
+        )
+        collection.create_index([('user_id', ASCENDING), ('kind', ASCENDING), ('count', DESCENDING)])
+
+    @staticmethod
+    def _bill_increments(bill, increments=None):
+        """Accumulate a bill's contribution to each rollup document"""
+        increments = increments if increments is not None else {}
+        total = bill.get('total', 0)
+
+        summary = increments.setdefault(('summary', ''), {'count': 0, 'total': 0, 'total_sq': 0})
+        summary['count'] += 1
+        summary['total'] += total
+        summary['total_sq'] += total * total
+
+        month = increments.setdefault(('month', bill['created_at'].strftime('%Y-%m')), {'count': 0, 'total': 0})
+        month['count'] += 1
+        month['total'] += total
+
+        for item in bill.get('items', []):
+            price = item.get('price', 0)
+            quantity = item.get('quantity', 1)
+
+            category = increments.setdefault(('category', item.get('category', 'General')), {'count': 0, 'total': 0})
+            category['count'] += 1
+            category['total'] += price * quantity
+
+            purchased = increments.setdefault(('item', item_key(item)), {'count': 0, 'total': 0})
+            purchased.setdefault('name', item.get('name'))
+            purchased['count'] += quantity
+            purchased['total'] += price * quantity
+
+        return increments
+
+    @staticmethod
+    def apply_bill(bill, sign=1):
+        """Add (sign=1) or remove (sign=-1) a bill document from its user's rollup"""
+        AnalyticsRollup.apply_bills([bill], sign)
+
+    @staticmethod
+    def apply_bills(bills, sign=1):
+        """Add or remove many bill documents, merging increments per user first"""
+        increments_by_user = {}
+        for bill in bills:
+            AnalyticsRollup._bill_increments(bill, increments_by_user.setdefault(bill['user_id'], {}))
+
+        operations = [
+            UpdateOne(
+                {'user_id': user_id, 'kind': kind, 'key': key},
+                AnalyticsRollup._update(kind, fields, sign),
+                upsert=True
+            )
+            for user_id, increments in increments_by_user.items()
+            for (kind, key), fields in increments.items()
+        ]
+        if operations:
+            AnalyticsRollup.get_collection().bulk_write(operations, ordered=False)
+
+    @staticmethod
+    def _update(kind, fields, sign):
+        """Increment the numeric fields; labels such as an item's name are only set on insert"""
+        update = {'$inc': {field: sign * value for field, value in fields.items() if field != 'name'}}
+        if kind == 'summary':
+            # Lets a concurrent rebuild notice that this write landed during its scan
+            update['$inc']['seq'] = 1
+        if 'name' in fields:
+            update['$setOnInsert'] = {'name': fields['name']}
+        return update
+
+    @staticmethod
+    def _scan(user_id):
+        """Rollup increments computed from a user's bills"""
+        increments = {}
+        bills = Bill.get_collection().find(
+            {'user_id': user_id},
+            {'total': 1, 'created_at': 1, 'items': 1}
+        )
+        for bill in bills:
+            AnalyticsRollup._bill_increments(bill, increments)
+        increments.setdefault(('summary', ''), {'count': 0, 'total': 0, 'total_sq': 0})
+        return increments
+
+    @staticmethod
+    def _lock(user_id, token):
+        """Take the user's rebuild lock on their summary document; None if another rebuild holds it"""
+        now = datetime.utcnow()
+        try:
+            return AnalyticsRollup.get_collection().find_one_and_update(
+                {'user_id': user_id, 'kind': 'summary', 'key': '', '$or': [
+                    {'lock': None},
+                    {'locked_at': {'$lt': now - timedelta(seconds=AnalyticsRollup.REBUILD_LOCK_SECONDS)}}
+                ]},
+                # $inc by 0 creates seq on summaries written before it existed
+                {'$set': {'lock': token, 'locked_at': now}, '$inc': {'seq': 0}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The summary exists and is locked, so the upsert tried to insert a second one
+            return None
+
+    @staticmethod
+    def rebuild(user_id):
+        """Recompute a user's rollup from their bills, in place.
+
+        Documents are overwritten with $set upserts under the rebuild lock,
+        and the summary is only marked current if no write bumped ``seq``
+        while the bills were scanned; otherwise the scan is retried. Returns
+        False if another rebuild holds the lock or writes kept landing.
+
+        Also returns False until Bill.backfill() has finished: items saved
+        before the catalog would be keyed by name in a rollup marked
+        current, and new bills for the same items by catalog ID.
+        """
+        if not Migration.is_done(Bill.BACKFILL):
+            return False
+        collection = AnalyticsRollup.get_collection()
+        token = ObjectId()
+        summary = AnalyticsRollup._lock(user_id, token)
+        if summary is None:
+            return False
+        try:
+            for _ in range(AnalyticsRollup.REBUILD_ATTEMPTS):
+                increments = AnalyticsRollup._scan(user_id)
+                operations = [
+                    UpdateOne({'user_id': user_id, 'kind': kind, 'key': key}, {'$set': fields}, upsert=True)
+                    for (kind, key), fields in increments.items()
+                    if kind != 'summary'
+                ]
+                if operations:
+                    collection.bulk_write(operations, ordered=False)
+
+                keys_by_kind = {}
+                for kind, key in increments:
+                    keys_by_kind.setdefault(kind, []).append(key)
+                collection.delete_many({
+                    'user_id': user_id,
+                    'kind': {'$ne': 'summary'},
+                    '$nor': [{'kind': kind, 'key': {'$in': keys}} for kind, keys in keys_by_kind.items()]
+                })
+
+                result = collection.update_one(
+                    {'user_id': user_id, 'kind': 'summary', 'key': '', 'lock': token, 'seq': summary['seq']},
+                    {'$set': dict(increments[('summary', '')], built=True, version=AnalyticsRollup.VERSION)}
+                )
+                if result.modified_count == 1:
+                    return True
+                summary = collection.find_one({'user_id': user_id, 'kind': 'summary', 'key': '', 'lock': token})
+                if summary is None:
+                    # The lock expired and another rebuild took over
+                    return False
+            return False
+        finally:
+            collection.update_one(
+                {'user_id': user_id, 'kind': 'summary', 'key': '', 'lock': token},
+                {'$unset': {'lock': '', 'locked_at': ''}}
+            )
+
+    @staticmethod
+    def rebuild_stale():
+        """Rebuild every rollup that was never built or was built by an older VERSION; returns how many"""
+        current = set(AnalyticsRollup.get_collection().distinct(
+            'user_id', {'kind': 'summary', 'built': True, 'version': AnalyticsRollup.VERSION}
+        ))
+        rebuilt = 0
+        for user_id in Bill.get_collection().distinct('user_id'):
+            if user_id not in current:
+                rebuilt += AnalyticsRollup.rebuild(user_id)
+        return rebuilt
+
+    @staticmethod
+    def compute(user_id):
+        """A user's rollup computed from their bills in memory, without writing it"""
+        documents = [
+            dict(fields, user_id=user_id, kind=kind, key=key)
+            for (kind, key), fields in AnalyticsRollup._scan(user_id).items()
+        ]
+        summary = next(doc for doc in documents if doc['kind'] == 'summary')
+        breakdown = [doc for doc in documents if doc['kind'] in ('month', 'category') and doc['count'] > 0]
+        items = sorted((doc for doc in documents if doc['kind'] == 'item' and doc['count'] > 0),
+                       key=lambda doc: doc['count'], reverse=True)
+        return summary, breakdown, items
+
+    @staticmethod
+    def find_by_user(user_id, top_items=10):
+        """Load a user's rollup, rebuilding it from bills if it was never built"""
+        collection = AnalyticsRollup.get_collection()
+
+        # Bills written before the rollup existed are only counted by a rebuild
+        summary = collection.find_one(AnalyticsRollup.summary_filter(user_id))
+        if not AnalyticsRollup.is_current(summary):
+            if not AnalyticsRollup.rebuild(user_id):
+                # Another request is rebuilding it, or bills await the backfill; answer from the bills meanwhile
+                summary, breakdown, items = AnalyticsRollup.compute(user_id)
+                return AnalyticsRollup.assemble(summary, breakdown, items[:top_items])
+            summary = collection.find_one(AnalyticsRollup.summary_filter(user_id))
+
+        breakdown = collection.find(AnalyticsRollup.breakdown_filter(user_id))
+        items = (
+            collection.find(AnalyticsRollup.top_items_filter(user_id))
+            .sort(AnalyticsRollup.TOP_ITEMS_ORDER)
+            .limit(top_items)
+        )
+        return AnalyticsRollup.assemble(summary, breakdown, items)
+
+    @staticmethod
+    def is_current(summary):
+        return bool(summary and summary.get('built') and summary.get('version') == AnalyticsRollup.VERSION)
+
+    @staticmethod
+    def summary_filter(user_id):
+        return {'user_id': user_id, 'kind': 'summary'}
+
+    @staticmethod
+    def breakdown_filter(user_id):
+        """Month and category documents, which are independent of the summary"""
+        return {'user_id': user_id, 'kind': {'$in': ['month', 'category']}, 'count': {'$gt': 0}}
+
+    @staticmethod
+    def top_items_filter(user_id):
+        return {'user_id': user_id, 'kind': 'item', 'count': {'$gt': 0}}
+
+    @staticmethod
+    def assemble(summary, breakdown, items):
+        """Group loaded rollup documents by kind"""
+        rollup = {'summary': summary, 'month': [], 'category': [], 'item': list(items)}
+        for doc in breakdown:
+            rollup[doc['kind']].append(doc)
+        return rollup
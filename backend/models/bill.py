@@ -1,57 +1,271 @@
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, UpdateMany
 from config.database import get_db
+from models.item import Item
+from services.item_catalog import get_item_catalog
 
 class Bill:
     collection_name = 'bills'
+    __slots__ = ('bill_id', 'user_id', 'items', 'total', 'discount', 'created_at')
+    # Migration recorded once backfill() has given every item its catalog ID
+    BACKFILL = 'bill_items'
+    # Listing order served by the (user_id, created_at, _id) index
+    NEWEST_FIRST = [('created_at', DESCENDING), ('_id', DESCENDING)]
 
-    def __init__(self, user_id, items=None, total=0, discount=0, bill_id=None):
+    def __init__(self, user_id, items=None, total=0, discount=0, bill_id=None, created_at=None):
         self.bill_id = bill_id
         self.user_id = user_id
         self.items = items or []
         self.total = total
         self.discount = discount
-        self.created_at = datetime.utcnow()
+        self.created_at = created_at or datetime.utcnow()
 
     @staticmethod
     def get_collection():
         return get_db()[Bill.collection_name]
 
-    def save(self):
-        bill_data = {
+    @staticmethod
+    def ensure_indexes():
+        """Create indexes used by bill queries"""
+        collection = Bill.get_collection()
+        collection.create_index([('user_id', ASCENDING), ('total', ASCENDING)])
+        collection.create_index([('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)])
+
+    @staticmethod
+    def backfill():
+        """Fill in the normalized name and catalog ID on items saved before they existed"""
+        Bill.get_collection().update_many(
+            {'items': {'$elemMatch': {'name_normalized': {'$exists': False}}}},
+            [{'$set': {'items': {'$map': {
+                'input': '$items',
+                'in': {'$mergeObjects': ['$$this', {
+                    'name_normalized': Item.normalize_name_expr('$$this.name')
+                }]}
+            }}}}]
+        )
+        Bill.backfill_item_ids()
+
+    @staticmethod
+    def backfill_item_ids():
+        """Attach catalog IDs to items saved before the catalog existed, one update per distinct name"""
+        collection = Bill.get_collection()
+        missing = {'items': {'$elemMatch': {'item_id': {'$exists': False}}}}
+        names = [name for name in collection.distinct('items.name', missing) if isinstance(name, str)]
+        if not names:
+            return
+        item_ids = get_item_catalog().intern_many([{'name': name} for name in names])
+        operations = [
+            UpdateMany(
+                {'items': {'$elemMatch': {'name': name, 'item_id': {'$exists': False}}}},
+                {'$set': {'items.$[item].item_id': item_id}},
+                array_filters=[{'item.name': name, 'item.item_id': {'$exists': False}}]
+            )
+            for name, item_id in zip(names, item_ids)
+        ]
+        collection.bulk_write(operations, ordered=False)
+
+    @staticmethod
+    def normalize_items(items):
+        """Attach the catalog ID and normalized name to each item"""
+        item_ids = get_item_catalog().intern_many(items)
+        return [
+            dict(item, item_id=item_id, name_normalized=Item.normalize_name(item.get('name')))
+            for item, item_id in zip(items, item_ids)
+        ]
+
+    def to_mongo(self):
+        """Convert to MongoDB document"""
+        doc = {
             'user_id': self.user_id,
             'items': self.items,
             'total': self.total,
             'discount': self.discount,
             'created_at': self.created_at
         }
-        result = self.get_collection().insert_one(bill_data)
+        if self.bill_id:
+            doc['_id'] = ObjectId(self.bill_id)
+        return doc
+
+    def save(self):
+        self.items = Bill.normalize_items(self.items)
+        result = self.get_collection().insert_one(self.to_mongo())
         self.bill_id = str(result.inserted_id)
         return self.bill_id
 
+    @staticmethod
+    def from_document(bill_data):
+        """Create Bill from MongoDB document, keeping its stored fields as-is"""
+        if not bill_data:
+            return None
+        bill = Bill.__new__(Bill)
+        bill.bill_id = str(bill_data['_id'])
+        bill.user_id = bill_data['user_id']
+        bill.items = bill_data['items']
+        bill.total = bill_data['total']
+        bill.discount = bill_data.get('discount', 0)
+        bill.created_at = bill_data.get('created_at')
+        return bill
+
+    from_mongo = from_document
+
+    @staticmethod
+    def document_to_dict(bill_data):
+        """Public bill shape straight from a MongoDB document, without a model object"""
+        return {
+            'bill_id': str(bill_data['_id']),
+            'user_id': bill_data['user_id'],
+            'items': bill_data['items'],
+            'total': bill_data['total'],
+            'discount': bill_data.get('discount', 0),
+            'created_at': bill_data.get('created_at')
+        }
+
+    @staticmethod
+    def id_filter(bill_id):
+        return {'_id': ObjectId(bill_id)}
+
+    @staticmethod
+    def user_filter(user_id):
+        return {'user_id': user_id}
+
     @staticmethod
     def find_by_id(bill_id):
-        bill_data = Bill.get_collection().find_one({'_id': ObjectId(bill_id)})
-        if bill_data:
-            return Bill(
-                user_id=bill_data['user_id'],
-                items=bill_data['items'],
-                total=bill_data['total'],
-                discount=bill_data.get('discount', 0),
-                bill_id=str(bill_data['_id'])
-            )
-        return None
+        bill_data = Bill.get_collection().find_one(Bill.id_filter(bill_id))
+        return Bill.from_mongo(bill_data)
+
+    @staticmethod
+    def find_document(bill_id):
+        return Bill.get_collection().find_one(Bill.id_filter(bill_id))
 
     @staticmethod
     def find_by_user(user_id):
-        bills = Bill.get_collection().find({'user_id': user_id}).sort('created_at', -1)
-        return [Bill(
-            user_id=bill['user_id'],
-            items=bill['items'],
-            total=bill['total'],
-            discount=bill.get('discount', 0),
-            bill_id=str(bill['_id'])
-        ) for bill in bills]
+        bills = Bill.get_collection().find(Bill.user_filter(user_id)).sort(Bill.NEWEST_FIRST)
+        return [Bill.from_mongo(bill) for bill in bills]
+
+    @staticmethod
+    def encode_cursor(bill_data):
+        """Encode a bill document's position as an ``after`` cursor"""
+        return f"{bill_data['created_at'].isoformat()},{bill_data['_id']}"
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode an ``after`` cursor, raising ValueError if it is malformed"""
+        try:
+            created_at, bill_id = cursor.split(',', 1)
+            return datetime.fromisoformat(created_at), ObjectId(bill_id)
+        except (ValueError, InvalidId):
+            raise ValueError('Invalid cursor')
+
+    @staticmethod
+    def page_filter(user_id, after=None):
+        """A user's bills after a keyset position in NEWEST_FIRST order"""
+        query = Bill.user_filter(user_id)
+        if after:
+            created_at, bill_id = Bill.decode_cursor(after)
+            query['$or'] = [
+                {'created_at': {'$lt': created_at}},
+                {'created_at': created_at, '_id': {'$lt': bill_id}}
+            ]
+        return query
+
+    @staticmethod
+    def iter_by_user(user_id, after=None, limit=0, batch_size=100):
+        """Get a cursor over a user's bill documents, newest first, after a keyset position"""
+        return (
+            Bill.get_collection()
+            .find(Bill.page_filter(user_id, after))
+            .sort(Bill.NEWEST_FIRST)
+            .limit(limit)
+            .batch_size(batch_size)
+        )
+
+    @staticmethod
+    def find_total_stats(user_id, bill_count):
+        """Get min, max and median bill total for a user from the (user_id, total) index"""
+        if bill_count <= 0:
+            return None
+
+        def totals_from(direction, skip=0, limit=1):
+            cursor = Bill.get_collection().find(
+                Bill.user_filter(user_id), {'_id': 0, 'total': 1}
+            ).sort('total', direction).skip(skip).limit(limit)
+            return [doc.get('total', 0) for doc in cursor]
+
+        skip, limit = Bill.median_window(bill_count)
+        return Bill.total_stats_from(
+            totals_from(ASCENDING),
+            totals_from(DESCENDING),
+            totals_from(ASCENDING, skip=skip, limit=limit)
+        )
+
+    @staticmethod
+    def median_window(bill_count):
+        """(skip, limit) selecting the middle one or two totals in ascending order"""
+        return (bill_count - 1) // 2, 2 - bill_count % 2
+
+    @staticmethod
+    def total_stats_from(lowest, highest, middle):
+        """Build total stats from the lowest, highest and middle totals"""
+        if not lowest or not middle:
+            return None
+
+        return {
+            'min': lowest[0],
+            'max': highest[0],
+            'median': sum(middle) / len(middle)
+        }
+
+    @staticmethod
+    def purchase_key(item):
+        """Key purchase groups collect an item under: its catalog ID, else its normalized name.
+
+        Computed from the name when the item predates both fields, so bills
+        not yet backfilled still group per item. purchase_key_expr is the
+        same key as an aggregation expression.
+        """
+        key = item.get('item_id')
+        if key is None:
+            key = item.get('name_normalized')
+        if key is None:
+            key = Item.normalize_name(item.get('name'))
+        return key
+
+    @staticmethod
+    def purchase_key_expr(item):
+        """purchase_key() of an item expression such as '$items', for use in a pipeline"""
+        return {'$ifNull': [f'{item}.item_id', {'$ifNull': [
+            f'{item}.name_normalized', Item.normalize_name_expr(f'{item}.name')
+        ]}]}
+
+    @staticmethod
+    def purchase_groups_pipeline(user_id, since):
+        """Group a user's items bought since a date by item: frequency, true averages, latest name and category"""
+        return [
+            {'$match': dict(Bill.user_filter(user_id), created_at={'$gte': since})},
+            {'$sort': {'created_at': DESCENDING}},
+            {'$unwind': '$items'},
+            {'$group': {
+                '_id': Bill.purchase_key_expr('$items'),
+                'name': {'$first': '$items.name'},
+                'category': {'$first': {'$ifNull': ['$items.category', 'General']}},
+                'frequency': {'$sum': 1},
+                'avg_price': {'$avg': {'$ifNull': ['$items.price', 0]}},
+                'avg_quantity': {'$avg': {'$ifNull': ['$items.quantity', 1]}},
+                'last_bought': {'$max': '$created_at'}
+            }},
+            {'$sort': {'frequency': DESCENDING, 'last_bought': DESCENDING, '_id': ASCENDING}}
+        ]
+
+    @staticmethod
+    def find_purchase_groups(user_id, since):
+        return list(Bill.get_collection().aggregate(Bill.purchase_groups_pipeline(user_id, since)))
+
+    @staticmethod
+    def find_latest(user_id):
+        """Get a user's most recent bill document"""
+        return Bill.get_collection().find_one(Bill.user_filter(user_id), sort=Bill.NEWEST_FIRST)
 
     def to_dict(self):
         return {
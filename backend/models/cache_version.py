@@ -0,0 +1,39 @@
+from pymongo import ReturnDocument, UpdateOne
+from config.database import get_db
+
+class CacheVersion:
+    """Per-user counter that is part of every cached response key.
+
+    Writes bump the counter, so every process stops reading the user's old
+    cache entries at once; stale entries simply age out.
+    """
+    collection_name = 'cache_versions'
+
+    @staticmethod
+    def get_collection():
+        return get_db()[CacheVersion.collection_name]
+
+    @staticmethod
+    def id_filter(user_id):
+        return {'_id': user_id}
+
+    @staticmethod
+    def get(user_id):
+        doc = CacheVersion.get_collection().find_one(CacheVersion.id_filter(user_id), {'version': 1})
+        return doc['version'] if doc else 0
+
+    @staticmethod
+    def bump(user_id):
+        doc = CacheVersion.get_collection().find_one_and_update(
+            {'_id': user_id},
+            {'$inc': {'version': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc['version']
+
+    @staticmethod
+    def bump_many(user_ids):
+        operations = [UpdateOne({'_id': user_id}, {'$inc': {'version': 1}}, upsert=True) for user_id in set(user_ids)]
+        if operations:
+            CacheVersion.get_collection().bulk_write(operations, ordered=False)
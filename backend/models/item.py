@@ -1,36 +1,100 @@
-from bson.objectid import ObjectId
-from config.database import db
+import re
+import unicodedata
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+from config.database import get_db
 
 class Item:
+    """Catalog entry: one canonical item with a compact integer ID.
+
+    Receipt names that reduce to the same canonical key ("Milk", " MILK ",
+    "milk.") share one entry; bill items store its ``item_id``.
+    """
     collection_name = 'items'
+    counters_collection_name = 'counters'
+    __slots__ = ('item_id', 'key', 'name', 'category')
 
-    def __init__(self, name, price, quantity, category=None, item_id=None):
+    def __init__(self, key, name, category=None, item_id=None):
         self.item_id = item_id
+        self.key = key
         self.name = name
-        self.price = price
-        self.quantity = quantity
         self.category = category
 
+    @staticmethod
+    def normalize_name(name):
+        """Normalize an item name for case-insensitive lookups"""
+        return (name or '').strip().lower()
+
+    @staticmethod
+    def normalize_name_expr(name):
+        """Aggregation expression computing normalize_name() of a name expression"""
+        return {'$toLower': {'$trim': {'input': {'$ifNull': [name, '']}}}}
+
+    @staticmethod
+    def canonical_key(name):
+        """Dedup key for a receipt name: case-folded, punctuation dropped, whitespace collapsed"""
+        name = unicodedata.normalize('NFKC', name or '').casefold()
+        return ' '.join(re.sub(r'[^\w]+', ' ', name).split())
+
     @staticmethod
     def get_collection():
-        return db.get_db()[Item.collection_name]
+        return get_db()[Item.collection_name]
+
+    @staticmethod
+    def ensure_indexes():
+        """Create indexes used by catalog lookups"""
+        Item.get_collection().create_index([('key', ASCENDING)], unique=True)
+
+    @staticmethod
+    def allocate_ids(count):
+        """Reserve ``count`` consecutive item IDs and return the first"""
+        doc = get_db()[Item.counters_collection_name].find_one_and_update(
+            {'_id': Item.collection_name},
+            {'$inc': {'seq': count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc['seq'] - count + 1
+
+    @staticmethod
+    def find_by_keys(keys):
+        return [Item.from_mongo(doc) for doc in Item.get_collection().find({'key': {'$in': list(keys)}})]
+
+    @staticmethod
+    def find_all():
+        return [Item.from_mongo(doc) for doc in Item.get_collection().find()]
+
+    @staticmethod
+    def create_many(entries):
+        """Insert new entries (key, name, category), returning all of them as stored.
+
+        Keys another process inserted first keep that process's ID.
+        """
+        if not entries:
+            return []
+        first_id = Item.allocate_ids(len(entries))
+        documents = [
+            {'_id': first_id + offset, 'key': key, 'name': name, 'category': category}
+            for offset, (key, name, category) in enumerate(entries)
+        ]
+        try:
+            Item.get_collection().insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+            return Item.find_by_keys(key for key, _, _ in entries)
+        return [Item.from_mongo(doc) for doc in documents]
+
+    @staticmethod
+    def from_mongo(item_data):
+        if not item_data:
+            return None
+        return Item(item_data['key'], item_data['name'], item_data.get('category'), item_data['_id'])
 
     def to_dict(self):
         return {
             'item_id': self.item_id,
+            'key': self.key,
             'name': self.name,
-            'price': self.price,
-            'quantity': self.quantity,
-            'category': self.category
-        }
-
-    def save(self):
-        item_data = {
-            'name': self.name,
-            'price': self.price,
-            'quantity': self.quantity,
             'category': self.category
         }
-        result = self.get_collection().insert_one(item_data)
-        self.item_id = str(result.inserted_id)
-        return self.item_id
\ No newline at end of file
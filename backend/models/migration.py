@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from config.database import get_db
+from models.bill import Bill
+
+class Migration:
+    """Run-once build of a collection derived from the bills, safe while bills are being written.
+
+    One document per migration holds its state and a lock. A run clears the
+    derived data and replays every bill. Writers never decide by _id order,
+    which comes from their own clocks: after inserting, a writer asks the
+    migration document, in one atomic update, whether a run is in progress
+    (see live_bills). If one is, the bill _ids are queued on the document
+    and the run applies them, skipping any its scan already read, before it
+    marks itself done. If none has finished, the writer applies nothing,
+    since a later run's scan will read the bills. Once done, writers apply
+    their bills themselves.
+    """
+    collection_name = 'migrations'
+    # A lock not refreshed for this long belongs to a run that died
+    LOCK_SECONDS = 10 * 60
+    IN_PROGRESS = ['clearing', 'running']
+
+    # Migrations this process has seen finish
+    _done = set()
+
+    @staticmethod
+    def get_collection():
+        return get_db()[Migration.collection_name]
+
+    @staticmethod
+    def _lock(name, token):
+        """Take a migration's lock; False if it is done or another live run holds it"""
+        now = datetime.utcnow()
+        try:
+            Migration.get_collection().find_one_and_update(
+                {'_id': name, 'state': {'$ne': 'done'}, '$or': [
+                    {'owner': None},
+                    {'locked_at': {'$lt': now - timedelta(seconds=Migration.LOCK_SECONDS)}}
+                ]},
+                # Bills queued for a run that died are read by this run's scan
+                {'$set': {'state': 'clearing', 'owner': token, 'locked_at': now, 'queued': []}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The document exists but did not match, so the upsert tried to insert another
+            return False
+        return True
+
+    @staticmethod
+    def _update(name, token, fields):
+        """Update the run's document and refresh its lock, raising if another run took the lock over"""
+        result = Migration.get_collection().update_one(
+            {'_id': name, 'owner': token},
+            {'$set': dict(fields, locked_at=datetime.utcnow())}
+        )
+        if result.matched_count != 1:
+            raise RuntimeError(f'Migration {name!r} lost its lock to another run')
+
+    @staticmethod
+    def _take_queued(name, token):
+        """Atomically take the bill _ids writers queued for the run"""
+        doc = Migration.get_collection().find_one_and_update(
+            {'_id': name, 'owner': token},
+            {'$set': {'queued': [], 'locked_at': datetime.utcnow()}},
+            projection={'queued': 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if doc is None:
+            raise RuntimeError(f'Migration {name!r} lost its lock to another run')
+        return doc.get('queued', [])
+
+    @staticmethod
+    def run(name, clear, apply, projection=None, chunk_size=1000):
+        """Clear the derived data and replay existing bills through apply(chunk), once.
+
+        Returns False without doing anything if the migration already ran or
+        another run holds its lock. A run that fails releases the lock, and
+        the next run starts over.
+        """
+        if Migration.is_done(name):
+            return False
+        token = ObjectId()
+        if not Migration._lock(name, token):
+            return False
+
+        collection = Migration.get_collection()
+        try:
+            clear()
+            Migration._update(name, token, {'state': 'running'})
+
+            # _ids the scan applied, so queued bills it already read are not applied twice
+            applied = set()
+            chunk = []
+            bills = Bill.get_collection().find({}, projection).sort('_id', ASCENDING)
+            for bill in bills:
+                chunk.append(bill)
+                if len(chunk) >= chunk_size:
+                    apply(chunk)
+                    applied.update(bill['_id'] for bill in chunk)
+                    chunk = []
+                    Migration._update(name, token, {})
+            if chunk:
+                apply(chunk)
+                applied.update(bill['_id'] for bill in chunk)
+
+            while True:
+                queued = [bill_id for bill_id in Migration._take_queued(name, token) if bill_id not in applied]
+                for start in range(0, len(queued), chunk_size):
+                    ids = queued[start:start + chunk_size]
+                    chunk = list(Bill.get_collection().find({'_id': {'$in': ids}}, projection))
+                    if chunk:
+                        apply(chunk)
+                    applied.update(ids)
+                # Done only if no writer queued a bill since the take
+                result = collection.update_one(
+                    {'_id': name, 'owner': token, 'queued': {'$size': 0}},
+                    {'$set': {'state': 'done', 'finished_at': datetime.utcnow()}, '$unset': {'queued': ''}}
+                )
+                if result.matched_count == 1:
+                    break
+            Migration._done.add(name)
+            return True
+        finally:
+            # A failed run stops writers queuing; the next run's scan reads their bills
+            collection.update_one(
+                {'_id': name, 'owner': token, 'state': {'$ne': 'done'}},
+                {'$set': {'state': 'failed'}, '$unset': {'queued': ''}}
+            )
+            collection.update_one({'_id': name, 'owner': token}, {'$unset': {'owner': '', 'locked_at': ''}})
+
+    @staticmethod
+    def mark_done(name):
+        """Record a migration the caller applied in place, such as a backfill, as done"""
+        Migration.get_collection().update_one(
+            {'_id': name},
+            {'$set': {'state': 'done', 'finished_at': datetime.utcnow()}},
+            upsert=True
+        )
+        Migration._done.add(name)
+
+    @staticmethod
+    def is_done(name):
+        if name in Migration._done:
+            return True
+        doc = Migration.get_collection().find_one({'_id': name}, {'state': 1})
+        if doc and doc.get('state') == 'done':
+            Migration._done.add(name)
+            return True
+        return False
+
+    @staticmethod
+    def live_bills(name, bills):
+        """The newly inserted bill documents (with _id) a writer should apply itself; the migration applies the rest.
+
+        Queues the bills on a run in progress and reads the state in the
+        same update, so each bill is applied by exactly one side.
+        """
+        if name in Migration._done or not bills:
+            return bills
+        in_progress = {'$in': [{'$ifNull': ['$state', None]}, Migration.IN_PROGRESS]}
+        doc = Migration.get_collection().find_one_and_update(
+            {'_id': name},
+            [{'$set': {'queued': {'$cond': [
+                in_progress,
+                {'$concatArrays': [{'$ifNull': ['$queued', []]}, [bill['_id'] for bill in bills]]},
+                {'$ifNull': ['$queued', []]}
+            ]}}}],
+            projection={'state': 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if doc and doc.get('state') == 'done':
+            Migration._done.add(name)
+            return bills
+        # Queued on a run in progress, or a later run's scan will read them
+        return []
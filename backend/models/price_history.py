@@ -0,0 +1,219 @@
+import heapq
+from collections import defaultdict
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from config.database import get_db
+from models.bill import Bill
+from models.migration import Migration
+from services.item_catalog import item_key
+
+class PriceHistory:
+    """Per-item price observations, appended as bills are written.
+
+    Observations are pushed into bucket documents holding up to BUCKET_SIZE
+    points for one item and month, which serve date-range reads. A stats
+    document per item (store-wide, user_id None) and per (user, item) keeps
+    the running count, sum, min, max and the two latest observations, so a
+    trend or a deal check reads one document per item.
+
+    The store-wide history is a log of observed prices and keeps them when a
+    bill is deleted; a user's stats are recomputed for the deleted bill's items.
+
+    Bills written before the history existed are replayed by the BUILD
+    migration (python -m config.indexes); writers go through record_live.
+    """
+    collection_name = 'price_history'
+    stats_collection_name = 'price_stats'
+    BUILD = 'price_history'
+    BUCKET_SIZE = 200
+    # Newest month first, so a capped range read stops early
+    BUCKET_ORDER = [('month', DESCENDING)]
+
+    @staticmethod
+    def get_collection():
+        return get_db()[PriceHistory.collection_name]
+
+    @staticmethod
+    def get_stats_collection():
+        return get_db()[PriceHistory.stats_collection_name]
+
+    @staticmethod
+    def ensure_indexes():
+        """Create indexes used by bucket appends, range reads and stats lookups"""
+        PriceHistory.get_collection().create_index(
+            [('item_id', ASCENDING), ('month', ASCENDING), ('count', ASCENDING)]
+        )
+        PriceHistory.get_stats_collection().create_index(
+            [('item_id', ASCENDING), ('user_id', ASCENDING)],
+            unique=True
+        )
+
+    @staticmethod
+    def _observations(bills):
+        """(item key, user_id, name, date, price) for every item of the bills"""
+        for bill in bills:
+            for item in bill.get('items', []):
+                yield item_key(item), bill['user_id'], item.get('name'), bill['created_at'], item.get('price', 0)
+
+    @staticmethod
+    def _stats_update(name, points):
+        """Merge a batch of (date, price) points into a stats document"""
+        prices = [price for _, price in points]
+        latest = heapq.nlargest(2, points, key=lambda point: point[0])
+        return {
+            '$inc': {'count': len(prices), 'sum': sum(prices)},
+            '$min': {'min': min(prices)},
+            '$max': {'max': max(prices)},
+            '$push': {'latest': {
+                '$each': [{'date': date, 'price': price} for date, price in latest],
+                '$sort': {'date': -1},
+                '$slice': 2
+            }},
+            '$setOnInsert': {'name': name}
+        }
+
+    @staticmethod
+    def record_bills(bills):
+        """Append the prices of bill documents (with datetime created_at) to the history"""
+        buckets = defaultdict(list)
+        stats = defaultdict(list)
+        names = {}
+        for key, user_id, name, date, price in PriceHistory._observations(bills):
+            buckets[(key, date.strftime('%Y-%m'))].append({'date': date, 'price': price})
+            stats[(key, None)].append((date, price))
+            stats[(key, user_id)].append((date, price))
+            names.setdefault(key, name)
+
+        bucket_operations = [
+            UpdateOne(
+                PriceHistory.open_bucket_filter(key, month, len(chunk)),
+                {
+                    '$push': {'points': {'$each': chunk}},
+                    '$inc': {'count': len(chunk)},
+                    '$min': {'start': min(point['date'] for point in chunk)},
+                    '$max': {'end': max(point['date'] for point in chunk)}
+                },
+                upsert=True
+            )
+            for (key, month), points in buckets.items()
+            for chunk in (points[i:i + PriceHistory.BUCKET_SIZE] for i in range(0, len(points), PriceHistory.BUCKET_SIZE))
+        ]
+        stats_operations = [
+            UpdateOne({'item_id': key, 'user_id': user_id}, PriceHistory._stats_update(names[key], points), upsert=True)
+            for (key, user_id), points in stats.items()
+        ]
+        if bucket_operations:
+            PriceHistory.get_collection().bulk_write(bucket_operations, ordered=False)
+        if stats_operations:
+            PriceHistory.get_stats_collection().bulk_write(stats_operations, ordered=False)
+
+    @staticmethod
+    def record_live(bills):
+        """Record newly written bill documents, leaving those an unfinished build will replay"""
+        PriceHistory.record_bills(Migration.live_bills(PriceHistory.BUILD, bills))
+
+    @staticmethod
+    def rebuild_user_stats(user_id, keys):
+        """Recompute a user's stats for some items from their remaining bills"""
+        keys = set(keys)
+        collection = PriceHistory.get_stats_collection()
+        collection.delete_many({'user_id': user_id, 'item_id': {'$in': list(keys)}})
+
+        points = defaultdict(list)
+        names = {}
+        bills = Bill.get_collection().find({'user_id': user_id}, {'user_id': 1, 'items': 1, 'created_at': 1})
+        for key, _, name, date, price in PriceHistory._observations(bills):
+            if key in keys:
+                points[key].append((date, price))
+                names.setdefault(key, name)
+
+        operations = [
+            UpdateOne({'item_id': key, 'user_id': user_id}, PriceHistory._stats_update(names[key], item_points), upsert=True)
+            for key, item_points in points.items()
+        ]
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+
+    @staticmethod
+    def remove_bill(bill):
+        """Account for a deleted bill document in its user's stats"""
+        if not Migration.is_done(PriceHistory.BUILD):
+            # Stats are being built from the remaining bills
+            return
+        PriceHistory.rebuild_user_stats(bill['user_id'], [key for key, *_ in PriceHistory._observations([bill])])
+
+    @staticmethod
+    def _clear():
+        PriceHistory.get_collection().delete_many({})
+        PriceHistory.get_stats_collection().delete_many({})
+
+    @staticmethod
+    def ensure_built():
+        """Build the history from existing bills, once across all processes; True if this call built it"""
+        return Migration.run(
+            PriceHistory.BUILD,
+            PriceHistory._clear,
+            PriceHistory.record_bills,
+            projection={'user_id': 1, 'items': 1, 'created_at': 1}
+        )
+
+    @staticmethod
+    def open_bucket_filter(key, month, size):
+        """The item's buckets for a month with room for ``size`` more points; an upsert that matches none starts a new one"""
+        return {'item_id': key, 'month': month, 'count': {'$lte': PriceHistory.BUCKET_SIZE - size}}
+
+    @staticmethod
+    def find_stats(key, user_id=None):
+        return PriceHistory.get_stats_collection().find_one({'item_id': key, 'user_id': user_id})
+
+    @staticmethod
+    def stats_filter(keys, user_id=None):
+        return {'item_id': {'$in': list(set(keys))}, 'user_id': user_id}
+
+    @staticmethod
+    def find_stats_many(keys, user_id=None):
+        """Stats documents by item key"""
+        cursor = PriceHistory.get_stats_collection().find(PriceHistory.stats_filter(keys, user_id))
+        return {doc['item_id']: doc for doc in cursor}
+
+    @staticmethod
+    def range_filter(key, start=None, end=None):
+        """Buckets that may hold points for an item between two datetimes"""
+        query = {'item_id': key}
+        if start or end:
+            query['month'] = {}
+            if start:
+                query['month']['$gte'] = start.strftime('%Y-%m')
+            if end:
+                query['month']['$lte'] = end.strftime('%Y-%m')
+        return query
+
+    @staticmethod
+    def find_points(key, start=None, end=None, limit=None):
+        """Chronological {date, price} points for an item between two naive UTC datetimes.
+
+        With a limit, only the latest ``limit`` points are returned, reading
+        buckets back from the newest month until enough are found; the flag
+        says whether older points were left out.
+        """
+        buckets = PriceHistory.get_collection().find(
+            PriceHistory.range_filter(key, start, end),
+            {'_id': 0, 'month': 1, 'points': 1}
+        ).sort(PriceHistory.BUCKET_ORDER)
+        points = []
+        truncated = False
+        month = None
+        for bucket in buckets:
+            # Points are only ordered across months, so finish a month before stopping
+            if limit is not None and bucket['month'] != month and len(points) >= limit:
+                truncated = True
+                break
+            month = bucket['month']
+            points.extend(
+                point for point in bucket['points']
+                if (start is None or point['date'] >= start) and (end is None or point['date'] <= end)
+            )
+        points.sort(key=lambda point: point['date'])
+        if limit is not None and len(points) > limit:
+            points = points[-limit:]
+            truncated = True
+        return points, truncated
@@ -0,0 +1,121 @@
+from collections import defaultdict
+from pymongo import UpdateOne
+from config.database import get_db
+from models.migration import Migration
+from services.item_catalog import item_key
+from services.quantile_sketch import TDigest
+
+class PriceSketch:
+    """Store-wide price distribution per item, as a t-digest across all users.
+
+    New prices are appended to a document's ``pending`` list with one
+    update per item per batch; once FLUSH_SIZE are pending they are folded
+    into the digest. Folding is guarded by ``version``, so concurrent
+    writers never fold the same prices twice and appends made meanwhile
+    stay pending. A document holds at most about ``compression`` centroids
+    plus the pending prices, whatever the number of observations.
+
+    Bills written before the sketches existed are replayed by the BUILD
+    migration (python -m config.indexes); writers go through add_live.
+    """
+    collection_name = 'price_sketches'
+    BUILD = 'price_sketches'
+    FLUSH_SIZE = 256
+    # Upper bound for $slice counts, larger than any pending list
+    MAX_PENDING = 2 ** 31 - 1
+
+    @staticmethod
+    def get_collection():
+        return get_db()[PriceSketch.collection_name]
+
+    @staticmethod
+    def _prices(bills):
+        prices = defaultdict(list)
+        names = {}
+        for bill in bills:
+            for item in bill.get('items', []):
+                key = item_key(item)
+                prices[key].append(item.get('price', 0))
+                names.setdefault(key, item.get('name'))
+        return prices, names
+
+    @staticmethod
+    def add_bills(bills):
+        """Append the prices of bill documents, then fold items with enough pending prices"""
+        prices, names = PriceSketch._prices(bills)
+        if not prices:
+            return
+        operations = [
+            UpdateOne(
+                {'_id': key},
+                {
+                    '$push': {'pending': {'$each': item_prices}},
+                    '$inc': {'pending_count': len(item_prices)},
+                    '$setOnInsert': {'name': names[key], 'version': 0}
+                },
+                upsert=True
+            )
+            for key, item_prices in prices.items()
+        ]
+        collection = PriceSketch.get_collection()
+        collection.bulk_write(operations, ordered=False)
+
+        full = collection.find({'_id': {'$in': list(prices)}, 'pending_count': {'$gte': PriceSketch.FLUSH_SIZE}})
+        for doc in full:
+            PriceSketch.fold(doc)
+
+    @staticmethod
+    def add_live(bills):
+        """Add newly written bill documents, leaving those an unfinished build will replay"""
+        PriceSketch.add_bills(Migration.live_bills(PriceSketch.BUILD, bills))
+
+    @staticmethod
+    def digest_of(doc):
+        """The document's digest with its pending prices folded in, in memory"""
+        digest = TDigest.from_dict(doc.get('digest'))
+        digest.update(doc.get('pending', []))
+        return digest
+
+    @staticmethod
+    def fold(doc):
+        """Fold a loaded document's pending prices into its stored digest; False if another writer folded first"""
+        folded = len(doc.get('pending', []))
+        if not folded:
+            return True
+        digest = PriceSketch.digest_of(doc)
+        result = PriceSketch.get_collection().update_one(
+            {'_id': doc['_id'], 'version': doc.get('version', 0)},
+            [{'$set': {
+                'digest': {'$literal': digest.to_dict()},
+                'count': {'$add': [{'$ifNull': ['$count', 0]}, folded]},
+                # Keep prices appended after this document was read
+                'pending': {'$slice': ['$pending', folded, PriceSketch.MAX_PENDING]},
+                'pending_count': {'$subtract': ['$pending_count', folded]},
+                'version': {'$add': ['$version', 1]}
+            }}]
+        )
+        return result.modified_count == 1
+
+    @staticmethod
+    def _clear():
+        PriceSketch.get_collection().delete_many({})
+
+    @staticmethod
+    def ensure_built():
+        """Build the sketches from existing bills, once across all processes; True if this call built it"""
+        return Migration.run(
+            PriceSketch.BUILD,
+            PriceSketch._clear,
+            PriceSketch.add_bills,
+            projection={'items.item_id': 1, 'items.name': 1, 'items.price': 1}
+        )
+
+    @staticmethod
+    def keys_filter(keys):
+        return {'_id': {'$in': list(set(keys))}}
+
+    @staticmethod
+    def find_digests(keys):
+        """Current digests (pending prices included) by item key"""
+        cursor = PriceSketch.get_collection().find(PriceSketch.keys_filter(keys))
+        return {doc['_id']: PriceSketch.digest_of(doc) for doc in cursor}
@@ -0,0 +1,65 @@
+from bson.objectid import ObjectId
+from datetime import datetime
+from pymongo import ASCENDING
+from config.database import get_db
+
+class ReceiptJob:
+    """Status of an image receipt queued for off-request OCR"""
+    collection_name = 'receipt_jobs'
+    # Finished and abandoned jobs are removed by a TTL index after this long
+    expire_after_seconds = 24 * 60 * 60
+
+    @staticmethod
+    def get_collection():
+        return get_db()[ReceiptJob.collection_name]
+
+    @staticmethod
+    def ensure_indexes():
+        """Create the TTL index that expires old jobs"""
+        ReceiptJob.get_collection().create_index(
+            [('created_at', ASCENDING)],
+            expireAfterSeconds=ReceiptJob.expire_after_seconds
+        )
+
+    @staticmethod
+    def create(user_id=None):
+        result = ReceiptJob.get_collection().insert_one({
+            'user_id': user_id,
+            'status': 'queued',
+            'created_at': datetime.utcnow()
+        })
+        return str(result.inserted_id)
+
+    @staticmethod
+    def mark_done(job_id, items):
+        ReceiptJob.get_collection().update_one(
+            ReceiptJob.id_filter(job_id),
+            {'$set': {'status': 'done', 'items': items, 'finished_at': datetime.utcnow()}}
+        )
+
+    @staticmethod
+    def mark_failed(job_id, error):
+        ReceiptJob.get_collection().update_one(
+            ReceiptJob.id_filter(job_id),
+            {'$set': {'status': 'failed', 'error': error, 'finished_at': datetime.utcnow()}}
+        )
+
+    @staticmethod
+    def id_filter(job_id):
+        return {'_id': ObjectId(job_id)}
+
+    @staticmethod
+    def find_by_id(job_id):
+        return ReceiptJob.get_collection().find_one(ReceiptJob.id_filter(job_id))
+
+    @staticmethod
+    def to_dict(job):
+        return {
+            'job_id': str(job['_id']),
+            'status': job['status'],
+            'items': job.get('items'),
+            'count': len(job['items']) if job.get('items') is not None else None,
+            'error': job.get('error'),
+            'created_at': job['created_at'].isoformat(),
+            'finished_at': job['finished_at'].isoformat() if job.get('finished_at') else None
+        }
@@ -1,8 +1,18 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING
+from config.database import get_db
+from services.cache import get_user_cache
+from services.password_hasher import get_password_hasher
 
 class User:
+    collection_name = 'users'
+    # Fields returned by listings; never ship password hashes over the wire
+    PUBLIC_PROJECTION = {'username': 1, 'email': 1, 'role': 1, 'is_active': 1, 'created_at': 1}
+    LISTING_ORDER = [('_id', ASCENDING)]
+    __slots__ = ('_id', 'username', 'email', 'password_hash', 'role', 'is_active', 'created_at')
+
     def __init__(self, username, email, password=None, role='customer', _id=None, is_active=True, created_at=None):
         self._id = _id
         self.username = username
@@ -14,13 +24,95 @@ class User:
         self.is_active = is_active
         self.created_at = created_at or datetime.utcnow()
     
+    @staticmethod
+    def ensure_indexes():
+        """Create indexes used by user lookups"""
+        collection = get_db()[User.collection_name]
+        collection.create_index([('username', ASCENDING)], unique=True)
+        collection.create_index([('email', ASCENDING)], unique=True)
+        collection.create_index([('role', ASCENDING), ('is_active', ASCENDING), ('_id', ASCENDING)])
+    
+    @staticmethod
+    def find_by_id(user_id):
+        """Find a user by ID, served from the short-lived profile cache"""
+        cache = get_user_cache()
+        user = cache.get(str(user_id))
+        if user is None:
+            doc = get_db()[User.collection_name].find_one(User.id_filter(user_id), {'password_hash': 0})
+            user = User.from_mongo(doc)
+            if user is None:
+                return None
+            cache.set(str(user_id), user)
+        return user
+    
+    @staticmethod
+    def id_filter(user_id):
+        return {'_id': ObjectId(user_id)}
+    
+    @staticmethod
+    def username_filter(username):
+        return {'username': username}
+    
+    @staticmethod
+    def email_filter(email):
+        return {'email': email}
+    
+    @staticmethod
+    def listing_filter(role=None, is_active=None, after=None):
+        """Users matching the admin listing filters after a keyset position, for LISTING_ORDER"""
+        query = {}
+        if role is not None:
+            query['role'] = role
+        if is_active is not None:
+            query['is_active'] = is_active
+        if after:
+            try:
+                query['_id'] = {'$gt': ObjectId(after)}
+            except InvalidId:
+                raise ValueError('Invalid cursor')
+        return query
+    
+    @staticmethod
+    def iter_users(role=None, is_active=None, after=None, limit=0, batch_size=500):
+        """Get a cursor over public user documents in _id order, after a keyset position"""
+        return (
+            get_db()[User.collection_name]
+            .find(User.listing_filter(role, is_active, after), User.PUBLIC_PROJECTION)
+            .sort(User.LISTING_ORDER)
+            .limit(limit)
+            .batch_size(batch_size)
+        )
+    
+    @staticmethod
+    def invalidate(user_id):
+        """Drop a user's cached profile after it changes"""
+        get_user_cache().delete(str(user_id))
+    
+    @staticmethod
+    def update_password_hash(user_id, password_hash):
+        """Store a rehashed password"""
+        get_db()[User.collection_name].update_one(
+            User.id_filter(user_id),
+            {'$set': {'password_hash': password_hash}}
+        )
+    
+    @staticmethod
+    def set_active(user_id, is_active):
+        """Activate or deactivate a user, returning False if not found"""
+        result = get_db()[User.collection_name].update_one(
+            User.id_filter(user_id),
+            {'$set': {'is_active': is_active}}
+        )
+        User.invalidate(user_id)
+        return result.matched_count > 0
+    
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_password_hasher().hash(password)
     
     def check_password(self, password):
         """Verify password"""
-        return check_password_hash(self.password_hash, password)
+        return get_password_hasher().verify(self.password_hash, password)
     
     def to_dict(self):
         """Convert user to dictionary"""
@@ -48,17 +140,18 @@ class User:
         return doc
     
     @staticmethod
-    def from_mongo(doc):
-        """Create User from MongoDB document"""
+    def from_document(doc):
+        """Create User from MongoDB document, keeping its stored fields as-is"""
         if not doc:
             return None
-        user = User(
-            username=doc['username'],
-            email=doc['email'],
-            role=doc.get('role', 'customer'),
-            _id=doc['_id'],
-            is_active=doc.get('is_active', True),
-            created_at=doc.get('created_at')
-        )
+        user = User.__new__(User)
+        user._id = doc['_id']
+        user.username = doc['username']
+        user.email = doc['email']
         user.password_hash = doc.get('password_hash')
-        return user
\ No newline at end of file
+        user.role = doc.get('role', 'customer')
+        user.is_active = doc.get('is_active', True)
+        user.created_at = doc.get('created_at')
+        return user
+
+    from_mongo = from_document
\ No newline at end of file
@@ -1,32 +1,46 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import (
     create_access_token, 
     create_refresh_token,
     jwt_required, 
     get_jwt_identity,
-    get_jwt
+    get_jwt,
+    verify_jwt_in_request
 )
 from datetime import timedelta
 from models.user import User
+from services.password_hasher import HasherBusy, get_password_hasher
 from config.database import get_db
 from utils.validators import validate_email, validate_password
 from functools import wraps
-from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 auth_bp = Blueprint('auth', __name__)
 
+DEFAULT_USERS_PAGE_SIZE = 100
+MAX_USERS_PAGE_SIZE = 1000
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+USER_EXPORT_FIELDS = ['id', 'username', 'email', 'role', 'created_at', 'is_active']
+
 def admin_required(fn):
-    """Decorator to require admin role"""
+    """Decorator to require a valid access token with the admin role claim; use it instead of jwt_required"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        from flask_jwt_extended import verify_jwt_in_request
         verify_jwt_in_request()
-        claims = get_jwt()
-        if claims.get('role') != 'admin':
+        if get_jwt().get('role') != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         return fn(*args, **kwargs)
     return wrapper
 
+def _busy_response(error):
+    """429 telling the client to back off while password hashing is saturated"""
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new user"""
@@ -59,21 +73,25 @@ def register():
             return jsonify({'error': message}), 400
         
         # Check if user already exists
-        if db.users.find_one({'username': username}):
+        if db.users.find_one(User.username_filter(username)):
             return jsonify({'error': 'Username already exists'}), 409
         
-        if db.users.find_one({'email': email}):
+        if db.users.find_one(User.email_filter(email)):
             return jsonify({'error': 'Email already exists'}), 409
         
-        # Create new user
+        # Create new user, hashing on the bounded pool
         new_user = User(
             username=username,
             email=email,
-            password=password,
             role=role
         )
+        new_user.password_hash = get_password_hasher().hash_bounded(password)
         
-        result = db.users.insert_one(new_user.to_mongo())
+        try:
+            result = db.users.insert_one(new_user.to_mongo())
+        except DuplicateKeyError:
+            # Lost a race with a concurrent registration for the same username/email
+            return jsonify({'error': 'Username or email already exists'}), 409
         new_user._id = result.inserted_id
         
         # Create tokens
@@ -90,6 +108,8 @@ def register():
             'refresh_token': refresh_token
         }), 201
         
+    except HasherBusy as e:
+        return _busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -108,15 +128,20 @@ def login():
         password = data['password']
         
         # Find user
-        user_doc = db.users.find_one({'username': username})
+        user_doc = db.users.find_one(User.username_filter(username))
         user = User.from_mongo(user_doc)
         
-        if not user or not user.check_password(password):
+        hasher = get_password_hasher()
+        if not user or not hasher.verify_bounded(user.password_hash, password):
             return jsonify({'error': 'Invalid username or password'}), 401
         
         if not user.is_active:
             return jsonify({'error': 'Account is deactivated'}), 403
         
+        # Upgrade hashes made with old parameters while the password is at hand
+        if hasher.needs_rehash(user.password_hash):
+            User.update_password_hash(user._id, hasher.hash_bounded(password))
+        
         # Create tokens
         access_token = create_access_token(
             identity=str(user._id),
@@ -131,6 +156,8 @@ def login():
             'refresh_token': refresh_token
         }), 200
         
+    except HasherBusy as e:
+        return _busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -140,10 +167,7 @@ def refresh():
     """Refresh access token"""
     try:
         current_user_id = get_jwt_identity()
-        db = get_db()
-        
-        user_doc = db.users.find_one({'_id': ObjectId(current_user_id)})
-        user = User.from_mongo(user_doc)
+        user = User.find_by_id(current_user_id)
         
         if not user or not user.is_active:
             return jsonify({'error': 'User not found or inactive'}), 404
@@ -172,10 +196,7 @@ def get_current_user():
     """Get current user info"""
     try:
         current_user_id = get_jwt_identity()
-        db = get_db()
-        
-        user_doc = db.users.find_one({'_id': ObjectId(current_user_id)})
-        user = User.from_mongo(user_doc)
+        user = User.find_by_id(current_user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -188,36 +209,92 @@ def get_current_user():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/users', methods=['GET'])
-@jwt_required()
 @admin_required
 def get_all_users():
-    """Get all users (admin only)"""
+    """List users (admin only), paginated by ?after=&limit= or exported with ?export=csv|ndjson"""
     try:
-        db = get_db()
-        users_docs = db.users.find()
-        users = [User.from_mongo(doc).to_dict() for doc in users_docs]
+        role = request.args.get('role')
+        active = request.args.get('active')
+        after = request.args.get('after')
+        limit = request.args.get('limit', type=int)
+        export = request.args.get('export')
+        
+        if active not in (None, 'true', 'false'):
+            return jsonify({'error': 'active must be true or false'}), 400
+        is_active = None if active is None else active == 'true'
+        
+        if export:
+            if export not in EXPORT_FORMATS:
+                return jsonify({'error': 'export must be csv or ndjson'}), 400
+            cursor = User.iter_users(role=role, is_active=is_active, after=after, limit=limit or 0)
+            return _export_users(cursor, export)
+        
+        limit = min(max(limit or DEFAULT_USERS_PAGE_SIZE, 1), MAX_USERS_PAGE_SIZE)
+        users = [User.from_mongo(doc).to_dict()
+                 for doc in User.iter_users(role=role, is_active=is_active, after=after, limit=limit)]
         
         return jsonify({
-            'users': users
+            'users': users,
+            'next_after': users[-1]['id'] if len(users) == limit else None
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _export_users(cursor, fmt):
+    """Stream users from a cursor as CSV or NDJSON"""
+    def generate():
+        if fmt == 'ndjson':
+            for doc in cursor:
+                yield json.dumps(User.from_mongo(doc).to_dict()) + '\n'
+            return
+        
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=USER_EXPORT_FIELDS)
+        writer.writeheader()
+        for doc in cursor:
+            writer.writerow(User.from_mongo(doc).to_dict())
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    
+    headers = {'Content-Disposition': f'attachment; filename=users.{fmt}'}
+    return Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
 @auth_bp.route('/users/<user_id>', methods=['DELETE'])
-@jwt_required()
 @admin_required
 def delete_user(user_id):
     """Delete user (admin only)"""
     try:
         db = get_db()
         
-        result = db.users.delete_one({'_id': ObjectId(user_id)})
+        result = db.users.delete_one(User.id_filter(user_id))
+        User.invalidate(user_id)
         
         if result.deleted_count == 0:
             return jsonify({'error': 'User not found'}), 404
         
         return jsonify({'message': 'User deleted successfully'}), 200
         
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/users/<user_id>/active', methods=['PUT'])
+@admin_required
+def set_user_active(user_id):
+    """Activate or deactivate a user (admin only)"""
+    try:
+        data = request.get_json() or {}
+        if not isinstance(data.get('is_active'), bool):
+            return jsonify({'error': 'is_active must be true or false'}), 400
+        
+        if not User.set_active(user_id, data['is_active']):
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({'message': 'User updated successfully'}), 200
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,14 +1,39 @@
-from flask import Blueprint, request, jsonify
+import io
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from models.bill import Bill
 from models.item import Item
+from models.analytics_rollup import AnalyticsRollup
+from models.price_history import PriceHistory
+from models.price_sketch import PriceSketch
+from models.receipt_job import ReceiptJob
+from models.cache_version import CacheVersion
+from services.cache import get_cache, user_cache_key
+from services.profiling import span
+from utils.serialization import dumps_bytes
+from utils.validators import parse_utc_datetime, validate_bill_items
 from services.calculator import Calculator
-from services.analytics import BudgetAnalytics
+from services.batch_pricing import BatchPricer
+from services.bill_importer import BillImporter
+from services.analytics import RollupAnalytics
+from services.item_catalog import get_item_catalog, item_key
 from services.price_tracker import PriceTracker
 from services.shopping_list import ShoppingListGenerator
-from services.ocr_service import ReceiptOCRService
+from services.ocr_service import ReceiptOCRService, parse_receipts_batch
+from services.receipt_images import ImageTooLarge, max_request_bytes, spool_base64, spool_stream, submit_receipt_image
 
 bills_bp = Blueprint('bills', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_IMPORT_CHUNK_SIZE = 10000
+MAX_BATCH_CARTS = 10000
+MAX_BATCH_ITEMS = 100000
+MAX_BATCH_RECEIPTS = 1000
+MAX_PRICE_CHECK_ITEMS = 1000
+MAX_PRICE_HISTORY_POINTS = 1000
+
 @bills_bp.route('/calculate', methods=['POST'])
 def calculate_bill():
     """Calculate bill total from items"""
@@ -36,6 +61,56 @@ def calculate_bill():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bills_bp.route('/calculate/batch', methods=['POST'])
+def calculate_bills_batch():
+    """Calculate totals for many carts in one request"""
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        pricer = BatchPricer()
+        
+        # Columnar form: {"columns": {"cart_index", "prices", "quantities", "discounts"}}
+        columns = data.get('columns')
+        if columns:
+            if not isinstance(columns, dict) or not all(
+                isinstance(columns.get(name, []), list) for name in ('cart_index', 'prices', 'quantities', 'discounts')
+            ):
+                return jsonify({
+                    'error': 'columns must be an object of cart_index, prices, quantities and discounts lists'
+                }), 400
+            if len(columns.get('discounts', [])) > MAX_BATCH_CARTS:
+                return jsonify({'error': f'At most {MAX_BATCH_CARTS} carts per request'}), 400
+            if max(len(columns.get(name, [])) for name in ('cart_index', 'prices', 'quantities')) > MAX_BATCH_ITEMS:
+                return jsonify({'error': f'At most {MAX_BATCH_ITEMS} items per request'}), 400
+            try:
+                results = pricer.price_columnar(columns)
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({'error': f'Invalid columns: {e}'}), 400
+            return jsonify({
+                'columns': results,
+                'count': len(results['total'])
+            }), 200
+        
+        carts = data.get('carts', [])
+        if not carts:
+            return jsonify({'error': 'No carts provided'}), 400
+        if len(carts) > MAX_BATCH_CARTS:
+            return jsonify({'error': f'At most {MAX_BATCH_CARTS} carts per request'}), 400
+        
+        try:
+            results = pricer.price_carts(carts)
+        except (AttributeError, TypeError, ValueError):
+            return jsonify({'error': 'Each cart must have items with numeric price and quantity'}), 400
+        
+        return jsonify({
+            'results': results,
+            'count': len(results)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bills_bp.route('/', methods=['POST'])
 def create_bill():
     """Create and save a new bill"""
@@ -47,6 +122,11 @@ def create_bill():
         if not user_id or not items:
             return jsonify({'error': 'user_id and items are required'}), 400
         
+        try:
+            validate_bill_items(items)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Calculate totals
         calculator = Calculator()
         subtotal = calculator.calculate_subtotal(items)
@@ -63,6 +143,10 @@ def create_bill():
         )
         
         bill_id = bill.save()
+        AnalyticsRollup.apply_bill(bill.to_mongo())
+        PriceHistory.record_live([bill.to_mongo()])
+        PriceSketch.add_live([bill.to_mongo()])
+        CacheVersion.bump(user_id)
         
         return jsonify({
             'message': 'Bill created successfully',
@@ -73,34 +157,114 @@ def create_bill():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bills_bp.route('/import', methods=['POST'])
+def import_bills():
+    """Bulk import bills from an NDJSON or CSV request body"""
+    try:
+        fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+        if fmt not in ('ndjson', 'csv'):
+            return jsonify({'error': 'format must be ndjson or csv'}), 400
+        
+        chunk_size = request.args.get('chunk_size', current_app.config.get('BILL_IMPORT_CHUNK_SIZE', 1000), type=int)
+        importer = BillImporter(chunk_size=min(max(chunk_size, 1), MAX_IMPORT_CHUNK_SIZE))
+        
+        # Read the body line by line instead of loading it all
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        if fmt == 'csv':
+            result = importer.import_csv(lines)
+        else:
+            result = importer.import_ndjson(lines)
+        
+        status = 201 if result['inserted'] else 400
+        return jsonify(result), status
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bills_bp.route('/<bill_id>', methods=['GET'])
 def get_bill(bill_id):
     """Get a bill by ID"""
     try:
-        bill = Bill.find_by_id(bill_id)
-        if bill:
-            return jsonify(bill.to_dict()), 200
-        return jsonify({'error': 'Bill not found'}), 404
+        cache = get_cache()
+        # A bill's owner never changes, so it can be cached unversioned; the
+        # bill itself is keyed by the owner's version, which a delete bumps
+        owner = cache.get(f'bill-owner:{bill_id}')
+        bill_data = cache.get(_user_cache_key(owner, 'bill', bill_id)) if owner is not None else None
+        if bill_data is None:
+            bill_doc = Bill.find_document(bill_id)
+            if not bill_doc:
+                return jsonify({'error': 'Bill not found'}), 404
+            bill_data = Bill.document_to_dict(bill_doc)
+            owner = bill_doc['user_id']
+            cache.set(f'bill-owner:{bill_id}', owner)
+            cache.set(_user_cache_key(owner, 'bill', bill_id), bill_data)
+        return jsonify(bill_data), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bills_bp.route('/user/<user_id>', methods=['GET'])
 def get_user_bills(user_id):
-    """Get all bills for a user"""
+    """Get bills for a user, optionally paginated (?after=&limit=) or streamed (?stream=ndjson|json)"""
     try:
-        bills = Bill.find_by_user(user_id)
-        return jsonify([bill.to_dict() for bill in bills]), 200
+        after = request.args.get('after')
+        limit = request.args.get('limit', type=int)
+        stream = request.args.get('stream')
+        
+        if stream:
+            if stream not in ('ndjson', 'json'):
+                return jsonify({'error': 'stream must be ndjson or json'}), 400
+            cursor = Bill.iter_by_user(user_id, after=after, limit=limit or 0)
+            return _stream_bills(cursor, stream)
+        
+        if after is None and limit is None:
+            # The full history can run to megabytes, so only pages are cached
+            return jsonify([Bill.document_to_dict(doc) for doc in Bill.iter_by_user(user_id)]), 200
+        
+        limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+        
+        def load_page():
+            bills_data = list(Bill.iter_by_user(user_id, after=after, limit=limit))
+            return {
+                'bills': [Bill.document_to_dict(doc) for doc in bills_data],
+                'next_after': Bill.encode_cursor(bills_data[-1]) if len(bills_data) == limit else None
+            }
+        
+        return jsonify(get_cache().get_or_set(_user_cache_key(user_id, 'bills', after, limit), load_page)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _user_cache_key(user_id, name, *params):
+    """Cache key that changes whenever the user's bills are written"""
+    return user_cache_key(name, user_id, CacheVersion.get(user_id), *params)
+
+def _stream_bills(cursor, fmt):
+    """Stream bills from a cursor as NDJSON or a chunked JSON array"""
+    def generate():
+        if fmt == 'ndjson':
+            for doc in cursor:
+                yield dumps_bytes(Bill.document_to_dict(doc)) + b'\n'
+            return
+        
+        yield b'['
+        for index, doc in enumerate(cursor):
+            yield (b',' if index else b'') + dumps_bytes(Bill.document_to_dict(doc))
+        yield b']'
+    
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
 @bills_bp.route('/<bill_id>', methods=['DELETE'])
 def delete_bill(bill_id):
     """Delete a bill by ID"""
     try:
-        from bson.objectid import ObjectId
-        result = Bill.get_collection().delete_one({'_id': ObjectId(bill_id)})
+        deleted = Bill.get_collection().find_one_and_delete(Bill.id_filter(bill_id))
         
-        if result.deleted_count > 0:
+        if deleted:
+            AnalyticsRollup.apply_bill(deleted, sign=-1)
+            PriceHistory.remove_bill(deleted)
+            CacheVersion.bump(deleted['user_id'])
             return jsonify({'message': 'Bill deleted successfully'}), 200
         return jsonify({'error': 'Bill not found'}), 404
     except Exception as e:
@@ -110,18 +274,16 @@ def delete_bill(bill_id):
 def get_analytics(user_id):
     """Get spending analytics for a user"""
     try:
-        bills = Bill.find_by_user(user_id)
-        bills_data = [bill.to_dict() for bill in bills]
+        def compute():
+            with span('db'):
+                rollup = AnalyticsRollup.find_by_user(user_id)
+                total_stats = Bill.find_total_stats(user_id, rollup['summary']['count'])
+            with span('compute'):
+                return RollupAnalytics(rollup, total_stats).analyze()
         
-        analytics = BudgetAnalytics(bills_data)
+        analytics = get_cache().get_or_set(_user_cache_key(user_id, 'analytics'), compute)
         
-        return jsonify({
-            'monthly_spending': analytics.calculate_monthly_spending(),
-            'category_breakdown': analytics.get_category_breakdown(),
-            'spending_trends': analytics.get_spending_trends(),
-            'top_items': analytics.get_top_items(),
-            'budget_prediction': analytics.predict_next_month_budget()
-        }), 200
+        return jsonify(analytics), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -130,22 +292,12 @@ def get_analytics(user_id):
 def get_price_trends(item_name):
     """Get price trends for a specific item"""
     try:
-        # Get all bills containing this item
-        all_bills = Bill.get_collection().find()
-        
-        tracker = PriceTracker()
-        
-        for bill in all_bills:
-            for item in bill.get('items', []):
-                if item.get('name').lower() == item_name.lower():
-                    tracker.add_item_price(
-                        item.get('name'),
-                        item.get('price'),
-                        bill.get('created_at')
-                    )
-        
-        trend = tracker.get_price_trend(item_name)
+        # One stats document holds the running aggregates for the item
+        with span('db'):
+            item_id = get_item_catalog().lookup(item_name)
+            stats = PriceHistory.find_stats(item_id) if item_id is not None else None
         
+        trend = PriceTracker.trend_from_stats(item_name, stats)
         if trend:
             return jsonify(trend), 200
         return jsonify({'error': 'Item not found'}), 404
@@ -153,24 +305,86 @@ def get_price_trends(item_name):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _utc_param(name):
+    """An ISO 8601 query parameter as a naive UTC datetime, like stored dates; None if absent"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    return parse_utc_datetime(value)
+
+@bills_bp.route('/price-history/<item_name>', methods=['GET'])
+def get_price_history(item_name):
+    """Get an item's latest price points (?limit=, at most 1000) for charting, optionally between ISO 8601 'from' and 'to' dates"""
+    try:
+        try:
+            start = _utc_param('from')
+            end = _utc_param('to')
+        except ValueError:
+            return jsonify({'error': 'from and to must be ISO 8601 dates'}), 400
+        limit = request.args.get('limit', MAX_PRICE_HISTORY_POINTS, type=int)
+        if not 0 < limit <= MAX_PRICE_HISTORY_POINTS:
+            return jsonify({'error': f'limit must be between 1 and {MAX_PRICE_HISTORY_POINTS}'}), 400
+        
+        item_id = get_item_catalog().lookup(item_name)
+        if item_id is None:
+            return jsonify({'error': 'Item not found'}), 404
+        
+        points, truncated = PriceHistory.find_points(item_id, start, end, limit)
+        return jsonify({
+            'item_name': item_name,
+            'points': points,
+            'truncated': truncated
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bills_bp.route('/price-check', methods=['POST'])
+def price_check():
+    """Flag cart items priced in the bottom percentile (default 10) of all recorded prices"""
+    try:
+        data = request.get_json() or {}
+        items = data.get('items')
+        percentile = data.get('percentile', 10)
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items must be a non-empty list'}), 400
+        if len(items) > MAX_PRICE_CHECK_ITEMS:
+            return jsonify({'error': f'At most {MAX_PRICE_CHECK_ITEMS} items per request'}), 400
+        if any(not isinstance(item, dict) or not isinstance(item.get('name'), str)
+               or not isinstance(item.get('price'), (int, float)) for item in items):
+            return jsonify({'error': 'Each item needs a name and a numeric price'}), 400
+        if not isinstance(percentile, (int, float)) or not 0 < percentile < 100:
+            return jsonify({'error': 'percentile must be between 0 and 100'}), 400
+        
+        # One catalog lookup and one sketch query for the whole cart; items are
+        # always resolved by name, never by a client-supplied item_id
+        with span('db'):
+            item_ids = get_item_catalog().lookup_many([item['name'] for item in items])
+            digests = PriceSketch.find_digests(item_id for item_id in item_ids if item_id is not None)
+        
+        with span('compute'):
+            result = PriceTracker.price_check(items, item_ids, digests, percentile)
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bills_bp.route('/shopping-list/<user_id>', methods=['GET'])
 def generate_shopping_list(user_id):
     """Generate smart shopping list"""
     try:
         days_back = request.args.get('days', 30, type=int)
         
-        bills = Bill.find_by_user(user_id)
-        bills_data = [bill.to_dict() for bill in bills]
+        def compute():
+            # Only the window's bills are read, already grouped per item
+            with span('db'):
+                groups = Bill.find_purchase_groups(user_id, datetime.utcnow() - timedelta(days=days_back))
+            with span('compute'):
+                return ShoppingListGenerator.build_from_groups(groups)
         
-        generator = ShoppingListGenerator(bills_data)
-        suggested_list = generator.generate_smart_list(days_back)
-        grouped_list = generator.group_by_category(suggested_list)
-        
-        return jsonify({
-            'suggested_items': suggested_list,
-            'grouped_by_category': grouped_list,
-            'total_items': len(suggested_list)
-        }), 200
+        return jsonify(get_cache().get_or_set(_user_cache_key(user_id, 'shopping-list', days_back), compute)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -179,14 +393,21 @@ def generate_shopping_list(user_id):
 def parse_receipt():
     """Parse receipt text and extract items"""
     try:
-        data = request.get_json()
-        receipt_text = data.get('text', '')
-        
-        if not receipt_text:
-            return jsonify({'error': 'No receipt text provided'}), 400
-        
         ocr_service = ReceiptOCRService()
-        items = ocr_service.parse_receipt_text(receipt_text)
+        
+        # Uploaded files and plain-text bodies are parsed line by line from the stream
+        if 'receipt' in request.files:
+            items = list(ocr_service.parse_receipt_stream(request.files['receipt'].stream))
+        elif request.mimetype == 'text/plain':
+            items = list(ocr_service.parse_receipt_stream(request.stream))
+        else:
+            data = request.get_json()
+            receipt_text = data.get('text', '')
+            
+            if not receipt_text:
+                return jsonify({'error': 'No receipt text provided'}), 400
+            
+            items = ocr_service.parse_receipt_text(receipt_text)
         
         return jsonify({
             'items': items,
@@ -196,35 +417,122 @@ def parse_receipt():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@bills_bp.route('/best-deals/<user_id>', methods=['GET'])
-def get_best_deals(user_id):
-    """Find best deals based on price history"""
+@bills_bp.route('/parse-receipts', methods=['POST'])
+def parse_receipts():
+    """Parse many receipts from multipart files, NDJSON lines or a JSON list"""
     try:
-        bills = Bill.find_by_user(user_id)
+        if request.files:
+            texts = [
+                f.read().decode('utf-8', errors='replace')
+                for f in request.files.getlist('receipts')
+            ]
+        elif request.mimetype == 'application/x-ndjson':
+            texts = []
+            for number, line in enumerate(io.TextIOWrapper(request.stream, encoding='utf-8'), start=1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    return jsonify({'error': f'Line {number} is not valid JSON'}), 400
+                if not isinstance(entry, dict) or not isinstance(entry.get('text', ''), str):
+                    return jsonify({'error': f'Line {number} must be an object with a string "text"'}), 400
+                texts.append(entry.get('text', ''))
+                if len(texts) > MAX_BATCH_RECEIPTS:
+                    break
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not isinstance(data.get('receipts', []), list):
+                return jsonify({'error': 'Request body must be a JSON object with a "receipts" list'}), 400
+            texts = data.get('receipts', [])
+        
+        if not texts:
+            return jsonify({'error': 'No receipts provided'}), 400
+        if len(texts) > MAX_BATCH_RECEIPTS:
+            return jsonify({'error': f'At most {MAX_BATCH_RECEIPTS} receipts per request'}), 400
+        for index, text in enumerate(texts):
+            if not isinstance(text, str):
+                return jsonify({'error': f'Receipt {index} must be a string'}), 400
+        
+        workers = current_app.config.get('RECEIPT_PARSE_WORKERS', 0)
+        parsed = parse_receipts_batch(texts, workers=workers)
         
-        tracker = PriceTracker()
+        return jsonify({
+            'results': [{'items': items, 'count': len(items)} for items in parsed],
+            'count': len(parsed)
+        }), 200
         
-        # Build price history
-        for bill in bills:
-            bill_dict = bill.to_dict()
-            for item in bill_dict.get('items', []):
-                tracker.add_item_price(
-                    item.get('name'),
-                    item.get('price'),
-                    bill_dict.get('created_at')
-                )
+    except ValueError as e:
+        return jsonify({'error': f'Invalid receipt batch: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bills_bp.route('/receipt-jobs', methods=['POST'])
+def create_receipt_job():
+    """Queue a receipt image (multipart 'image' or base64 JSON 'image') for OCR"""
+    try:
+        config = current_app.config
+        max_bytes = config.get('RECEIPT_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+        upload_dir = config.get('RECEIPT_UPLOAD_DIR')
+        
+        # Refuse oversized bodies before get_json() or the form parser buffers them
+        max_body = max_request_bytes(max_bytes)
+        if request.content_length is None:
+            return jsonify({'error': 'Content-Length required'}), 411
+        if request.content_length > max_body:
+            return jsonify({'error': f'Request exceeds {max_body} bytes'}), 413
+        
+        # Spool the upload to disk so the request thread never decodes the image
+        try:
+            if 'image' in request.files:
+                path = spool_stream(request.files['image'].stream, max_bytes, upload_dir)
+                user_id = request.form.get('user_id')
+            else:
+                data = request.get_json()
+                if not data or not data.get('image'):
+                    return jsonify({'error': 'No receipt image provided'}), 400
+                path = spool_base64(data['image'], max_bytes, upload_dir)
+                user_id = data.get('user_id')
+        except ImageTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        job_id = submit_receipt_image(path, config, user_id=user_id)
         
-        # Get latest bill items
-        if bills:
-            latest_bill = bills[-1].to_dict()
-            deals = tracker.find_best_deals(latest_bill.get('items', []))
-            
-            return jsonify({
-                'deals': deals,
-                'savings_count': len(deals)
-            }), 200
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued'
+        }), 202
         
-        return jsonify({'deals': [], 'savings_count': 0}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bills_bp.route('/receipt-jobs/<job_id>', methods=['GET'])
+def get_receipt_job(job_id):
+    """Poll the status of a queued receipt image"""
+    try:
+        job = ReceiptJob.find_by_id(job_id)
+        if job:
+            return jsonify(ReceiptJob.to_dict(job)), 200
+        return jsonify({'error': 'Job not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bills_bp.route('/best-deals/<user_id>', methods=['GET'])
+def get_best_deals(user_id):
+    """Find best deals based on price history"""
+    try:
+        def compute():
+            # The latest bill's items against the user's running price stats
+            with span('db'):
+                latest = Bill.find_latest(user_id)
+                items = latest['items'] if latest else []
+                stats = PriceHistory.find_stats_many([item_key(item) for item in items], user_id)
+            with span('compute'):
+                return PriceTracker.deals_from_stats(items, stats)
+        
+        return jsonify(get_cache().get_or_set(_user_cache_key(user_id, 'best-deals'), compute)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
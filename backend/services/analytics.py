@@ -1,12 +1,104 @@
 from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional
+import heapq
+import math
 import statistics
+from services.item_catalog import item_key
 
 class BudgetAnalytics:
-    def __init__(self, bills: List[Dict]):
+    def __init__(self, bills: Iterable[Dict]):
         self.bills = bills
     
+    def analyze(self, top_items_limit: int = 10) -> Dict:
+        """Compute all analytics in a single pass over the bills.
+
+        Unlike the individual methods, this only iterates ``self.bills`` once,
+        so it accepts a cursor or generator as well as a list.
+        """
+        monthly_totals = defaultdict(float)
+        category_totals = defaultdict(float)
+        category_counts = defaultdict(int)
+        item_counts = defaultdict(int)
+        item_spent = defaultdict(float)
+        item_names = {}
+        totals = []
+        
+        # Welford's running mean and variance of bill totals
+        count = 0
+        mean = 0.0
+        m2 = 0.0
+        total_spent = 0.0
+        
+        for bill in self.bills:
+            created_at = bill.get('created_at')
+            if isinstance(created_at, str):
+                created_at = datetime.fromisoformat(created_at)
+            
+            total = bill.get('total', 0)
+            monthly_totals[created_at.strftime('%Y-%m')] += total
+            totals.append(total)
+            total_spent += total
+            
+            count += 1
+            delta = total - mean
+            mean += delta / count
+            m2 += delta * (total - mean)
+            
+            for item in bill.get('items', []):
+                price = item.get('price', 0)
+                quantity = item.get('quantity', 1)
+                spent = price * quantity
+                category = item.get('category', 'General')
+                key = item.get('item_id')
+                if key is None:
+                    key = item_key(item)
+                
+                category_totals[category] += spent
+                category_counts[category] += 1
+                item_counts[key] += quantity
+                item_spent[key] += spent
+                item_names.setdefault(key, item.get('name'))
+        
+        monthly_spending = dict(sorted(monthly_totals.items()))
+        
+        spending_trends = {}
+        if count:
+            totals.sort()
+            middle = count // 2
+            median = totals[middle] if count % 2 else (totals[middle - 1] + totals[middle]) / 2
+            spending_trends = {
+                'average': round(mean, 2),
+                'median': round(median, 2),
+                'min': round(totals[0], 2),
+                'max': round(totals[-1], 2),
+                'std_dev': round(math.sqrt(m2 / (count - 1)), 2) if count > 1 else 0,
+                'total_bills': count,
+                'total_spent': round(total_spent, 2)
+            }
+        
+        top_items = heapq.nlargest(top_items_limit, item_counts.items(), key=lambda x: x[1])
+        
+        return {
+            'monthly_spending': monthly_spending,
+            'category_breakdown': {
+                'totals': dict(category_totals),
+                'counts': dict(category_counts),
+                'averages': {cat: total / category_counts[cat]
+                            for cat, total in category_totals.items()}
+            },
+            'spending_trends': spending_trends,
+            'top_items': [
+                {
+                    'name': item_names[key],
+                    'purchase_count': purchase_count,
+                    'total_spent': round(item_spent[key], 2)
+                }
+                for key, purchase_count in top_items
+            ],
+            'budget_prediction': self._predict_from_monthly(monthly_spending)
+        }
+    
     def calculate_monthly_spending(self) -> Dict:
         """Calculate spending by month"""
         monthly_totals = defaultdict(float)
@@ -63,16 +155,22 @@ class BudgetAnalytics:
     
     def get_top_items(self, limit: int = 10) -> List[Dict]:
         """Get most purchased items"""
-        item_frequency = defaultdict(lambda: {'count': 0, 'total_spent': 0})
+        item_frequency = defaultdict(lambda: {'count': 0, 'total_spent': 0, 'name': None})
         
         for bill in self.bills:
             for item in bill.get('items', []):
-                name = item.get('name')
                 price = item.get('price', 0)
                 quantity = item.get('quantity', 1)
                 
-                item_frequency[name]['count'] += quantity
-                item_frequency[name]['total_spent'] += price * quantity
+                key = item.get('item_id')
+                if key is None:
+                    key = item_key(item)
+                
+                data = item_frequency[key]
+                data['count'] += quantity
+                data['total_spent'] += price * quantity
+                if data['name'] is None:
+                    data['name'] = item.get('name')
         
         sorted_items = sorted(
             item_frequency.items(),
@@ -82,17 +180,20 @@ class BudgetAnalytics:
         
         return [
             {
-                'name': name,
+                'name': data['name'],
                 'purchase_count': data['count'],
                 'total_spent': round(data['total_spent'], 2)
             }
-            for name, data in sorted_items[:limit]
+            for _, data in sorted_items[:limit]
         ]
     
     def predict_next_month_budget(self) -> Dict:
         """Predict next month's budget based on trends"""
-        monthly_spending = self.calculate_monthly_spending()
-        
+        return self._predict_from_monthly(self.calculate_monthly_spending())
+    
+    @staticmethod
+    def _predict_from_monthly(monthly_spending: Dict) -> Dict:
+        """Predict next month's budget from ordered monthly totals"""
         if len(monthly_spending) < 2:
             return {'prediction': 0, 'confidence': 'low'}
         
@@ -108,4 +209,73 @@ class BudgetAnalytics:
             'confidence': confidence,
             'trend': 'increasing' if trend > 0 else 'decreasing',
             'trend_amount': round(trend, 2)
-        }
\ No newline at end of file
+        }
+
+class RollupAnalytics(BudgetAnalytics):
+    """Budget analytics answered from a pre-aggregated per-user rollup"""
+
+    def __init__(self, rollup: Dict, total_stats: Optional[Dict] = None):
+        super().__init__([])
+        self.rollup = rollup
+        self.total_stats = total_stats or {}
+    
+    def analyze(self, top_items_limit: int = 10) -> Dict:
+        """Compute all analytics from the rollup"""
+        monthly_spending = self.calculate_monthly_spending()
+        
+        return {
+            'monthly_spending': monthly_spending,
+            'category_breakdown': self.get_category_breakdown(),
+            'spending_trends': self.get_spending_trends(),
+            'top_items': self.get_top_items(top_items_limit),
+            'budget_prediction': self._predict_from_monthly(monthly_spending)
+        }
+    
+    def calculate_monthly_spending(self) -> Dict:
+        """Calculate spending by month"""
+        return {
+            doc['key']: round(doc['total'], 2)
+            for doc in sorted(self.rollup['month'], key=lambda doc: doc['key'])
+        }
+    
+    def get_category_breakdown(self) -> Dict:
+        """Get spending by category"""
+        categories = self.rollup['category']
+        
+        return {
+            'totals': {doc['key']: round(doc['total'], 2) for doc in categories},
+            'counts': {doc['key']: doc['count'] for doc in categories},
+            'averages': {doc['key']: doc['total'] / doc['count'] for doc in categories}
+        }
+    
+    def get_spending_trends(self) -> Dict:
+        """Analyze spending trends"""
+        summary = self.rollup.get('summary') or {}
+        count = summary.get('count', 0)
+        if count <= 0 or not self.total_stats:
+            return {}
+        
+        total = summary['total']
+        mean = total / count
+        variance = (summary['total_sq'] - total * mean) / (count - 1) if count > 1 else 0
+        
+        return {
+            'average': round(mean, 2),
+            'median': round(self.total_stats['median'], 2),
+            'min': round(self.total_stats['min'], 2),
+            'max': round(self.total_stats['max'], 2),
+            'std_dev': round(math.sqrt(max(variance, 0)), 2),
+            'total_bills': count,
+            'total_spent': round(total, 2)
+        }
+    
+    def get_top_items(self, limit: int = 10) -> List[Dict]:
+        """Get most purchased items"""
+        return [
+            {
+                'name': doc.get('name', doc['key']),
+                'purchase_count': doc['count'],
+                'total_spent': round(doc['total'], 2)
+            }
+            for doc in self.rollup['item'][:limit]
+        ]
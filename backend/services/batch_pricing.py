@@ -0,0 +1,88 @@
+import numpy as np
+from typing import Dict, List
+
+class BatchPricer:
+    """Price many carts in one call using columnar integer arithmetic.
+
+    Prices become integer cents and quantities integer thousandths, so sums
+    are exact and each rounding step rounds an exact value half-to-even.
+    For cent prices this reproduces Calculator's per-cart results.
+    """
+    QUANTITY_SCALE = 1000
+    RATE_SCALE = 10000
+
+    def __init__(self, tax_rate=0.08):
+        self.tax_rate = tax_rate
+        self.rate_units = int(round(tax_rate * self.RATE_SCALE))
+
+    @staticmethod
+    def _round_div(numerator, denominator):
+        """Divide int64 arrays by an integer, rounding half to even"""
+        quotient, remainder = np.divmod(numerator, denominator)
+        twice = 2 * remainder
+        round_up = (twice > denominator) | ((twice == denominator) & (quotient % 2 == 1))
+        return quotient + round_up
+
+    @staticmethod
+    def to_columns(carts: List[Dict]) -> Dict:
+        """Flatten carts into item columns plus a cart index per item"""
+        cart_count = len(carts)
+        counts = np.fromiter((len(cart.get('items', [])) for cart in carts), dtype=np.int64, count=cart_count)
+        item_count = int(counts.sum())
+
+        return {
+            'cart_index': np.repeat(np.arange(cart_count, dtype=np.int64), counts),
+            'prices': np.fromiter(
+                (item.get('price', 0) for cart in carts for item in cart.get('items', [])),
+                dtype=np.float64, count=item_count
+            ),
+            'quantities': np.fromiter(
+                (item.get('quantity', 1) for cart in carts for item in cart.get('items', [])),
+                dtype=np.float64, count=item_count
+            ),
+            'discounts': np.fromiter((cart.get('discount', 0) for cart in carts), dtype=np.float64, count=cart_count)
+        }
+
+    def price_columns(self, cart_index, prices, quantities, discounts) -> Dict:
+        """Compute subtotal, tax, discount and total in cents for every cart"""
+        price_cents = np.rint(prices * 100).astype(np.int64)
+        quantity_units = np.rint(quantities * self.QUANTITY_SCALE).astype(np.int64)
+
+        subtotal_scaled = np.zeros(len(discounts), dtype=np.int64)
+        np.add.at(subtotal_scaled, cart_index, price_cents * quantity_units)
+
+        subtotal = self._round_div(subtotal_scaled, self.QUANTITY_SCALE)
+        tax = self._round_div(subtotal * self.rate_units, self.RATE_SCALE)
+        discount = np.rint(discounts * 100).astype(np.int64)
+
+        return {
+            'subtotal': subtotal,
+            'tax': tax,
+            'discount': discount,
+            'total': subtotal + tax - discount
+        }
+
+    def price_carts(self, carts: List[Dict]) -> List[Dict]:
+        """Price a list of carts shaped like the /calculate request body"""
+        cents = self.price_columns(**self.to_columns(carts))
+        columns = [(cents[name] / 100).tolist() for name in ('subtotal', 'tax', 'discount', 'total')]
+
+        return [
+            {'subtotal': subtotal, 'tax': tax, 'discount': discount, 'total': total}
+            for subtotal, tax, discount, total in zip(*columns)
+        ]
+
+    def price_columnar(self, columns: Dict) -> Dict:
+        """Price carts sent in columnar form, returning one list per result field"""
+        discounts = np.asarray(columns['discounts'], dtype=np.float64)
+        cart_index = np.asarray(columns['cart_index'], dtype=np.int64)
+        prices = np.asarray(columns['prices'], dtype=np.float64)
+        quantities = np.asarray(columns.get('quantities', np.ones(len(prices))), dtype=np.float64)
+
+        if not len(cart_index) == len(prices) == len(quantities):
+            raise ValueError('cart_index, prices and quantities must have the same length')
+        if len(cart_index) and (cart_index.min() < 0 or cart_index.max() >= len(discounts)):
+            raise ValueError('cart_index must refer to an entry in discounts')
+
+        cents = self.price_columns(cart_index, prices, quantities, discounts)
+        return {name: (values / 100).tolist() for name, values in cents.items()}
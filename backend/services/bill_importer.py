@@ -0,0 +1,161 @@
+import csv
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from pymongo.errors import BulkWriteError
+from models.analytics_rollup import AnalyticsRollup
+from models.bill import Bill
+from models.cache_version import CacheVersion
+from models.price_history import PriceHistory
+from models.price_sketch import PriceSketch
+from services.calculator import Calculator
+from utils.validators import parse_utc_datetime, validate_bill_items
+
+class BillImporter:
+    """Validate bills from an NDJSON or CSV stream and write them in chunks.
+
+    NDJSON: one bill per line, ``{"user_id", "items", "discount"?, "created_at"?}``.
+    CSV: one item per row with columns ``bill_ref, user_id, name, price,
+    quantity, category, discount, created_at``; consecutive rows sharing a
+    ``bill_ref`` form one bill.
+    """
+
+    def __init__(self, chunk_size: int = 1000, max_errors: int = 1000, calculator: Optional[Calculator] = None):
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.calculator = calculator or Calculator()
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def import_ndjson(self, lines: Iterable[str]) -> Dict:
+        """Import bills from NDJSON lines"""
+        return self._import(self._ndjson_rows(lines))
+
+    def import_csv(self, lines: Iterable[str]) -> Dict:
+        """Import bills from CSV lines with a header row"""
+        return self._import(self._csv_rows(lines))
+
+    def _ndjson_rows(self, lines: Iterable[str]) -> Iterator[Tuple[int, Optional[Dict]]]:
+        for row, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield row, json.loads(line)
+            except ValueError as e:
+                self._add_error(row, f'Invalid JSON: {e}')
+
+    def _csv_rows(self, lines: Iterable[str]) -> Iterator[Tuple[int, Optional[Dict]]]:
+        current_ref = None
+        current_row = None
+        bill = None
+        bill_failed = False
+
+        # Row numbers count the header as line 1
+        for row, record in enumerate(csv.DictReader(lines), start=2):
+            ref = (record.get('bill_ref'), record.get('user_id'))
+            if ref != current_ref:
+                if bill is not None and not bill_failed:
+                    yield current_row, bill
+                current_ref = ref
+                current_row = row
+                bill_failed = False
+                bill = {
+                    'user_id': record.get('user_id'),
+                    'discount': record.get('discount') or 0,
+                    'created_at': record.get('created_at') or None,
+                    'items': []
+                }
+            try:
+                bill['items'].append({
+                    'name': record.get('name'),
+                    'price': float(record.get('price')),
+                    'quantity': int(record.get('quantity') or 1),
+                    'category': record.get('category') or 'General'
+                })
+            except (TypeError, ValueError):
+                self._add_error(row, 'price and quantity must be numeric')
+                bill_failed = True
+        if bill is not None and not bill_failed:
+            yield current_row, bill
+
+    def _build_document(self, data: Dict) -> Dict:
+        """Validate one bill and return the document to insert"""
+        if not isinstance(data, dict):
+            raise ValueError('Each bill must be a JSON object')
+
+        user_id = data.get('user_id')
+        items = data.get('items')
+        if not user_id:
+            raise ValueError('user_id is required')
+        validate_bill_items(items)
+
+        discount = float(data.get('discount') or 0)
+        created_at = data.get('created_at')
+        if created_at is not None:
+            if not isinstance(created_at, str):
+                raise ValueError('created_at must be an ISO 8601 string')
+            created_at = parse_utc_datetime(created_at)
+
+        subtotal = self.calculator.calculate_subtotal(items)
+        tax = self.calculator.calculate_tax(subtotal)
+        total = self.calculator.calculate_total(subtotal, tax, discount)
+
+        bill = Bill(
+            user_id=user_id,
+            items=Bill.normalize_items(items),
+            total=total,
+            discount=discount,
+            created_at=created_at
+        )
+        return bill.to_mongo()
+
+    def _import(self, rows: Iterable[Tuple[int, Optional[Dict]]]) -> Dict:
+        chunk = []
+        chunk_rows = []
+
+        for row, data in rows:
+            try:
+                chunk.append(self._build_document(data))
+                chunk_rows.append(row)
+            except (TypeError, ValueError) as e:
+                self._add_error(row, str(e))
+                continue
+
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(chunk, chunk_rows)
+                chunk, chunk_rows = [], []
+
+        if chunk:
+            self._write_chunk(chunk, chunk_rows)
+
+        return {
+            'inserted': self.inserted,
+            'error_count': self.error_count,
+            'errors': sorted(self.errors, key=lambda e: e['row'])
+        }
+
+    def _write_chunk(self, documents: List[Dict], rows: List[int]):
+        """Insert a chunk unordered and roll the inserted bills into analytics"""
+        failed = set()
+        try:
+            Bill.get_collection().insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get('writeErrors', []):
+                failed.add(write_error['index'])
+                self._add_error(rows[write_error['index']], write_error.get('errmsg', 'Write failed'))
+
+        inserted = [doc for index, doc in enumerate(documents) if index not in failed]
+        self.inserted += len(inserted)
+        try:
+            AnalyticsRollup.apply_bills(inserted)
+            PriceHistory.record_live(inserted)
+            PriceSketch.add_live(inserted)
+        finally:
+            # The bills are in, so cached responses are stale whatever happened above
+            CacheVersion.bump_many(doc['user_id'] for doc in inserted)
+
+    def _add_error(self, row: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'error': message})
@@ -0,0 +1,239 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+from utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def to_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0
+        }
+
+class LRUCache:
+    """Per-process LRU cache with a TTL and an entry limit"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> Dict:
+        with self._lock:
+            return dict(self.stats.to_dict(), entries=len(self._entries),
+                        max_entries=self.max_entries, ttl=self.ttl)
+
+class SQLiteCache:
+    """Shared cache backend for all worker processes on a host, stored in a SQLite file.
+
+    Values must be JSON-serializable (ObjectIds and datetimes become strings). Stands in for a networked cache such
+    as Redis or memcached behind the same get/set/delete interface.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, ttl: float = 300):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)')
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread, and must not cross fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str, default=None):
+        row = self._connection().execute(
+            'SELECT value, expires_at FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return default
+        if row[1] < time.time():
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        return loads(row[0])
+
+    def set(self, key: str, value):
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, dumps(value), time.time() + self.ttl)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Drop expired entries, then the soonest-expiring ones beyond max_entries"""
+        conn.execute('DELETE FROM cache WHERE expires_at < ?', (time.time(),))
+        excess = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute('DELETE FROM cache WHERE key IN '
+                         '(SELECT key FROM cache ORDER BY expires_at LIMIT ?)', (excess,))
+            self.stats.evictions += excess
+
+    def delete(self, key: str):
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def info(self) -> Dict:
+        entries = self._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        return dict(self.stats.to_dict(), entries=entries, max_entries=self.max_entries,
+                    ttl=self.ttl, path=self.path)
+
+class TwoTierCache:
+    """Per-process LRU in front of an optional shared backend"""
+
+    def __init__(self, local: LRUCache, shared=None):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key: str, default=None):
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key, _MISSING)
+            except Exception:
+                logger.exception("Shared cache read failed for %s", key)
+                value = _MISSING
+            if value is not _MISSING:
+                self.local.set(key, value)
+                return value
+        return default
+
+    def set(self, key: str, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except Exception:
+                logger.exception("Shared cache write failed for %s", key)
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except Exception:
+                logger.exception("Shared cache delete failed for %s", key)
+
+    def get_or_set(self, key: str, compute: Callable[[], Any]):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def info(self) -> Dict:
+        return {
+            'local': self.local.info(),
+            'shared': self.shared.info() if self.shared is not None else None
+        }
+
+_cache = TwoTierCache(LRUCache())
+# Profiles carry auth state, so they stay in-process and rely on a short TTL
+# to expire in other workers after an invalidation
+_user_cache = LRUCache(max_entries=10000, ttl=5)
+
+def init_cache(app):
+    """Configure the response cache from app config"""
+    global _cache, _user_cache
+    shared = None
+    if app.config.get('CACHE_SHARED_BACKEND') == 'sqlite':
+        shared = SQLiteCache(
+            app.config.get('CACHE_SHARED_PATH', 'cache.sqlite3'),
+            max_entries=app.config.get('CACHE_SHARED_MAX_ENTRIES', 100000),
+            ttl=app.config.get('CACHE_SHARED_TTL', 300)
+        )
+    _cache = TwoTierCache(
+        LRUCache(
+            max_entries=app.config.get('CACHE_LOCAL_MAX_ENTRIES', 1024),
+            ttl=app.config.get('CACHE_LOCAL_TTL', 60)
+        ),
+        shared
+    )
+    _user_cache = LRUCache(
+        max_entries=app.config.get('USER_CACHE_MAX_ENTRIES', 10000),
+        ttl=app.config.get('USER_CACHE_TTL', 5)
+    )
+
+def get_cache() -> TwoTierCache:
+    return _cache
+
+def user_cache_key(name: str, user_id, version: int, *params) -> str:
+    """Key for a per-user response; version is the user's CacheVersion counter"""
+    return ':'.join([name, str(user_id), f'v{version}', *map(str, params)])
+
+def get_user_cache() -> LRUCache:
+    return _user_cache
@@ -0,0 +1,120 @@
+import csv
+import json
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+DEFAULT_CATEGORIES = {
+    'Fruits': ['apple', 'banana', 'orange', 'grape', 'berry', 'mango'],
+    'Vegetables': ['carrot', 'tomato', 'lettuce', 'onion', 'potato', 'broccoli'],
+    'Dairy': ['milk', 'cheese', 'yogurt', 'butter', 'cream'],
+    'Meat': ['chicken', 'beef', 'pork', 'fish', 'turkey'],
+    'Bakery': ['bread', 'cake', 'cookie', 'pastry', 'bun'],
+    'Beverages': ['juice', 'soda', 'water', 'tea', 'coffee'],
+    'Snacks': ['chips', 'candy', 'chocolate', 'nuts', 'popcorn']
+}
+
+DEFAULT_CATEGORY = 'General'
+
+class KeywordCategorizer:
+    """Categorize item names by keyword using a precompiled Aho-Corasick automaton.
+
+    A name belongs to the first category (in table order) with any keyword
+    that occurs in it as a substring. The automaton finds every keyword
+    occurrence in one pass over the name, whatever the table size.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]], cache_size: int = 4096,
+                 default: str = DEFAULT_CATEGORY):
+        self.categories = list(categories)
+        self.default = default
+        self._build(categories)
+        self._cached_categorize = lru_cache(maxsize=cache_size)(self._categorize_normalized)
+
+    def _build(self, categories: Dict[str, List[str]]):
+        no_match = len(self.categories)
+        goto = [{}]
+        best = [no_match]
+
+        # Trie of keywords; each node keeps the best (lowest) category priority ending there
+        for priority, keywords in enumerate(categories.values()):
+            for keyword in keywords:
+                keyword = keyword.strip().lower()
+                if not keyword:
+                    continue
+                state = 0
+                for char in keyword:
+                    if char not in goto[state]:
+                        goto[state][char] = len(goto)
+                        goto.append({})
+                        best.append(no_match)
+                    state = goto[state][char]
+                best[state] = min(best[state], priority)
+
+        # Breadth-first failure links; a node also matches everything its failure node matches
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, child in goto[state].items():
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(char, 0)
+                best[child] = min(best[child], best[fail[child]])
+                queue.append(child)
+
+        self._goto = goto
+        self._fail = fail
+        self._best = best
+        self._no_match = no_match
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'KeywordCategorizer':
+        """Load a keyword table from JSON ({category: [keywords]}) or CSV (keyword,category rows)"""
+        with open(path, newline='', encoding='utf-8') as f:
+            if os.path.splitext(path)[1].lower() == '.json':
+                return cls(json.load(f), **kwargs)
+
+            categories = {}
+            for row in csv.reader(f):
+                if len(row) < 2 or row[0].strip().lower() == 'keyword':
+                    continue
+                categories.setdefault(row[1].strip(), []).append(row[0])
+            return cls(categories, **kwargs)
+
+    def categorize(self, item_name: str) -> str:
+        """Get the category for an item name"""
+        return self._cached_categorize((item_name or '').strip().lower())
+
+    def _categorize_normalized(self, name: str) -> str:
+        goto, fail, best = self._goto, self._fail, self._best
+        found = self._no_match
+        state = 0
+
+        for char in name:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if best[state] < found:
+                found = best[state]
+                if found == 0:
+                    break
+
+        return self.categories[found] if found < self._no_match else self.default
+
+    def cache_info(self):
+        return self._cached_categorize.cache_info()
+
+_default_categorizer = None
+
+def get_default_categorizer() -> KeywordCategorizer:
+    """Get the shared categorizer, compiling the built-in table on first use"""
+    global _default_categorizer
+    if _default_categorizer is None:
+        _default_categorizer = KeywordCategorizer(DEFAULT_CATEGORIES)
+    return _default_categorizer
+
+def set_default_categorizer(categorizer: Optional[KeywordCategorizer]):
+    """Replace the shared categorizer, e.g. with one loaded from a keyword file"""
+    global _default_categorizer
+    _default_categorizer = categorizer
@@ -0,0 +1,90 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+from models.item import Item
+
+def item_key(item: Dict):
+    """Grouping key for a bill item: its catalog ID, or its canonical name if it predates the catalog.
+
+    The fallback never consults the catalog, so every process keys an item
+    the same way; the migration in config.indexes backfills the IDs.
+    """
+    item_id = item.get('item_id')
+    if item_id is not None:
+        return item_id
+    return Item.canonical_key(item.get('name'))
+
+class ItemCatalog:
+    """In-process intern table from canonical item keys to catalog IDs.
+
+    The whole catalog is loaded on first use; names not seen before are
+    looked up, and created if needed, in one batch per call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._items: Dict[int, Item] = {}
+        self._loaded = False
+
+    def _add(self, entries: Iterable[Item]):
+        with self._lock:
+            for entry in entries:
+                self._ids[entry.key] = entry.item_id
+                self._items[entry.item_id] = entry
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._add(Item.find_all())
+            self._loaded = True
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Catalog ID for a name, or None if no bill has used it"""
+        self._ensure_loaded()
+        key = Item.canonical_key(name)
+        item_id = self._ids.get(key)
+        if item_id is None:
+            # Another process may have created it since the catalog was loaded
+            found = Item.find_by_keys([key])
+            self._add(found)
+            item_id = found[0].item_id if found else None
+        return item_id
+
+    def lookup_many(self, names: List[str]) -> List[Optional[int]]:
+        """Catalog IDs for names, None for names no bill has used, in one query for unseen names"""
+        self._ensure_loaded()
+        keys = [Item.canonical_key(name) for name in names]
+        missing = {key for key in keys if key not in self._ids}
+        if missing:
+            self._add(Item.find_by_keys(missing))
+        return [self._ids.get(key) for key in keys]
+
+    def intern_many(self, items: List[Dict]) -> List[int]:
+        """Catalog IDs for bill items, creating entries for new names"""
+        self._ensure_loaded()
+        keys = [Item.canonical_key(item.get('name')) for item in items]
+
+        missing = {}
+        for key, item in zip(keys, items):
+            if key not in self._ids and key not in missing:
+                missing[key] = (key, (item.get('name') or '').strip(), item.get('category', 'General'))
+        if missing:
+            found = Item.find_by_keys(missing)
+            self._add(found)
+            self._add(Item.create_many([entry for key, entry in missing.items() if key not in self._ids]))
+
+        return [self._ids[key] for key in keys]
+
+    def intern(self, name: str, category: Optional[str] = None) -> int:
+        return self.intern_many([{'name': name, 'category': category or 'General'}])[0]
+
+    def get(self, item_id: int) -> Optional[Item]:
+        self._ensure_loaded()
+        return self._items.get(item_id)
+
+    def info(self) -> Dict:
+        return {'entries': len(self._ids), 'loaded': self._loaded}
+
+_catalog = ItemCatalog()
+
+def get_item_catalog() -> ItemCatalog:
+    return _catalog
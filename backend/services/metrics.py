@@ -0,0 +1,150 @@
+import bisect
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, Prometheus-style upper bounds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds"""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else lower * 2 or 1.0
+                return round(lower + (upper - lower) * (rank - seen) / bucket_count, 6)
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99)
+        }
+
+    def prometheus_lines(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+class RequestMetrics:
+    """Per-endpoint latency histograms, status counts and in-flight gauges"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.statuses: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.in_flight: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def started(self, method: str, endpoint: str):
+        with self._lock:
+            self.in_flight[(method, endpoint)] += 1
+
+    def finished(self, method: str, endpoint: str, status: int, seconds: float):
+        with self._lock:
+            self.in_flight[(method, endpoint)] -= 1
+            self.latency[(method, endpoint)].observe(seconds)
+            self.statuses[(method, endpoint, status)] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            endpoints = {}
+            for (method, endpoint), histogram in self.latency.items():
+                endpoints[f'{method} {endpoint}'] = dict(
+                    histogram.to_dict(),
+                    in_flight=self.in_flight[(method, endpoint)],
+                    statuses={}
+                )
+            for (method, endpoint, status), count in self.statuses.items():
+                endpoints[f'{method} {endpoint}']['statuses'][str(status)] = count
+            return endpoints
+
+    def prometheus_lines(self) -> List[str]:
+        lines = [
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            for (method, endpoint), histogram in self.latency.items():
+                lines.extend(histogram.prometheus_lines(
+                    'http_request_duration_seconds', f'method="{method}",endpoint="{endpoint}"'))
+            lines.append('# TYPE http_requests_total counter')
+            for (method, endpoint, status), count in self.statuses.items():
+                lines.append(f'http_requests_total{{method="{method}",endpoint="{endpoint}",status="{status}"}} {count}')
+            lines.append('# TYPE http_requests_in_flight gauge')
+            for (method, endpoint), count in self.in_flight.items():
+                lines.append(f'http_requests_in_flight{{method="{method}",endpoint="{endpoint}"}} {count}')
+        return lines
+
+request_metrics = RequestMetrics()
+
+def init_metrics(app):
+    """Record every request's latency, status and in-flight count by URL rule"""
+    from flask import g, request
+
+    def endpoint():
+        return request.url_rule.rule if request.url_rule else 'unmatched'
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_endpoint = endpoint()
+        request_metrics.started(request.method, g.metrics_endpoint)
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_timer(error=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        status = g.pop('metrics_status', 500)
+        request_metrics.finished(request.method, g.pop('metrics_endpoint'), status,
+                                 time.perf_counter() - started)
+
+def render_prometheus(command_metrics, pool_stats: Dict) -> str:
+    """All metrics in Prometheus text format, labelled with this worker's pid"""
+    lines = request_metrics.prometheus_lines() + command_metrics.prometheus_lines()
+    lines.append('# TYPE mongo_pool gauge')
+    for name, value in pool_stats.items():
+        if name != 'pid':
+            lines.append(f'mongo_pool{{stat="{name}"}} {value}')
+    pid = os.getpid()
+    # Every sample carries the worker pid so scrapes of different workers don't collide
+    return '\n'.join(
+        line if line.startswith('#') else _add_label(line, f'pid="{pid}"') for line in lines
+    ) + '\n'
+
+def _add_label(line: str, label: str) -> str:
+    name, _, rest = line.partition('{')
+    return f'{name}{{{label},{rest}'
@@ -1,20 +1,30 @@
 import re
 from datetime import datetime
-from typing import List, Dict
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
 import base64
+import io
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
 from PIL import Image
+from services.categorizer import KeywordCategorizer, get_default_categorizer
+from services.worker_pool import discard_pool, get_pool
 
 class ReceiptOCRService:
-    def __init__(self):
+    def __init__(self, categorizer: Optional[KeywordCategorizer] = None):
         self.price_pattern = re.compile(r'\$?\d+\.?\d{0,2}')
         self.item_pattern = re.compile(r'^[A-Za-z\s]+')
+        self.categorizer = categorizer or get_default_categorizer()
     
     def parse_receipt_text(self, text: str) -> List[Dict]:
         """Parse receipt text and extract items"""
-        items = []
-        lines = text.strip().split('\n')
-        
+        return list(self.iter_receipt_items(io.StringIO(text)))
+    
+    def parse_receipt_stream(self, stream: BinaryIO, encoding: str = 'utf-8') -> Iterator[Dict]:
+        """Parse a byte stream (e.g. an uploaded file) line by line"""
+        return self.iter_receipt_items(io.TextIOWrapper(stream, encoding=encoding, errors='replace'))
+    
+    def iter_receipt_items(self, lines: Iterable[str]) -> Iterator[Dict]:
+        """Yield items from receipt lines without holding the whole receipt in memory"""
         for line in lines:
             line = line.strip()
             if not line:
@@ -30,38 +40,39 @@ class ReceiptOCRService:
                     item_name = line[:price_match.start()].strip()
                     
                     if item_name and len(item_name) > 2:
-                        items.append({
+                        yield {
                             'name': item_name,
                             'price': price,
                             'quantity': 1,
                             'category': self._categorize_item(item_name)
-                        })
+                        }
                 except ValueError:
                     continue
-        
-        return items
     
     def _categorize_item(self, item_name: str) -> str:
         """Auto-categorize items based on keywords"""
-        item_lower = item_name.lower()
-        
-        categories = {
-            'Fruits': ['apple', 'banana', 'orange', 'grape', 'berry', 'mango'],
-            'Vegetables': ['carrot', 'tomato', 'lettuce', 'onion', 'potato', 'broccoli'],
-            'Dairy': ['milk', 'cheese', 'yogurt', 'butter', 'cream'],
-            'Meat': ['chicken', 'beef', 'pork', 'fish', 'turkey'],
-            'Bakery': ['bread', 'cake', 'cookie', 'pastry', 'bun'],
-            'Beverages': ['juice', 'soda', 'water', 'tea', 'coffee'],
-            'Snacks': ['chips', 'candy', 'chocolate', 'nuts', 'popcorn']
-        }
-        
-        for category, keywords in categories.items():
-            if any(keyword in item_lower for keyword in keywords):
-                return category
-        
-        return 'General'
+        return self.categorizer.categorize(item_name)
     
     def decode_image(self, base64_string: str) -> Image:
         """Decode base64 image"""
         image_data = base64.b64decode(base64_string)
-        return Image.open(BytesIO(image_data))
\ No newline at end of file
+        return Image.open(BytesIO(image_data))
+
+def parse_receipt_texts(texts: List[str]) -> List[List[Dict]]:
+    """Parse several receipts; module-level so process pool workers can run it"""
+    service = ReceiptOCRService()
+    return [service.parse_receipt_text(text) for text in texts]
+
+def parse_receipts_batch(texts: List[str], workers: int = 0, chunk_size: int = 8) -> List[List[Dict]]:
+    """Parse many receipts, spread across the receipt process pool when workers > 0"""
+    if workers <= 0 or len(texts) <= chunk_size:
+        return parse_receipt_texts(texts)
+    
+    pool = get_pool('receipts', max_workers=workers)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    try:
+        return [items for chunk in pool.map(parse_receipt_texts, chunks) for items in chunk]
+    except BrokenProcessPool:
+        # A crashed worker breaks the pool for good; the next batch gets a fresh one
+        discard_pool('receipts', pool)
+        raise
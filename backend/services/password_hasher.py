@@ -0,0 +1,90 @@
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Optional
+from werkzeug.security import check_password_hash, generate_password_hash
+from services.worker_pool import get_pool
+
+POOL_NAME = 'password-hash'
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool's queue is full"""
+
+class HasherTimeout(HasherBusy):
+    """Raised when a queued hash did not finish within the timeout"""
+
+class PasswordHasher:
+    """Password hashing with configurable parameters, run on a bounded pool.
+
+    method is any Werkzeug hash method, e.g. 'scrypt:32768:8:1' or
+    'pbkdf2:sha256:600000'. hashlib releases the GIL while hashing, so a
+    thread pool runs hashes in parallel; kind='process' isolates them
+    completely. At most workers + max_queue hashes are admitted at once and
+    further calls fail fast with HasherBusy. A slot is held until its job
+    leaves the pool, even when the caller gave up waiting on it.
+    """
+
+    def __init__(self, method: str = 'scrypt', workers: Optional[int] = None, max_queue: int = 64,
+                 timeout: float = 10, kind: str = 'thread'):
+        self.method = method
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.kind = kind
+        # Hash once to learn the fully expanded method string Werkzeug stores
+        self.prefix = generate_password_hash('', method).split('$', 1)[0]
+        self._slots = threading.BoundedSemaphore(self.workers + max_queue)
+
+    def hash(self, password: str) -> str:
+        return generate_password_hash(password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return check_password_hash(password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Whether a stored hash was made with different parameters"""
+        return password_hash.split('$', 1)[0] != self.prefix
+
+    def _run(self, fn: Callable, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Too many password operations in progress')
+        try:
+            pool = get_pool(POOL_NAME, max_workers=self.workers, kind=self.kind)
+            future = pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Drop the job if it has not started; a running one keeps its slot until it ends
+            future.cancel()
+            raise HasherTimeout('Password operation timed out')
+
+    def hash_bounded(self, password: str) -> str:
+        """Hash on the pool, raising HasherBusy when saturated"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify_bounded(self, password_hash: str, password: str) -> bool:
+        """Verify on the pool, raising HasherBusy when saturated"""
+        return self._run(check_password_hash, password_hash, password)
+
+_hasher = None
+
+def init_password_hasher(app):
+    """Configure password hashing from app config"""
+    global _hasher
+    _hasher = PasswordHasher(
+        method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        workers=app.config.get('PASSWORD_HASH_WORKERS'),
+        max_queue=app.config.get('PASSWORD_HASH_MAX_QUEUE', 64),
+        timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 10),
+        kind=app.config.get('PASSWORD_HASH_POOL', 'thread')
+    )
+
+def get_password_hasher() -> PasswordHasher:
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher()
+    return _hasher
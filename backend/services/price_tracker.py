@@ -1,35 +1,59 @@
 from collections import defaultdict
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Hashable, List, Dict, Optional
+from services.item_catalog import item_key
 
 class PriceTracker:
     def __init__(self):
         self.price_history = defaultdict(list)
     
-    def add_item_price(self, item_name: str, price: float, date: datetime):
-        """Track item price over time"""
-        self.price_history[item_name].append({
+    def add_item_price(self, key: Hashable, price: float, date: datetime):
+        """Track item price over time under its item key (catalog ID or canonical name)"""
+        self.price_history[key].append({
             'price': price,
             'date': date
         })
     
-    def get_price_trend(self, item_name: str) -> Dict:
-        """Get price trend for an item"""
-        if item_name not in self.price_history:
+    def get_price_trend(self, item_name: str, price_values: Optional[List[float]] = None) -> Dict:
+        """Get price trend for an item, optionally from pre-grouped prices"""
+        if price_values is None:
+            if item_name not in self.price_history:
+                return None
+            price_values = [p['price'] for p in self.price_history[item_name]]
+        elif not price_values:
             return None
         
-        prices = self.price_history[item_name]
-        price_values = [p['price'] for p in prices]
-        
         if len(price_values) < 2:
             return {'status': 'insufficient_data'}
         
-        latest_price = price_values[-1]
-        previous_price = price_values[-2]
-        min_price = min(price_values)
-        max_price = max(price_values)
-        avg_price = sum(price_values) / len(price_values)
+        return PriceTracker._trend(
+            item_name,
+            price_values[-1],
+            price_values[-2],
+            min(price_values),
+            max(price_values),
+            sum(price_values) / len(price_values)
+        )
+    
+    @staticmethod
+    def trend_from_stats(item_name: str, stats: Optional[Dict]) -> Optional[Dict]:
+        """Price trend from a PriceHistory stats document, without reading the history"""
+        if not stats or not stats.get('count'):
+            return None
+        if stats['count'] < 2 or len(stats['latest']) < 2:
+            return {'status': 'insufficient_data'}
         
+        return PriceTracker._trend(
+            item_name,
+            stats['latest'][0]['price'],
+            stats['latest'][1]['price'],
+            stats['min'],
+            stats['max'],
+            stats['sum'] / stats['count']
+        )
+    
+    @staticmethod
+    def _trend(item_name, latest_price, previous_price, min_price, max_price, avg_price) -> Dict:
         change = latest_price - previous_price
         change_percent = (change / previous_price) * 100 if previous_price > 0 else 0
         
@@ -52,22 +76,100 @@ class PriceTracker:
         
         for item in items:
             name = item.get('name')
+            key = item_key(item)
             price = item.get('price', 0)
             
-            if name in self.price_history:
-                historical_prices = [p['price'] for p in self.price_history[name]]
+            if key in self.price_history:
+                historical_prices = [p['price'] for p in self.price_history[key]]
                 avg_price = sum(historical_prices) / len(historical_prices)
                 
                 if price < avg_price:
-                    savings = avg_price - price
-                    savings_percent = (savings / avg_price) * 100
-                    
-                    deals.append({
-                        'item': name,
-                        'current_price': round(price, 2),
-                        'avg_price': round(avg_price, 2),
-                        'savings': round(savings, 2),
-                        'savings_percent': round(savings_percent, 2)
-                    })
+                    deals.append(PriceTracker._deal(name, price, avg_price))
+        
+        return sorted(deals, key=lambda x: x['savings_percent'], reverse=True)
+    
+    @staticmethod
+    def deals_from_stats(items: List[Dict], stats_by_key: Dict) -> Dict:
+        """Deals on a bill's items against PriceHistory stats documents keyed by item key"""
+        deals = []
+        
+        for item in items:
+            stats = stats_by_key.get(item_key(item))
+            price = item.get('price', 0)
+            
+            if stats and stats.get('count'):
+                avg_price = stats['sum'] / stats['count']
+                if price < avg_price:
+                    deals.append(PriceTracker._deal(item.get('name'), price, avg_price))
+        
+        deals.sort(key=lambda x: x['savings_percent'], reverse=True)
+        return {'deals': deals, 'savings_count': len(deals)}
+    
+    @staticmethod
+    def price_check(items: List[Dict], keys: List[Hashable], digests_by_key: Dict, percentile: float = 10) -> Dict:
+        """Rank each cart price within its item's store-wide distribution; deals fall at or below ``percentile``"""
+        results = []
+        
+        for item, key in zip(items, keys):
+            digest = digests_by_key.get(key)
+            price = item.get('price', 0)
+            
+            if digest is None or not digest.count:
+                results.append({
+                    'name': item.get('name'),
+                    'price': round(price, 2),
+                    'percentile': None,
+                    'threshold_price': None,
+                    'is_deal': False,
+                    'observations': 0
+                })
+                continue
+            
+            rank = digest.cdf(price) * 100
+            results.append({
+                'name': item.get('name'),
+                'price': round(price, 2),
+                'percentile': round(rank, 1),
+                'threshold_price': round(digest.quantile(percentile / 100), 2),
+                'is_deal': rank <= percentile,
+                'observations': digest.count
+            })
+        
+        return {
+            'items': results,
+            'percentile': percentile,
+            'deal_count': sum(1 for result in results if result['is_deal'])
+        }
+    
+    @staticmethod
+    def _deal(name, price, avg_price) -> Dict:
+        savings = avg_price - price
+        return {
+            'item': name,
+            'current_price': round(price, 2),
+            'avg_price': round(avg_price, 2),
+            'savings': round(savings, 2),
+            'savings_percent': round((savings / avg_price) * 100, 2)
+        }
+    
+    @staticmethod
+    def best_deals_for(bills: List[Dict]) -> Dict:
+        """Deals on the latest bill's items against the price history of all bills (newest first)"""
+        tracker = PriceTracker()
+        
+        # Build price history
+        for bill in bills:
+            for item in bill.get('items', []):
+                key = item.get('item_id')
+                tracker.add_item_price(
+                    key if key is not None else item_key(item),
+                    item.get('price'),
+                    bill.get('created_at')
+                )
+        
+        # Bills come newest first, as from Bill.find_by_user
+        if bills:
+            deals = tracker.find_best_deals(bills[0].get('items', []))
+            return {'deals': deals, 'savings_count': len(deals)}
         
-        return sorted(deals, key=lambda x: x['savings_percent'], reverse=True)
\ No newline at end of file
+        return {'deals': [], 'savings_count': 0}
\ No newline at end of file
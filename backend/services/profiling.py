@@ -0,0 +1,126 @@
+import contextvars
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+
+# Span durations (ms) for the current request, None outside a timed request
+_spans: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar('spans', default=None)
+
+@contextmanager
+def span(name: str):
+    """Time a stage of the current request for its Server-Timing header"""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+def server_timing_header(spans: Dict[str, float]) -> str:
+    return ', '.join(f'{name};dur={duration:.2f}' for name, duration in spans.items())
+
+class CProfileProfiler:
+    """Deterministic profile, saved as a pstats file (view with snakeviz or pstats)"""
+    extension = 'prof'
+
+    def __init__(self):
+        import cProfile
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self, path: str):
+        self._profile.disable()
+        self._profile.dump_stats(path)
+
+class SamplingProfiler:
+    """Low-overhead sampling profile through pyinstrument, saved as HTML"""
+    extension = 'html'
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise RuntimeError('The sampling profiler requires the pyinstrument package')
+        self._profile = Profiler(async_mode='disabled')
+
+    def start(self):
+        self._profile.start()
+
+    def stop(self, path: str):
+        self._profile.stop()
+        with open(path, 'w') as f:
+            f.write(self._profile.output_html())
+
+PROFILERS = {
+    'cprofile': CProfileProfiler,
+    'sampling': SamplingProfiler,
+}
+
+def _artifact_path(directory: str, method: str, endpoint: str, extension: str) -> str:
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', endpoint).strip('-') or 'root'
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{method}-{slug}-{os.getpid()}-{random.randrange(16 ** 6):06x}.{extension}"
+    return os.path.join(directory, name)
+
+def init_profiling(app):
+    """Add Server-Timing spans to responses and profile sampled or opted-in requests.
+
+    A request is profiled when PROFILE_SAMPLE_RATE selects it, or when it
+    sends an X-Profile: 1 header and PROFILE_HEADER_ENABLED is set.
+    Artifacts are written to PROFILE_DIR and named in the X-Profile-Artifact
+    response header.
+    """
+    from flask import g, request
+
+    profiler_class = PROFILERS[app.config.get('PROFILE_MODE', 'cprofile')]
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0)
+    header_enabled = app.config.get('PROFILE_HEADER_ENABLED', False)
+    server_timing = app.config.get('SERVER_TIMING_ENABLED', True)
+    directory = app.config.get('PROFILE_DIR', 'profiles')
+    if sample_rate or header_enabled:
+        os.makedirs(directory, exist_ok=True)
+
+    @app.before_request
+    def start_profiling():
+        if server_timing:
+            g.spans_token = _spans.set({})
+            g.spans_started = time.perf_counter()
+        if (header_enabled and request.headers.get(PROFILE_HEADER) == '1') or random.random() < sample_rate:
+            g.profiler = profiler_class()
+            g.profiler.start()
+
+    @app.after_request
+    def finish_profiling(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            path = _artifact_path(directory, request.method, endpoint, profiler.extension)
+            try:
+                profiler.stop(path)
+                response.headers['X-Profile-Artifact'] = os.path.basename(path)
+            except Exception:
+                logger.exception("Failed to save profile for %s", request.path)
+
+        spans = _spans.get()
+        if spans is not None:
+            spans['total'] = (time.perf_counter() - g.pop('spans_started')) * 1000
+            response.headers['Server-Timing'] = server_timing_header(spans)
+        return response
+
+    @app.teardown_request
+    def reset_spans(error=None):
+        token = g.pop('spans_token', None)
+        if token is not None:
+            _spans.reset(token)
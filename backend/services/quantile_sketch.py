@@ -0,0 +1,115 @@
+import math
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_COMPRESSION = 100
+
+class TDigest:
+    """Merging t-digest: an approximate, mergeable quantile sketch.
+
+    Values are summarised as centroids (mean, weight) kept small in the
+    tails and large in the middle, so extreme quantiles stay accurate while
+    the sketch never holds more than about ``compression`` centroids,
+    however many values it has seen.
+    """
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION, centroids: Iterable = (),
+                 min_value: Optional[float] = None, max_value: Optional[float] = None):
+        self.compression = compression
+        self.centroids: List[List[float]] = [list(centroid) for centroid in centroids]
+        self.count = sum(weight for _, weight in self.centroids)
+        self.min = min_value
+        self.max = max_value
+
+    def _scale(self, q: float) -> float:
+        """k1 scale function: centroid boundaries are one unit of k apart"""
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def update(self, values: Iterable[float]):
+        """Add a batch of values"""
+        values = sorted(values)
+        if not values:
+            return
+        self.min = values[0] if self.min is None else min(self.min, values[0])
+        self.max = values[-1] if self.max is None else max(self.max, values[-1])
+        self._merge_sorted(sorted(self.centroids + [[value, 1] for value in values]))
+
+    def merge(self, other: 'TDigest'):
+        """Fold another digest into this one"""
+        if not other.count:
+            return
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._merge_sorted(sorted(self.centroids + other.centroids))
+
+    def _merge_sorted(self, points: List[List[float]]):
+        total = sum(weight for _, weight in points)
+        merged = []
+        mean, weight = points[0]
+        weight_before = 0
+        k_left = self._scale(0)
+        for point_mean, point_weight in points[1:]:
+            if self._scale(min(1.0, (weight_before + weight + point_weight) / total)) - k_left <= 1:
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                merged.append([mean, weight])
+                weight_before += weight
+                k_left = self._scale(weight_before / total)
+                mean, weight = point_mean, point_weight
+        merged.append([mean, weight])
+        self.centroids = merged
+        self.count = total
+
+    def _knots(self):
+        """(value, cumulative weight) points of the piecewise-linear CDF"""
+        knots = [(self.min, 0.0)]
+        cumulative = 0.0
+        for mean, weight in self.centroids:
+            knots.append((mean, cumulative + weight / 2))
+            cumulative += weight
+        knots.append((self.max, self.count))
+        return knots
+
+    def cdf(self, value: float) -> Optional[float]:
+        """Estimated fraction of values at or below ``value``"""
+        if not self.count:
+            return None
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        knots = self._knots()
+        for (left, left_rank), (right, right_rank) in zip(knots, knots[1:]):
+            if value < right:
+                if right == left:
+                    return left_rank / self.count
+                return (left_rank + (right_rank - left_rank) * (value - left) / (right - left)) / self.count
+        return 1.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile ``q`` (0-1)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        knots = self._knots()
+        for (left, left_rank), (right, right_rank) in zip(knots, knots[1:]):
+            if rank <= right_rank:
+                if right_rank == left_rank:
+                    return left
+                return left + (right - left) * (rank - left_rank) / (right_rank - left_rank)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'compression': self.compression,
+            'centroids': self.centroids,
+            'min': self.min,
+            'max': self.max
+        }
+
+    @staticmethod
+    def from_dict(data: Optional[Dict]) -> 'TDigest':
+        if not data:
+            return TDigest()
+        return TDigest(data.get('compression', DEFAULT_COMPRESSION), data.get('centroids', ()),
+                       data.get('min'), data.get('max'))
@@ -0,0 +1,172 @@
+import base64
+import binascii
+import importlib
+import logging
+import os
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Dict, List, Mapping, Optional
+from PIL import Image
+from models.receipt_job import ReceiptJob
+from services.ocr_service import ReceiptOCRService
+from services.worker_pool import discard_pool, get_pool
+
+logger = logging.getLogger(__name__)
+
+POOL_NAME = 'receipt-images'
+SPOOL_CHUNK_SIZE = 64 * 1024
+# Room for the JSON or multipart framing around an upload's image bytes
+REQUEST_OVERHEAD_BYTES = 64 * 1024
+
+class ImageTooLarge(ValueError):
+    """An uploaded receipt image (or the request carrying it) is over the size limit"""
+
+class OCREngine:
+    """Turns a preprocessed grayscale receipt image into text"""
+
+    def image_to_text(self, image: Image.Image) -> str:
+        raise NotImplementedError
+
+class TesseractEngine(OCREngine):
+    """Local Tesseract OCR through pytesseract"""
+
+    def __init__(self):
+        try:
+            import pytesseract
+        except ImportError:
+            raise RuntimeError('The tesseract OCR engine requires the pytesseract package')
+        self._pytesseract = pytesseract
+
+    def image_to_text(self, image: Image.Image) -> str:
+        return self._pytesseract.image_to_string(image)
+
+OCR_ENGINES = {
+    'tesseract': TesseractEngine,
+}
+
+_engines = {}
+
+def load_ocr_engine(spec: str) -> OCREngine:
+    """Get an engine by registered name or 'module:Class' path, once per worker process"""
+    if spec not in _engines:
+        if spec in OCR_ENGINES:
+            engine_class = OCR_ENGINES[spec]
+        elif ':' in spec:
+            module_name, class_name = spec.split(':', 1)
+            engine_class = getattr(importlib.import_module(module_name), class_name)
+        else:
+            raise ValueError(f'Unknown OCR engine: {spec}')
+        _engines[spec] = engine_class()
+    return _engines[spec]
+
+def limit_worker_memory(max_bytes: Optional[int]):
+    """Process pool initializer capping each worker's address space"""
+    if max_bytes:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+def max_request_bytes(max_bytes: int) -> int:
+    """Largest request body that can carry an image of max_bytes, base64-encoded in JSON"""
+    return -(-max_bytes // 3) * 4 + REQUEST_OVERHEAD_BYTES
+
+def spool_stream(stream: BinaryIO, max_bytes: int, upload_dir: Optional[str] = None) -> str:
+    """Copy an upload to a temp file in chunks, rejecting it once it exceeds max_bytes"""
+    fd, path = tempfile.mkstemp(prefix='receipt-', dir=upload_dir)
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(SPOOL_CHUNK_SIZE), b''):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise ImageTooLarge(f'Image exceeds {max_bytes} bytes')
+                f.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+def spool_base64(data: str, max_bytes: int, upload_dir: Optional[str] = None) -> str:
+    """Decode a base64 image to a temp file without a full decoded copy in memory"""
+    if data.startswith('data:'):
+        data = data[data.find(',') + 1:]
+    if '\n' in data or ' ' in data:
+        data = ''.join(data.split())
+    if len(data) * 3 // 4 > max_bytes:
+        raise ImageTooLarge(f'Image exceeds {max_bytes} bytes')
+
+    fd, path = tempfile.mkstemp(prefix='receipt-', dir=upload_dir)
+    # Chunks are a multiple of 4 characters so each decodes independently
+    step = SPOOL_CHUNK_SIZE // 3 * 4
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for start in range(0, len(data), step):
+                f.write(base64.b64decode(data[start:start + step], validate=True))
+    except binascii.Error:
+        os.remove(path)
+        raise ValueError('Invalid base64 image')
+    return path
+
+def preprocess_image(path: str, max_dimension: int, max_pixels: int) -> Image.Image:
+    """Decode a receipt image downscaled and in grayscale"""
+    with Image.open(path) as image:
+        # JPEG can decode straight to grayscale at 1/2-1/8 scale
+        image.draft('L', (max_dimension, max_dimension))
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ValueError(f'Image is {width}x{height}, over the {max_pixels} pixel limit')
+        image = image.convert('L')
+    image.thumbnail((max_dimension, max_dimension))
+    return image
+
+def process_receipt_image(path: str, engine: str, max_dimension: int, max_pixels: int) -> List[Dict]:
+    """Worker entry point: preprocess, OCR and parse one spooled receipt image"""
+    try:
+        image = preprocess_image(path, max_dimension, max_pixels)
+        text = load_ocr_engine(engine).image_to_text(image)
+        return ReceiptOCRService().parse_receipt_text(text)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _record_result(job_id: str, future, pool):
+    """Store a finished job's items or error"""
+    try:
+        error = future.exception()
+        if error is None:
+            ReceiptJob.mark_done(job_id, future.result())
+            return
+        if isinstance(error, BrokenProcessPool):
+            discard_pool(POOL_NAME, pool)
+            error = 'Image processing worker crashed (likely over the memory limit)'
+        ReceiptJob.mark_failed(job_id, str(error))
+    except Exception:
+        logger.exception("Failed to record receipt job %s", job_id)
+
+def submit_receipt_image(path: str, config: Mapping, user_id: Optional[str] = None) -> str:
+    """Queue a spooled image for OCR on the worker pool and return its job id"""
+    job_id = ReceiptJob.create(user_id)
+    max_memory_mb = config.get('RECEIPT_WORKER_MAX_MEMORY_MB')
+
+    try:
+        pool = get_pool(
+            POOL_NAME,
+            max_workers=config.get('RECEIPT_IMAGE_WORKERS'),
+            initializer=limit_worker_memory,
+            initargs=(max_memory_mb * 1024 * 1024 if max_memory_mb else None,)
+        )
+        future = pool.submit(
+            process_receipt_image,
+            path,
+            config.get('RECEIPT_OCR_ENGINE', 'tesseract'),
+            config.get('RECEIPT_IMAGE_MAX_DIMENSION', 2000),
+            config.get('RECEIPT_IMAGE_MAX_PIXELS', 40_000_000)
+        )
+    except Exception as e:
+        os.remove(path)
+        ReceiptJob.mark_failed(job_id, str(e))
+        raise
+
+    future.add_done_callback(lambda f: _record_result(job_id, f, pool))
+    return job_id
@@ -1,6 +1,7 @@
-from collections import Counter, defaultdict
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import List, Dict, Set
+from typing import Iterable, List, Dict, Set
+from models.bill import Bill
 
 class ShoppingListGenerator:
     def __init__(self, bills: List[Dict]):
@@ -8,11 +9,10 @@ class ShoppingListGenerator:
     
     def generate_smart_list(self, days_back: int = 30) -> List[Dict]:
         """Generate shopping list based on purchase history"""
-        cutoff_date = datetime.now() - timedelta(days=days_back)
+        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
         
         # Get items purchased in the last period
-        item_frequency = Counter()
-        item_details = {}
+        groups = {}
         
         for bill in self.bills:
             bill_date = bill.get('created_at')
@@ -21,30 +21,65 @@ class ShoppingListGenerator:
             
             if bill_date >= cutoff_date:
                 for item in bill.get('items', []):
-                    name = item.get('name')
-                    item_frequency[name] += 1
+                    key = Bill.purchase_key(item)
                     
-                    if name not in item_details:
-                        item_details[name] = {
+                    group = groups.get(key)
+                    if group is None:
+                        group = groups[key] = {
+                            'key': key,
+                            'last_bought': bill_date,
+                            'name': item.get('name'),
                             'category': item.get('category', 'General'),
-                            'avg_price': item.get('price', 0),
-                            'avg_quantity': item.get('quantity', 1)
+                            'frequency': 0,
+                            'price_total': 0,
+                            'quantity_total': 0
                         }
+                    group['frequency'] += 1
+                    group['last_bought'] = max(group['last_bought'], bill_date)
+                    group['price_total'] += item.get('price', 0)
+                    group['quantity_total'] += item.get('quantity', 1)
         
-        # Generate suggested list
-        suggested_items = []
-        for item_name, frequency in item_frequency.most_common():
-            details = item_details[item_name]
-            suggested_items.append({
-                'name': item_name,
-                'category': details['category'],
-                'suggested_quantity': details['avg_quantity'],
-                'estimated_price': round(details['avg_price'], 2),
-                'purchase_frequency': frequency,
-                'priority': 'high' if frequency > 3 else 'medium' if frequency > 1 else 'low'
-            })
-        
-        return suggested_items
+        # Same order as Bill.purchase_groups_pipeline: frequency, then most recently bought, then key
+        ordered = sorted(groups.values(), key=lambda group: (isinstance(group['key'], str), group['key']))
+        ordered.sort(key=lambda group: (group['frequency'], group['last_bought']), reverse=True)
+        return self.suggest_from_groups(
+            dict(group,
+                 avg_price=group['price_total'] / group['frequency'],
+                 avg_quantity=group['quantity_total'] / group['frequency'])
+            for group in ordered
+        )
+    
+    @staticmethod
+    def suggest_from_groups(groups: Iterable[Dict]) -> List[Dict]:
+        """Suggested items from per-item purchase groups (name, category, frequency, averages), most frequent first"""
+        return [
+            {
+                'name': group['name'],
+                'category': group['category'],
+                'suggested_quantity': max(1, round(group['avg_quantity'])),
+                'estimated_price': round(group['avg_price'], 2),
+                'purchase_frequency': group['frequency'],
+                'priority': 'high' if group['frequency'] > 3 else 'medium' if group['frequency'] > 1 else 'low'
+            }
+            for group in groups
+        ]
+    
+    @staticmethod
+    def build_from_groups(groups: Iterable[Dict]) -> Dict:
+        """Shopping-list response from per-item purchase groups, such as Bill.find_purchase_groups returns"""
+        return ShoppingListGenerator._response(ShoppingListGenerator.suggest_from_groups(groups))
+    
+    def build(self, days_back: int = 30) -> Dict:
+        """Suggested list, grouped by category, as returned by the shopping-list route"""
+        return self._response(self.generate_smart_list(days_back))
+    
+    @staticmethod
+    def _response(suggested_list: List[Dict]) -> Dict:
+        return {
+            'suggested_items': suggested_list,
+            'grouped_by_category': ShoppingListGenerator.group_by_category(suggested_list),
+            'total_items': len(suggested_list)
+        }
     
     def detect_running_low_items(self, current_inventory: Dict[str, int]) -> List[str]:
         """Detect items that might be running low"""
@@ -57,7 +92,8 @@ class ShoppingListGenerator:
         
         return low_stock_items
     
-    def group_by_category(self, items: List[Dict]) -> Dict[str, List[Dict]]:
+    @staticmethod
+    def group_by_category(items: List[Dict]) -> Dict[str, List[Dict]]:
         """Group shopping list items by category"""
         grouped = defaultdict(list)
         
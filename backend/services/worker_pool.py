@@ -0,0 +1,52 @@
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_pools: Dict[str, Executor] = {}
+_pools_pid = None
+_lock = threading.Lock()
+
+def get_pool(name: str, max_workers: Optional[int] = None, kind: str = 'process',
+             initializer: Optional[Callable] = None, initargs: tuple = ()) -> Executor:
+    """Get a named executor for this process, creating it on first use.
+
+    Like the Mongo client, executors are per process: pools inherited across
+    fork() belong to the parent and are never reused.
+    """
+    global _pools, _pools_pid
+    with _lock:
+        if _pools_pid != os.getpid():
+            _pools = {}
+            _pools_pid = os.getpid()
+
+        pool = _pools.get(name)
+        if pool is None:
+            executor_class = ProcessPoolExecutor if kind == 'process' else ThreadPoolExecutor
+            pool = executor_class(max_workers=max_workers, initializer=initializer, initargs=initargs)
+            _pools[name] = pool
+            logger.info("Started %s pool %r with %s workers (pid %s)", kind, name, max_workers or 'default', _pools_pid)
+        return pool
+
+def discard_pool(name: str, pool: Executor):
+    """Drop a pool (e.g. one broken by a crashed worker) so the next get_pool starts fresh"""
+    with _lock:
+        if _pools_pid != os.getpid() or _pools.get(name) is not pool:
+            return
+        del _pools[name]
+    pool.shutdown(wait=False)
+    logger.warning("Discarded pool %r", name)
+
+def shutdown_pools(wait: bool = True):
+    """Shut down this process's executors, finishing queued work if wait is set"""
+    global _pools
+    with _lock:
+        if _pools_pid != os.getpid():
+            return
+        pools, _pools = _pools, {}
+    for name, pool in pools.items():
+        pool.shutdown(wait=wait)
+        logger.info("Shut down pool %r", name)
@@ -0,0 +1,14 @@
+import importlib
+import pytest
+
+@pytest.fixture
+def database():
+    """A fresh in-process database; tests using it are skipped without mongomock"""
+    mongomock = pytest.importorskip('mongomock')
+    # Importing the app configures the database settings
+    importlib.import_module('app')
+    from config.database import set_client
+    from models.migration import Migration
+
+    set_client(mongomock.MongoClient())
+    Migration._done.clear()
@@ -0,0 +1,40 @@
+import json
+from datetime import datetime
+import pytest
+from models.bill import Bill
+from models.price_history import PriceHistory
+from services.bill_importer import BillImporter
+
+pytestmark = pytest.mark.usefixtures('database')
+
+def _line(created_at=None, price=2.0):
+    bill = {'user_id': 'u', 'items': [{'name': 'Milk', 'price': price, 'quantity': 1}]}
+    if created_at is not None:
+        bill['created_at'] = created_at
+    return json.dumps(bill)
+
+def test_offset_dates_are_stored_as_naive_utc():
+    PriceHistory.ensure_built()
+    lines = [
+        _line('2024-03-31T23:30:00-02:00'),
+        _line(),
+        _line('2024-03-31T10:00:00'),
+        _line('2024-04-01T00:30:00+02:00'),
+    ]
+    result = BillImporter().import_ndjson(lines)
+    assert result == {'inserted': 4, 'error_count': 0, 'errors': []}
+
+    dates = sorted(bill['created_at'] for bill in Bill.get_collection().find())
+    assert all(date.tzinfo is None for date in dates)
+    assert dates[:3] == [datetime(2024, 3, 31, 10), datetime(2024, 3, 31, 22, 30), datetime(2024, 4, 1, 1, 30)]
+
+    # Derived state was written for every bill, naive and offset dates alike
+    item_id = Bill.get_collection().find_one()['items'][0]['item_id']
+    points, truncated = PriceHistory.find_points(item_id, None, None, 10)
+    assert len(points) == 4 and not truncated
+
+def test_invalid_dates_are_rejected_before_insert():
+    result = BillImporter().import_ndjson([_line('yesterday'), _line(12), _line()])
+    assert result['inserted'] == 1
+    assert [error['row'] for error in result['errors']] == [1, 2]
+    assert Bill.get_collection().count_documents({}) == 1
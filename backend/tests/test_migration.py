@@ -0,0 +1,92 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from bson import ObjectId
+import pytest
+from models.bill import Bill
+from models.migration import Migration
+
+NAME = 'test_build'
+
+pytestmark = pytest.mark.usefixtures('database')
+
+class Derived:
+    """A derived 'collection' counting how often each bill was applied"""
+
+    def __init__(self):
+        self.applied = Counter()
+        self.on_clear = self.on_apply = None
+
+    def clear(self):
+        self.applied.clear()
+        if self.on_clear:
+            self.on_clear()
+
+    def apply(self, bills):
+        self.applied.update(bill['_id'] for bill in bills)
+        if self.on_apply:
+            on_apply, self.on_apply = self.on_apply, None
+            on_apply()
+
+    def write(self, bill_id=None):
+        """What a writer does: insert a bill, then apply it unless the migration will"""
+        bill = {'_id': bill_id or ObjectId(), 'user_id': 'u', 'items': []}
+        Bill.get_collection().insert_one(bill)
+        self.apply(Migration.live_bills(NAME, [bill]))
+        return bill['_id']
+
+    def run(self):
+        return Migration.run(NAME, self.clear, self.apply, chunk_size=2)
+
+def _skewed_id(seconds):
+    """A bill _id from a writer whose clock is off by ``seconds``"""
+    return ObjectId.from_datetime(datetime.utcnow() + timedelta(seconds=seconds))
+
+def test_bills_written_before_any_run_are_left_to_it():
+    derived = Derived()
+    written = [derived.write() for _ in range(3)]
+    assert not derived.applied
+
+    assert derived.run()
+    assert derived.applied == Counter(written)
+
+def test_bill_written_while_clearing_is_applied_once():
+    derived = Derived()
+    written = [derived.write()]
+    # A writer whose clock runs ahead inserts while the run clears
+    derived.on_clear = lambda: written.append(derived.write(_skewed_id(3600)))
+
+    assert derived.run()
+    assert derived.applied == Counter(written)
+
+def test_bill_written_behind_the_scan_is_applied_once():
+    derived = Derived()
+    written = [derived.write() for _ in range(4)]
+    # A writer whose clock runs behind inserts after the scan has passed its _id
+    derived.on_apply = lambda: written.append(derived.write(_skewed_id(-3600)))
+
+    assert derived.run()
+    assert derived.applied == Counter(written)
+
+def test_writers_apply_their_own_bills_once_done():
+    derived = Derived()
+    written = [derived.write()]
+    assert derived.run()
+    written.append(derived.write(_skewed_id(-3600)))
+    assert derived.applied == Counter(written)
+    assert not derived.run()
+
+def test_failed_run_stops_queuing_and_the_next_run_starts_over():
+    derived = Derived()
+    written = [derived.write()]
+
+    def fail():
+        written.append(derived.write())
+        raise RuntimeError('boom')
+    derived.on_apply = fail
+    with pytest.raises(RuntimeError):
+        derived.run()
+    assert Migration.get_collection().find_one({'_id': NAME})['state'] == 'failed'
+
+    written.append(derived.write())
+    assert derived.run()
+    assert derived.applied == Counter(written)
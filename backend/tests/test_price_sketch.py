@@ -0,0 +1,58 @@
+import pytest
+from models.price_sketch import PriceSketch
+
+pytestmark = pytest.mark.usefixtures('database')
+
+def _bill(*prices):
+    return {'items': [{'item_id': 1, 'name': 'Milk', 'price': price} for price in prices]}
+
+def _stored():
+    return PriceSketch.get_collection().find_one({'_id': 1})
+
+def test_fold_moves_pending_prices_into_the_digest():
+    PriceSketch.add_bills([_bill(1, 2, 3)])
+    assert PriceSketch.fold(_stored())
+
+    doc = _stored()
+    assert doc['version'] == 1
+    assert doc['count'] == 3
+    assert doc['pending'] == []
+    assert doc['pending_count'] == 0
+    assert PriceSketch.digest_of(doc).count == 3
+
+def test_fold_keeps_prices_appended_after_the_read():
+    PriceSketch.add_bills([_bill(1, 2, 3)])
+    read = _stored()
+    PriceSketch.add_bills([_bill(9)])
+    assert PriceSketch.fold(read)
+
+    doc = _stored()
+    assert doc['pending'] == [9]
+    assert doc['pending_count'] == 1
+    assert doc['count'] == 3
+    assert PriceSketch.digest_of(doc).count == 4
+
+def test_fold_with_a_stale_version_changes_nothing():
+    PriceSketch.add_bills([_bill(1, 2, 3)])
+    read = _stored()
+    assert PriceSketch.fold(read)
+    PriceSketch.add_bills([_bill(9)])
+    before = _stored()
+
+    # Another writer already folded the prices this document was read with
+    assert not PriceSketch.fold(read)
+    assert _stored() == before
+
+def test_fold_without_pending_prices_is_a_no_op():
+    PriceSketch.add_bills([_bill(1)])
+    assert PriceSketch.fold(_stored())
+    doc = _stored()
+    assert PriceSketch.fold(doc)
+    assert _stored() == doc
+
+def test_add_bills_folds_once_flush_size_is_reached():
+    PriceSketch.add_bills([_bill(*range(PriceSketch.FLUSH_SIZE))])
+    doc = _stored()
+    assert doc['version'] == 1
+    assert doc['pending_count'] == 0
+    assert doc['count'] == PriceSketch.FLUSH_SIZE
@@ -0,0 +1,73 @@
+import random
+from services.quantile_sketch import TDigest
+
+def _exact_quantile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def test_empty_digest_has_no_estimates():
+    digest = TDigest()
+    assert digest.count == 0
+    assert digest.cdf(1.0) is None
+    assert digest.quantile(0.5) is None
+
+def test_single_value():
+    digest = TDigest()
+    digest.update([4.5])
+    assert digest.count == 1
+    assert digest.quantile(0) == 4.5
+    assert digest.quantile(0.5) == 4.5
+    assert digest.quantile(1) == 4.5
+    assert digest.cdf(4.0) == 0.0
+    assert digest.cdf(4.5) == 1.0
+
+def test_quantile_and_cdf_accuracy():
+    rng = random.Random(7)
+    values = [rng.uniform(0, 100) for _ in range(20000)]
+    digest = TDigest()
+    for start in range(0, len(values), 500):
+        digest.update(values[start:start + 500])
+
+    assert digest.count == len(values)
+    assert len(digest.centroids) <= digest.compression
+    assert digest.quantile(0) == min(values)
+    assert digest.quantile(1) == max(values)
+    for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+        assert abs(digest.quantile(q) - _exact_quantile(values, q)) < 1.0
+        assert abs(digest.cdf(_exact_quantile(values, q)) - q) < 0.01
+
+def test_merge_matches_a_single_digest():
+    rng = random.Random(11)
+    left_values = [rng.gauss(10, 2) for _ in range(5000)]
+    right_values = [rng.gauss(20, 2) for _ in range(5000)]
+    left, right = TDigest(), TDigest()
+    left.update(left_values)
+    right.update(right_values)
+    left.merge(right)
+
+    values = left_values + right_values
+    assert left.count == len(values)
+    assert left.min == min(values)
+    assert left.max == max(values)
+    for q in (0.05, 0.25, 0.5, 0.75, 0.95):
+        assert abs(left.quantile(q) - _exact_quantile(values, q)) < 0.5
+
+def test_merge_with_empty_digests():
+    digest = TDigest()
+    digest.update([1, 2, 3])
+    digest.merge(TDigest())
+    assert digest.count == 3
+
+    empty = TDigest()
+    empty.merge(digest)
+    assert empty.count == 3
+    assert (empty.min, empty.max) == (1, 3)
+
+def test_dict_round_trip():
+    digest = TDigest(compression=50)
+    digest.update(range(1000))
+    restored = TDigest.from_dict(digest.to_dict())
+    assert restored.compression == 50
+    assert restored.count == digest.count
+    assert restored.quantile(0.5) == digest.quantile(0.5)
+    assert TDigest.from_dict(None).count == 0
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+from models.bill import Bill
+from services.shopping_list import ShoppingListGenerator
+
+def _bills():
+    now = datetime.utcnow()
+    # Newest first, as the routes load them
+    return [
+        {'user_id': 'u', 'created_at': now, 'items': [
+            {'name': 'MILK', 'name_normalized': 'milk', 'price': 1},
+            {'name': 'Eggs', 'item_id': 5, 'name_normalized': 'eggs', 'price': 4}
+        ]},
+        {'user_id': 'u', 'created_at': now - timedelta(days=1), 'items': [
+            {'name': 'Milk.', 'name_normalized': 'milk.', 'price': 2},
+            {'name': 'milk', 'name_normalized': 'milk', 'price': 3},
+            {'name': 'Eggs', 'item_id': 5, 'name_normalized': 'eggs', 'price': 4}
+        ]}
+    ]
+
+def test_purchase_key_falls_back_to_the_normalized_name():
+    assert Bill.purchase_key({'item_id': 7, 'name': 'Milk'}) == 7
+    assert Bill.purchase_key({'name': 'Milk', 'name_normalized': 'milk'}) == 'milk'
+    assert Bill.purchase_key({'name': ' Milk '}) == 'milk'
+
+def test_legacy_items_group_per_name():
+    created_at = datetime.utcnow()
+    bills = [
+        {'user_id': 'u', 'created_at': created_at, 'items': [{'name': name, 'price': price}]}
+        for name, price in (('Milk', 2), ('Bread', 3), ('Eggs', 4))
+    ]
+    suggested = ShoppingListGenerator(bills).generate_smart_list(30)
+    assert sorted((item['name'], item['estimated_price']) for item in suggested) == [
+        ('Bread', 3), ('Eggs', 4), ('Milk', 2)
+    ]
+
+def test_in_memory_list_matches_the_pipeline(database):
+    bills = _bills()
+    Bill.get_collection().insert_many([dict(bill) for bill in bills])
+
+    since = datetime.utcnow() - timedelta(days=30)
+    in_memory = ShoppingListGenerator(bills).generate_smart_list(30)
+    aggregated = ShoppingListGenerator.suggest_from_groups(Bill.find_purchase_groups('u', since))
+    assert in_memory == aggregated
+    assert [item['name'] for item in in_memory] == ['Eggs', 'MILK', 'Milk.']
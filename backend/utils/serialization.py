@@ -0,0 +1,57 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask.json.provider import JSONProvider
+from services.profiling import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(obj):
+    """Encode the BSON types that appear in documents"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return float(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(obj) -> bytes:
+        """Serialize to UTF-8 JSON, writing ObjectIds and datetimes directly"""
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps_bytes(obj) -> bytes:
+        """Serialize to UTF-8 JSON, writing ObjectIds and datetimes directly"""
+        return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+    loads = json.loads
+
+def dumps(obj) -> str:
+    return dumps_bytes(obj).decode()
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson when it is installed"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with span('serialize'):
+            body = dumps_bytes(obj)
+        return self._app.response_class(body, mimetype='application/json')
@@ -1,4 +1,5 @@
 import re
+from datetime import datetime, timezone
 
 def validate_email(email):
     """Validate email format"""
@@ -47,6 +48,15 @@ def validate_bill_items(items):
     for item in items:
         if not isinstance(item, dict) or 'price' not in item or 'quantity' not in item:
             raise ValueError("Each item must be a dictionary with 'price' and 'quantity' keys.")
+        if not isinstance(item.get('name', ''), str):
+            raise ValueError("Item name must be a string.")
         validate_item_price(item['price'])
         validate_item_quantity(item['quantity'])
-    return True
\ No newline at end of file
+    return True
+
+def parse_utc_datetime(value):
+    """Parse an ISO 8601 string as a naive UTC datetime, the form dates are stored in"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed